@@ -1,19 +1,40 @@
-from fastapi import APIRouter, Query, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Query, Header, Depends, HTTPException, Response, status
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
 from app.services.ingestion import ingestion_service
 from app.services.ai_service import ai_service
+from app.services.text_prep import text_prep
 from app.services.gemini_service import gemini_service
-from app.services.export import export_service
-from app.api.deps import get_current_user
-from app.models.user import User
+from app.services.export import export_service, etag_matches, export_filename, EXPORT_HISTORY_MAX
+from app.services import workflows
+from app.core.sse import sse_response
+from app.core.pagination import keyset_page, NEXT_CURSOR_HEADER
+from app.services.quiz_service import quiz_service
+from app.services.llm_cache import llm_cache
+from app.services.llm_router import llm_router
+from app.core.singleflight import flight_stats
+from app.services.password_service import password_service
+from app.services.stats_service import stats_service
+from app.services.search import search_service
+from app.services.question_bank import question_bank
+from app.services.quota import quota_service, Override
+from app.api.deps import get_current_user, require_quota
+from app.services.principal_cache import Principal, principal_cache
 from app.models.article import Article
+from app.models.quiz import Quiz
 from app.models.quiz_attempt import QuizAttempt
-from app.database import get_db
+from app.models.quota_override import QuotaOverride
+from app.models.user import User
+from app.database import get_db, pool_stats
+from app.core import metrics
+from app.core.instrumentation import profiler
 from app.schemas.article import ArticleHistory
 from app.schemas.quiz import QuizSubmission, QuizResult, QuizAttemptOut
-from typing import List
+from app.schemas.quota import QuotaOverrideIn, QuotaOverrideOut
+from app.schemas.profiling import ProfilingSettings
+from typing import List, Optional
 import json
 
 router = APIRouter(
@@ -21,84 +42,63 @@ router = APIRouter(
     tags=["AI Processing"]
 )
 
-@router.get("/summarize")
-def summarize_wiki(
+@router.get("/summarize", dependencies=[Depends(require_quota("summarize"))])
+async def summarize_wiki(
     url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"]),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    print(f"User {current_user.email} is requesting a summary.")
-    
-    wiki_data = ingestion_service.fetch_wikipedia_data(url)
-    if "error" in wiki_data: return wiki_data
-    
-    lang_code = wiki_data.get("language", "en")
-    text = wiki_data["sections"].get("Introduction", "")
-    
-    summary = ai_service.summarize_text(text, lang_code=lang_code)
-    
-    article = Article(
-        url=url,
-        title=wiki_data["title"],
-        action="summary",
-        owner_id=current_user.id
-    )
-    db.add(article)
-    db.commit()
-    db.refresh(article)
-    
-    return {"title": wiki_data["title"], "summary": summary, "article_id": article.id}
+    return await workflows.summarize_article(db, current_user.id, url)
 
-@router.get("/translate")
-def translate_wiki(
+@router.get("/translate", dependencies=[Depends(require_quota("translate"))])
+async def translate_wiki(
     url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"]),
     target_lang: str = Query("French"),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    wiki_data = ingestion_service.fetch_wikipedia_data(url)
+    return await workflows.translate_article(db, current_user.id, url, target_lang)
+
+@router.get("/summarize/stream", dependencies=[Depends(require_quota("summarize"))])
+async def stream_summary_wiki(
+    url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"]),
+    current_user: Principal = Depends(get_current_user)
+):
+    wiki_data = await ingestion_service.fetch_wikipedia_data_async(url)
     if "error" in wiki_data: return wiki_data
 
-    text = wiki_data["sections"].get("Introduction", "")
-    translation = gemini_service.translate_text(text, target_lang)
-    
-    article = Article(
-        url=url,
-        title=wiki_data["title"],
-        action="translation",
-        owner_id=current_user.id
-    )
-    db.add(article)
-    db.commit()
-    db.refresh(article)
-    
-    return {"original_title": wiki_data["title"], "translation": translation, "article_id": article.id}
+    lang_code = wiki_data.get("language", "en")
+    chunks = text_prep.chunks(await run_in_threadpool(text_prep.sections, wiki_data["sections"], "summarize"))
+
+    return sse_response(workflows.stream_and_record(
+        ai_service.stream_document_summary(chunks, lang_code), current_user.id, url, wiki_data["title"], "summary",
+        spec=ai_service.document_summary_spec(chunks, lang_code)
+    ))
 
-@router.get("/quiz")
-def generate_quiz(
+@router.get("/translate/stream", dependencies=[Depends(require_quota("translate"))])
+async def stream_translate_wiki(
     url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"]),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    target_lang: str = Query("French"),
+    current_user: Principal = Depends(get_current_user)
 ):
-    wiki_data = ingestion_service.fetch_wikipedia_data(url)
+    wiki_data = await ingestion_service.fetch_wikipedia_data_async(url)
     if "error" in wiki_data: return wiki_data
 
-    text = wiki_data["sections"].get("Introduction", "")
-    lang_code = wiki_data.get("language", "en")
-    
-    quiz = gemini_service.generate_quiz(text, lang_code)
-    
-    article = Article(
-        url=url,
-        title=wiki_data["title"],
-        action="quiz",
-        owner_id=current_user.id
-    )
-    db.add(article)
-    db.commit()
-    db.refresh(article)
-    
-    return {"title": wiki_data["title"], "quiz": quiz, "article_id": article.id}
+    text = (await run_in_threadpool(text_prep.lead, wiki_data["sections"].get("Introduction", ""), "translate")).text
+
+    return sse_response(workflows.stream_and_record(
+        gemini_service.stream_translation(text, target_lang), current_user.id, url, wiki_data["title"], "translation",
+        spec=gemini_service.translation_spec(text, target_lang)
+    ))
+
+@router.get("/quiz", dependencies=[Depends(require_quota("quiz"))])
+async def generate_quiz(
+    url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"]),
+    difficulty: Optional[str] = Query(None, pattern="^(easy|medium|hard)$", description="Mixed when omitted"),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await workflows.quiz_article(db, current_user.id, url, difficulty=difficulty)
 
 @router.get("/debug-models")
 def list_models():
@@ -107,31 +107,21 @@ def list_models():
 @router.post("/quiz/submit", response_model=QuizResult)
 def submit_quiz(
     submission: QuizSubmission,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    article = db.query(Article).filter(Article.id == submission.article_id).first()
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
+    quiz = quiz_service.get_quiz(db, submission.article_id, submission.quiz_id)
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found for this article")
     
-    wiki_data = ingestion_service.fetch_wikipedia_data(article.url)
-    text = wiki_data["sections"].get("Introduction", "")
-    lang_code = wiki_data.get("language", "en")
-    
-    quiz_data = gemini_service.generate_quiz(text, lang_code)
-    correct_answers = {q["question"]: q["answer"] for q in quiz_data.get("quiz", [])}
-    
-    correct_count = 0
-    for answer in submission.answers:
-        if correct_answers.get(answer.question) == answer.user_answer:
-            correct_count += 1
-    
-    total_questions = len(submission.answers)
+    correct_count = quiz_service.grade(quiz, submission.answers)
+    total_questions = len(quiz.questions)
     score = (correct_count / total_questions * 100) if total_questions > 0 else 0
     
     quiz_attempt = QuizAttempt(
         user_id=current_user.id,
         article_id=submission.article_id,
+        quiz_id=quiz.id,
         score=score
     )
     db.add(quiz_attempt)
@@ -150,82 +140,243 @@ def submit_quiz(
 
 @router.get("/history", response_model=List[ArticleHistory])
 def get_user_history(
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page"),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    articles = db.query(Article).filter(Article.owner_id == current_user.id).order_by(Article.created_at.desc()).all()
-    return articles
+    query = (
+        db.query(Article)
+        .options(selectinload(Article.result))
+        .filter(Article.owner_id == current_user.id)
+    )
+    return keyset_page(query, Article.created_at, Article.id, cursor, limit, response)
 
 @router.get("/quiz/history", response_model=List[QuizAttemptOut])
 def get_quiz_history(
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page"),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(QuizAttempt).filter(QuizAttempt.user_id == current_user.id)
+    return keyset_page(query, QuizAttempt.submitted_at, QuizAttempt.id, cursor, limit, response)
+
+def _owned_articles(db: Session, owner_id: int, *criteria, limit: int = None) -> list:
+    """The owner's articles matching criteria, newest first, with everything exports read loaded up front."""
+    return db.query(Article).options(
+        selectinload(Article.source),
+        selectinload(Article.result),
+        selectinload(Article.quizzes).selectinload(Quiz.questions),
+    ).filter(Article.owner_id == owner_id, *criteria).order_by(Article.created_at.desc(), Article.id.desc()).limit(limit).all()
+
+def _link_result(db: Session, article: Article, key: str):
+    article.result_key = llm_cache.pin(db, key)
+    if article.result_key is not None:
+        db.commit()
+
+async def _export_content(article: Article, db: Session) -> str:
+    if article.result is not None:
+        content = article.result.output
+        if article.action.endswith("quiz"):
+            content = export_service.quiz_to_text(json.loads(content))
+        return content
+
+    if article.action.endswith("quiz") and article.quizzes:
+        # Sampled from the question bank: nothing was generated for this article alone
+        questions = article.quizzes[-1].questions
+        return export_service.quiz_to_text({"quiz": [{"question": q.question, "options": q.options, "answer": q.answer} for q in questions]})
+
+    # Recorded before outputs were stored: rebuild from the source article once,
+    # then link the stored result so that later exports skip the rebuild
+    wiki_data = await ingestion_service.fetch_wikipedia_data_async(article.url)
+    if "error" in wiki_data:
+        raise HTTPException(status_code=404, detail="Content for this article is no longer available")
+    text = wiki_data["sections"].get("Introduction", "")
+
+    if article.action == "summary":
+        chunks = text_prep.chunks(await run_in_threadpool(text_prep.sections, wiki_data["sections"], "summarize"))
+        lang = wiki_data.get("language", "en")
+        content = await ai_service.summarize_document_async(chunks, lang)
+        spec = ai_service.document_summary_spec(chunks, lang)
+    elif article.action == "translation":
+        # The target language of legacy translations was never recorded, so
+        # they cannot be rebuilt: export the text that was translated instead
+        source = (await run_in_threadpool(text_prep.lead, text, "translate")).text
+        return f"The translation of this article was not stored. Original text:\n\n{source}"
+    else:
+        return text
+
+    key = await llm_cache.stored_key_async(spec)
+    if key is not None:
+        await run_in_threadpool(_link_result, db, article, key)
+    return content
+
+def _export_version(article: Article) -> str:
+    """What an article's export is rendered from, without rendering it."""
+    quiz_id = article.quizzes[-1].id if article.quizzes else ""
+    return f"{article.id}:{article.action.value}:{article.title}:{article.result_key or ''}:{quiz_id}"
+
+@router.get("/export/history.zip")
+async def export_history(
+    format: str = Query("txt", pattern="^(txt|pdf)$"),
+    limit: int = Query(100, ge=1, le=EXPORT_HISTORY_MAX),
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == current_user.id).order_by(QuizAttempt.submitted_at.desc()).all()
-    return attempts
+    """Zip of the most recent articles with stored outputs or quizzes, rendered as needed while it streams."""
+    articles = await run_in_threadpool(
+        _owned_articles, db, current_user.id, or_(Article.result_key.isnot(None), Article.quizzes.any()), limit=limit
+    )
+
+    # Checked before rendering, so a revalidation renders nothing
+    etag = export_service.archive_etag(format, [_export_version(article) for article in articles])
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    entries = []
+    for article in articles:
+        content = await _export_content(article, db)
+        artifact = export_service.artifact(format, article.title, content)
+        name = f"{article.id}-{article.action.value}-{export_filename(article.title, format)}"
+        entries.append((name, artifact, article.title, content))
+    headers["Content-Disposition"] = 'attachment; filename="history.zip"'
+    return StreamingResponse(export_service.zip_stream(entries), media_type="application/zip", headers=headers)
 
 @router.get("/export/{article_id}/{format}")
-def export_article(
+async def export_article(
     article_id: int,
     format: str,
-    current_user: User = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    article = db.query(Article).filter(
-        Article.id == article_id,
-        Article.owner_id == current_user.id
-    ).first()
+    if format not in ("txt", "pdf"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use 'txt' or 'pdf'")
+
+    found = await run_in_threadpool(_owned_articles, db, current_user.id, Article.id == article_id)
+    article = found[0] if found else None
     
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     
-    wiki_data = ingestion_service.fetch_wikipedia_data(article.url)
-    text = wiki_data["sections"].get("Introduction", "")
-    
-    if article.action == "summary":
-        content = ai_service.summarize_text(text, "en")
-    elif article.action == "translation":
-        content = gemini_service.translate_text(text, "French")
-    else:
-        content = text
-    
-    if format == "txt":
-        buffer = export_service.export_to_txt(article.title, content)
-        return StreamingResponse(
-            buffer,
-            media_type="text/plain",
-            headers={"Content-Disposition": f"attachment; filename={article.title}.txt"}
-        )
-    elif format == "pdf":
-        buffer = export_service.export_to_pdf(article.title, content)
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={article.title}.pdf"}
-        )
-    else:
-        raise HTTPException(status_code=400, detail="Invalid format. Use 'txt' or 'pdf'")
+    content = await _export_content(article, db)
+    artifact = export_service.artifact(format, article.title, content)
+    headers = {"ETag": artifact.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, artifact.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    path = await run_in_threadpool(export_service.materialize, artifact, article.title, content)
+    return FileResponse(
+        path,
+        media_type=artifact.media_type,
+        filename=export_filename(article.title, format),
+        headers=headers
+    )
+
+def _require_admin(current_user: Principal):
+    if current_user.email != "admin@deepwiki.com":
+        raise HTTPException(status_code=403, detail="Admin access required")
 
 @router.get("/admin/stats")
 def get_admin_stats(
-    current_user: User = Depends(get_current_user),
+    days: int = Query(30, ge=0, le=366),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    if current_user.email != "admin@deepwiki.com":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    total_users = db.query(User).count()
-    total_articles = db.query(Article).count()
-    total_summaries = db.query(Article).filter(Article.action == "summary").count()
-    total_translations = db.query(Article).filter(Article.action == "translation").count()
-    
-    avg_score = db.query(func.avg(QuizAttempt.score)).scalar() or 0
-    
+    _require_admin(current_user)
+
+    # Counters are maintained on insert, so this reads stat_counters only
     return {
-        "total_users": total_users,
-        "total_articles": total_articles,
-        "total_summaries": total_summaries,
-        "total_translations": total_translations,
-        "average_quiz_score": round(avg_score, 2),
-        "total_quiz_attempts": db.query(QuizAttempt).count()
+        **stats_service.dashboard(db, days),
+        "llm_cache": llm_cache.stats(),
+        "single_flight": flight_stats(),
+        "llm": llm_router.stats(),
+        "wikipedia_throttle": ingestion_service.throttle.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hashing": password_service.stats(),
+        "quotas": quota_service.stats(),
+        "text_prep": text_prep.stats(),
+        "exports": export_service.stats(),
+        "search": search_service.stats(),
+        "question_bank": question_bank.stats(),
+        "database": {"pool": pool_stats(), "worker": metrics.runtime}
     }
+
+@router.post("/admin/stats/rebuild")
+def rebuild_admin_stats(
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _require_admin(current_user)
+    return {"counters": stats_service.rebuild(db)}
+
+@router.post("/admin/search/reindex")
+def reindex_search(
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _require_admin(current_user)
+    return {"indexed_parts": search_service.reindex(db)}
+
+@router.get("/admin/profiling")
+def get_profiling(current_user: Principal = Depends(get_current_user)):
+    _require_admin(current_user)
+    return {**profiler.settings(), "profiles": profiler.profiles()}
+
+@router.put("/admin/profiling")
+def set_profiling(
+    settings: ProfilingSettings,
+    current_user: Principal = Depends(get_current_user)
+):
+    # Applies to the worker serving this request only
+    _require_admin(current_user)
+    profiler.configure(settings.sample_rate, settings.min_ms)
+    return profiler.settings()
+
+@router.get("/admin/profiling/{name}")
+def get_profile(name: str, current_user: Principal = Depends(get_current_user)):
+    _require_admin(current_user)
+    path = profiler.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    media_type = "text/html" if name.endswith(".html") else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=name)
+
+@router.get("/admin/quotas/{user_id}")
+def get_user_quota(
+    user_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _require_admin(current_user)
+    row = db.get(QuotaOverride, user_id)
+    override = QuotaOverrideOut.model_validate(row) if row is not None else None
+    usage = quota_service.usage(user_id, Override.from_row(row) if row is not None else None)
+    return {"user_id": user_id, "override": override, **usage}
+
+@router.put("/admin/quotas/{user_id}", response_model=QuotaOverrideOut)
+def set_user_quota(
+    user_id: int,
+    override: QuotaOverrideIn,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _require_admin(current_user)
+    if db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return quota_service.set_override(db, user_id, **override.model_dump())
+
+@router.delete("/admin/quotas/{user_id}", status_code=204)
+def delete_user_quota(
+    user_id: int,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    _require_admin(current_user)
+    if not quota_service.delete_override(db, user_id):
+        raise HTTPException(status_code=404, detail="No quota override for this user")
@@ -1,38 +1,65 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserOut, UserLogin
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import create_access_token, password_version
+from app.services.password_service import password_service, PasswordQueueFull
 
 router = APIRouter(
     prefix="/auth",
     tags=["Authentication"]
 )
 
-@router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user_in.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_pwd = hash_password(user_in.password)
-    
+def _find_user(db: Session, email: str):
+    user = db.query(User).filter(User.email == email).first()
+    if user is not None:
+        # Detached with its attributes loaded, so that nothing reloads it on the event loop
+        db.expunge(user)
+    # Release the connection while bcrypt runs
+    db.commit()
+    return user
+
+def _create_user(db: Session, user_in: UserCreate, hashed_password: str) -> User:
     new_user = User(
         username=user_in.username,
         email=user_in.email,
-        hashed_password=hashed_pwd
+        hashed_password=hashed_password
     )
-    
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
-    
     return new_user
 
+def _update_hash(db: Session, user: User, hashed_password: str):
+    db.query(User).filter(User.id == user.id).update({"hashed_password": hashed_password}, synchronize_session=False)
+    db.commit()
+    user.hashed_password = hashed_password
+
+def too_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in requests, please retry shortly",
+        headers={"Retry-After": "1"}
+    )
+
+@router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
+async def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
+    # Database work runs in the threadpool: a pool checkout must not block the event loop
+    if await run_in_threadpool(_find_user, db, user_in.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    try:
+        hashed_pwd = await password_service.hash(user_in.password)
+    except PasswordQueueFull:
+        raise too_busy()
+    
+    return await run_in_threadpool(_create_user, db, user_in, hashed_pwd)
+
 @router.post("/login")
-def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_find_user, db, user_credentials.email)
     
     if not user:
         raise HTTPException(
@@ -40,13 +67,25 @@ def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Invalid credentials"
         )
     
-    if not verify_password(user_credentials.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials"
-        )
+    try:
+        if not await password_service.verify(user_credentials.password, user.hashed_password):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid credentials"
+            )
+        
+        if password_service.needs_rehash(user.hashed_password):
+            # The cost factor changed since this hash was made: upgrade it now that
+            # we hold the plain password. Tokens issued before the upgrade expire.
+            await run_in_threadpool(_update_hash, db, user, await password_service.hash(user_credentials.password))
+    except PasswordQueueFull:
+        raise too_busy()
     
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data={
+        "sub": user.email,
+        "uid": user.id,
+        "pwv": password_version(user.hashed_password)
+    })
     
     return {
         "access_token": access_token,
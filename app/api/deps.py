@@ -1,28 +1,67 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models.user import User
+from starlette.concurrency import run_in_threadpool
+from app.core import metrics
+from app.services.principal_cache import principal_cache, Principal
+from app.services.quota import quota_service, QuotaExceeded
 from app.core.security import SECRET_KEY, ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Resolves the token to a cached Principal. Only a cache miss touches the
+    database, through a session of its own, so a handler's get_db session does
+    not check out a connection until the handler itself queries.
+    """
+    with metrics.stage("auth"):
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            email: str = payload.get("sub")
+            user_id = payload.get("uid")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
+            raise credentials_exception
+
+        user = principal_cache.get(user_id) if user_id is not None else None
+        if user is None:
+            user = await run_in_threadpool(principal_cache.load, user_id, email)
+        if user is None or user.email != email:
+            raise credentials_exception
+        # Tokens issued before the password last changed are no longer valid
+        if "pwv" in payload and payload["pwv"] != user.password_version:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-        
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
     return user
+
+def require_quota(endpoint: str):
+    """
+    Dependency counting the request against the caller's quota for endpoint and
+    binding LLM token charges in the request to them. Declare it next to
+    get_current_user; FastAPI resolves the token once for both.
+    """
+    async def enforce(current_user: Principal = Depends(get_current_user)) -> Principal:
+        hit, override = quota_service.cached_override(current_user.id)
+        if not hit:
+            override = await run_in_threadpool(quota_service.load_override, current_user.id)
+        try:
+            if quota_service.store.blocking:
+                await run_in_threadpool(quota_service.admit, current_user.id, endpoint, override)
+            else:
+                quota_service.admit(current_user.id, endpoint, override)
+        except QuotaExceeded as e:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        # Set here rather than in admit: context changes in the threadpool are lost
+        quota_service.bind(current_user.id, endpoint)
+        return current_user
+    return enforce
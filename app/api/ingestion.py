@@ -1,5 +1,13 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Depends, HTTPException, status
+from sqlalchemy.orm import Session
 from app.services.ingestion import ingestion_service
+from app.services.jobs import job_queue
+from app.services.workflows import BATCH_MAX_ITEMS
+from app.api.deps import get_current_user, require_quota
+from app.services.principal_cache import Principal
+from app.database import get_db
+from app.schemas.ingestion import BatchIngestRequest
+from app.schemas.job import JobSubmitted
 
 router = APIRouter(
     prefix="/ingest",
@@ -7,7 +15,26 @@ router = APIRouter(
 )
 
 @router.get("/wiki")
-def ingest_wiki(
+async def ingest_wiki(
     url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"])
 ):
-    return ingestion_service.fetch_wikipedia_data(url)
+    return await ingestion_service.fetch_wikipedia_data_async(url)
+
+@router.post("/batch", response_model=JobSubmitted, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(require_quota("batch"))])
+def ingest_batch(
+    request: BatchIngestRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Queues a reading list for ingestion. Follow per-item progress on
+    /jobs/{job_id} or /jobs/{job_id}/events.
+    """
+    if not request.urls and not request.category:
+        raise HTTPException(status_code=400, detail="Provide urls or a category")
+    if len(request.urls) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} URLs per batch")
+
+    job = job_queue.submit(db, current_user.id, "ingest_batch", request.model_dump())
+    return JobSubmitted(job_id=job.id, status=job.status)
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Query, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.api.deps import get_current_user, require_quota
+from app.services.principal_cache import Principal
+from app.models.job import Job
+from app.database import get_db, SessionLocal
+from app.schemas.job import JobSubmitted, JobOut
+from app.services.jobs import job_queue, TERMINAL_STATUSES, JOB_POLL_INTERVAL
+from app.core.sse import format_sse
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Background Jobs"]
+)
+
+@router.post("/summarize", response_model=JobSubmitted, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(require_quota("summarize"))])
+def submit_summary(
+    url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"]),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = job_queue.submit(db, current_user.id, "summarize", {"url": url})
+    return JobSubmitted(job_id=job.id, status=job.status)
+
+@router.post("/translate", response_model=JobSubmitted, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(require_quota("translate"))])
+def submit_translation(
+    url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"]),
+    target_lang: str = Query("French"),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = job_queue.submit(db, current_user.id, "translate", {"url": url, "target_lang": target_lang})
+    return JobSubmitted(job_id=job.id, status=job.status)
+
+@router.post("/quiz", response_model=JobSubmitted, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(require_quota("quiz"))])
+def submit_quiz(
+    url: str = Query(..., examples=["https://en.wikipedia.org/wiki/Artificial_intelligence"]),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = job_queue.submit(db, current_user.id, "quiz", {"url": url})
+    return JobSubmitted(job_id=job.id, status=job.status)
+
+def _get_user_job(db: Session, job_id: str, user_id: int) -> Job:
+    job = db.query(Job).filter(Job.id == job_id, Job.user_id == user_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}", response_model=JobOut)
+def get_job(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return _get_user_job(db, job_id, current_user.id)
+
+@router.get("/{job_id}/events")
+async def stream_job(
+    job_id: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    with SessionLocal() as db:
+        _get_user_job(db, job_id, current_user.id)
+
+    async def events():
+        last_seen = None
+        while True:
+            with SessionLocal() as db:
+                job = JobOut.model_validate(db.get(Job, job_id))
+            if (job.status, job.attempts, job.progress) != last_seen:
+                last_seen = (job.status, job.attempts, job.progress)
+                yield format_sse(job.model_dump(), event="status")
+            if job.status in TERMINAL_STATUSES:
+                yield format_sse(job.model_dump(), event="done")
+                return
+            # Local workers wake us immediately; the timeout covers other processes
+            await job_queue.wait_for_update(job_id, timeout=JOB_POLL_INTERVAL * 5)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,39 @@
+import os
+import hmac
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.core import metrics
+from app.database import pool_stats
+from app.services.llm_router import llm_router
+
+# When set, scrapers must send "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+EXPOSITION_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+router = APIRouter(tags=["Monitoring"])
+
+
+def _pool() -> dict:
+    stats = pool_stats()
+    if "size" not in stats:
+        return {}
+    # QueuePool counts overflow from -size until the pool is full
+    return {("size",): stats["size"], ("checked_out",): stats["checked_out"], ("overflow",): max(0, stats["overflow"])}
+
+
+def _llm_in_flight() -> dict:
+    return {(name,): slot.counters["in_flight"] for name, slot in list(llm_router.slots.items())}
+
+
+metrics.Gauge("db_pool_connections", "Connections of this worker's database pool.", _pool, ("state",))
+metrics.Gauge("llm_in_flight", "LLM calls in progress.", _llm_in_flight, ("provider",))
+metrics.Gauge("worker_runtime_seconds", "Worker start-up milestones.",
+              lambda: {(name,): value for name, value in metrics.runtime.items()}, ("milestone",))
+
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics(authorization: str = Header(None)):
+    """Prometheus text exposition of this worker's metrics."""
+    if METRICS_TOKEN and not hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type=EXPOSITION_TYPE)
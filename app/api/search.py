@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Query, Depends
+from sqlalchemy.orm import Session
+from app.api.deps import get_current_user
+from app.services.principal_cache import Principal
+from app.services.search import search_service
+from app.database import get_db
+from app.schemas.search import SearchHit
+from typing import List
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Search"]
+)
+
+@router.get("", response_model=List[SearchHit])
+def search(
+    q: str = Query(..., min_length=1, max_length=200, examples=["enigma machine"]),
+    limit: int = Query(20, ge=1, le=50),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Searches the articles, documents and outputs in the current user's history."""
+    return search_service.search(db, current_user.id, q, limit)
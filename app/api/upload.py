@@ -1,12 +1,17 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from app.services.pdf_service import pdf_service
+from app.services.document_service import document_service
 from app.services.ai_service import ai_service
+from app.services.text_prep import text_prep
 from app.services.gemini_service import gemini_service
-from app.api.deps import get_current_user
-from app.models.user import User
-from app.models.article import Article
+from app.services.llm_cache import llm_cache
+from app.api.deps import get_current_user, require_quota
+from app.services.principal_cache import Principal
+from app.models.uploaded_document import UploadedDocument
 from app.database import get_db
+from app.services import workflows
+from app.core.sse import sse_response
 from typing import Optional
 
 router = APIRouter(
@@ -14,107 +19,127 @@ router = APIRouter(
     tags=["PDF Upload"]
 )
 
-@router.post("/pdf/summarize")
-async def summarize_pdf(
-    file: UploadFile = File(...),
-    lang_code: str = Form("en"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+async def read_pdf(file: UploadFile, max_chars: int = None) -> UploadedDocument:
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    content = await file.read()
-    text = pdf_service.extract_text_from_pdf(content)
+    document = await document_service.ingest(file, max_chars)
     
-    if not text.strip():
+    if not document.text.strip():
         raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
+    return document
+
+@router.post("/pdf/summarize", dependencies=[Depends(require_quota("summarize"))])
+async def summarize_pdf(
+    file: UploadFile = File(...),
+    lang_code: str = Form("en"),
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    document = await read_pdf(file)
+    text = document.text
     
-    summary = ai_service.summarize_text(text[:5000], lang_code=lang_code)
+    chunks = text_prep.chunks(await run_in_threadpool(text_prep.document, text, "summarize"))
+    summary = await ai_service.summarize_document_async(chunks, lang_code)
+    result_key = await llm_cache.stored_key_async(ai_service.document_summary_spec(chunks, lang_code))
     
-    article = Article(
-        url=f"uploaded:{file.filename}",
-        title=file.filename,
-        action="pdf_summary",
-        owner_id=current_user.id
+    article_id, _ = await run_in_threadpool(
+        workflows.save_article, db, current_user.id, document_service.document_url(document.sha256),
+        file.filename, "pdf_summary", result_key
     )
-    db.add(article)
-    db.commit()
-    db.refresh(article)
     
     return {
         "filename": file.filename,
         "summary": summary,
-        "article_id": article.id,
-        "text_length": len(text)
+        "article_id": article_id,
+        "text_length": len(text),
+        "page_count": document.page_count
     }
 
-@router.post("/pdf/translate")
+@router.post("/pdf/summarize/stream", dependencies=[Depends(require_quota("summarize"))])
+async def stream_summary_pdf(
+    file: UploadFile = File(...),
+    lang_code: str = Form("en"),
+    current_user: Principal = Depends(get_current_user)
+):
+    document = await read_pdf(file)
+    text = document.text
+
+    chunks = text_prep.chunks(await run_in_threadpool(text_prep.document, text, "summarize"))
+
+    return sse_response(workflows.stream_and_record(
+        ai_service.stream_document_summary(chunks, lang_code),
+        current_user.id, document_service.document_url(document.sha256), file.filename, "pdf_summary",
+        spec=ai_service.document_summary_spec(chunks, lang_code)
+    ))
+
+@router.post("/pdf/translate", dependencies=[Depends(require_quota("translate"))])
 async def translate_pdf(
     file: UploadFile = File(...),
     target_lang: str = Form("French"),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are supported")
-    
-    content = await file.read()
-    text = pdf_service.extract_text_from_pdf(content)
+    # Only the lead is translated: a new document is read no further than the budget
+    document = await read_pdf(file, text_prep.char_budget("translate"))
+    text = document.text
+    source = (await run_in_threadpool(text_prep.lead, text, "translate")).text
     
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
-    
-    translation = gemini_service.translate_text(text[:5000], target_lang)
+    translation = await gemini_service.translate_text_async(source, target_lang)
+    result_key = await llm_cache.stored_key_async(gemini_service.translation_spec(source, target_lang))
     
-    article = Article(
-        url=f"uploaded:{file.filename}",
-        title=file.filename,
-        action="pdf_translation",
-        owner_id=current_user.id
+    article_id, _ = await run_in_threadpool(
+        workflows.save_article, db, current_user.id, document_service.document_url(document.sha256),
+        file.filename, "pdf_translation", result_key
     )
-    db.add(article)
-    db.commit()
-    db.refresh(article)
     
     return {
         "filename": file.filename,
         "translation": translation,
-        "article_id": article.id,
-        "text_length": len(text)
+        "article_id": article_id,
+        "text_length": len(text),
+        "page_count": document.page_count
     }
 
-@router.post("/pdf/quiz")
+@router.post("/pdf/translate/stream", dependencies=[Depends(require_quota("translate"))])
+async def stream_translate_pdf(
+    file: UploadFile = File(...),
+    target_lang: str = Form("French"),
+    current_user: Principal = Depends(get_current_user)
+):
+    document = await read_pdf(file, text_prep.char_budget("translate"))
+    source = (await run_in_threadpool(text_prep.lead, document.text, "translate")).text
+
+    return sse_response(workflows.stream_and_record(
+        gemini_service.stream_translation(source, target_lang),
+        current_user.id, document_service.document_url(document.sha256), file.filename, "pdf_translation",
+        spec=gemini_service.translation_spec(source, target_lang)
+    ))
+
+@router.post("/pdf/quiz", dependencies=[Depends(require_quota("quiz"))])
 async def generate_pdf_quiz(
     file: UploadFile = File(...),
     lang_code: str = Form("en"),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are supported")
-    
-    content = await file.read()
-    text = pdf_service.extract_text_from_pdf(content)
-    
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
+    document = await read_pdf(file)
+    text = document.text
+    source = (await run_in_threadpool(text_prep.document, text, "quiz")).text
     
-    quiz = gemini_service.generate_quiz(text[:5000], lang_code)
+    quiz = await gemini_service.generate_quiz_async(source, lang_code)
+    result_key = await llm_cache.stored_key_async(gemini_service.quiz_spec(source, lang_code))
     
-    article = Article(
-        url=f"uploaded:{file.filename}",
-        title=file.filename,
-        action="pdf_quiz",
-        owner_id=current_user.id
+    article_id, quiz_id = await run_in_threadpool(
+        workflows.save_article, db, current_user.id, document_service.document_url(document.sha256),
+        file.filename, "pdf_quiz", result_key, quiz, lang_code
     )
-    db.add(article)
-    db.commit()
-    db.refresh(article)
     
     return {
         "filename": file.filename,
         "quiz": quiz,
-        "article_id": article.id,
-        "text_length": len(text)
+        "article_id": article_id,
+        "quiz_id": quiz_id,
+        "text_length": len(text),
+        "page_count": document.page_count
     }
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with optional TTL and byte-size eviction.
+    Expired entries are kept until evicted so callers can revalidate them cheaply.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = None, ttl: float = None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: 1)
+        self.total_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, key):
+        """Returns (value, is_fresh) or None, without dropping expired entries."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            value, stored_at, _ = entry
+            fresh = self.ttl is None or (time.monotonic() - stored_at) < self.ttl
+            return value, fresh
+
+    def get(self, key, default=None):
+        hit = self.peek(key)
+        if hit is None or not hit[1]:
+            return default
+        return hit[0]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self._data[key] = (value, time.monotonic(), size)
+            self.total_bytes += size
+            self._evict()
+
+    def touch(self, key):
+        """Resets the TTL of an entry after it has been revalidated."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data[key] = (entry[0], time.monotonic(), entry[2])
+                self._data.move_to_end(key)
+
+    def delete(self, key):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def _evict(self):
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self.total_bytes -= size
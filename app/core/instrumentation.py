@@ -0,0 +1,149 @@
+import os
+import re
+import time
+import random
+import logging
+import threading
+from starlette.concurrency import run_in_threadpool
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Share of requests profiled, 0 to disable; admins change it per worker at runtime
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Sampled requests faster than this are not kept
+PROFILE_MIN_MS = float(os.getenv("PROFILE_MIN_MS", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "var/profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_NAME = re.compile(r"^[\w.-]+\.(?:html|prof)$")
+
+
+class Profiler:
+    """
+    Samples whole requests with pyinstrument when it is installed, which follows
+    the request's own task across awaits, and writes one HTML report per request.
+    Without it, cProfile dumps (.prof, for pstats or snakeviz) are written
+    instead, which also include whatever else the event loop ran meanwhile.
+    Both profile one request at a time per worker; requests sampled while
+    another is being profiled are skipped.
+    """
+
+    def __init__(self):
+        self.sample_rate = PROFILE_SAMPLE_RATE
+        self.min_ms = PROFILE_MIN_MS
+        try:
+            import pyinstrument  # noqa: F401
+            self.engine = "pyinstrument"
+        except ImportError:
+            self.engine = "cprofile"
+        self._running = threading.Lock()
+
+    def configure(self, sample_rate: float, min_ms: float):
+        self.sample_rate = sample_rate
+        self.min_ms = min_ms
+
+    def start(self):
+        """A running profile for this request, or None when it is not sampled."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._running.acquire(blocking=False):
+            return None
+        if self.engine == "pyinstrument":
+            from pyinstrument import Profiler as Sampler
+            profile = Sampler(async_mode="enabled")
+            profile.start()
+            return profile
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile):
+        try:
+            if self.engine == "pyinstrument":
+                profile.stop()
+            else:
+                profile.disable()
+        finally:
+            self._running.release()
+
+    def save(self, profile, method: str, route: str, seconds: float):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^\w]+", "_", route).strip("_") or "root"
+        stem = f"{int(time.time() * 1000)}-{method}-{slug}-{round(seconds * 1000)}ms"
+        if self.engine == "pyinstrument":
+            with open(os.path.join(PROFILE_DIR, stem + ".html"), "w", encoding="utf-8") as f:
+                f.write(profile.output_html())
+        else:
+            profile.dump_stats(os.path.join(PROFILE_DIR, stem + ".prof"))
+        for name in self.profiles()[PROFILE_KEEP:]:
+            os.unlink(os.path.join(PROFILE_DIR, name["name"]))
+
+    def profiles(self) -> list:
+        """Stored reports, newest first."""
+        try:
+            names = [name for name in os.listdir(PROFILE_DIR) if PROFILE_NAME.match(name)]
+        except FileNotFoundError:
+            return []
+        stored = []
+        for name in names:
+            stat = os.stat(os.path.join(PROFILE_DIR, name))
+            stored.append({"name": name, "size": stat.st_size, "created_at": stat.st_mtime})
+        return sorted(stored, key=lambda p: p["created_at"], reverse=True)
+
+    def path(self, name: str):
+        path = os.path.join(PROFILE_DIR, name)
+        return path if PROFILE_NAME.match(name) and os.path.isfile(path) else None
+
+    def settings(self) -> dict:
+        return {"engine": self.engine, "sample_rate": self.sample_rate, "min_ms": self.min_ms}
+
+profiler = Profiler()
+
+
+class InstrumentationMiddleware:
+    """
+    Times every HTTP request into http_request_seconds, collects the stages
+    timed while it is handled (app.core.metrics.stage) into a Server-Timing
+    header, and profiles the requests the profiler samples. Stages that run
+    after the headers are sent, as in streamed responses, reach the histograms
+    only.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = metrics.bind_timings(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = metrics.server_timing(timings, time.perf_counter() - started)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        profile = profiler.start()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            # The route template, so that path parameters do not split the series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.request_seconds.observe(elapsed, scope["method"], route, str(status))
+            metrics.reset_timings(token)
+            if profile is not None:
+                profiler.stop(profile)
+                if elapsed * 1000 >= profiler.min_ms:
+                    try:
+                        await run_in_threadpool(profiler.save, profile, scope["method"], route, elapsed)
+                    except Exception as e:
+                        logger.warning("Could not save request profile: %s", e)
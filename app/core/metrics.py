@@ -0,0 +1,169 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Set when the app package is first imported, i.e. at worker start
+_started = time.perf_counter()
+
+runtime = {}
+
+# Upper bounds of the latency histograms, in seconds: LLM calls and Wikipedia
+# fetches take seconds, cache hits and auth well under a millisecond
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def mark(name: str):
+    """Records seconds elapsed since worker start under name, e.g. "startup_seconds"."""
+    runtime[name] = round(time.perf_counter() - _started, 3)
+
+
+def percentile_ms(ordered: list, q: float) -> float:
+    """q-th percentile of sorted durations in seconds, in milliseconds."""
+    if not ordered:
+        return 0.0
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+
+# Prometheus exposition. Values are per process: with several workers, each
+# serves its own /metrics, so scrape them separately or run one worker per pod.
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), values):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labels, labels)} {value}" for labels, value in values)
+        return lines
+
+
+class Gauge:
+    """Read when scraped from read(), which returns {label values: value}."""
+
+    def __init__(self, name: str, help: str, read, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.read = read
+        _registry.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines.extend(f"{self.name}{_labels(self.labels, labels)} {value}" for labels, value in sorted(self.read().items()))
+        return lines
+
+
+def render() -> str:
+    return "\n".join(line for metric in list(_registry) for line in metric.render()) + "\n"
+
+
+request_seconds = Histogram("http_request_seconds", "Time to serve a request, until its response ends.", ("method", "route", "status"))
+stage_seconds = Histogram("stage_seconds", "Time spent in one stage of request or job processing.", ("stage",))
+llm_call_seconds = Histogram("llm_call_seconds", "Latency of successful LLM calls.", ("provider",))
+llm_tokens = Counter("llm_tokens_total", "Tokens used by LLM calls, as reported by the provider or estimated.", ("provider", "direction"))
+
+
+# Per-request stage timings, reported in the Server-Timing header
+
+_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+def bind_timings(timings: list):
+    return _timings.set(timings)
+
+
+def reset_timings(token):
+    _timings.reset(token)
+
+
+def record(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    """Times the block as one run of a stage; usable around awaits as well."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def server_timing(timings: list, total: float) -> str:
+    """Server-Timing header value: time per stage, summed over repeated runs, then the total."""
+    stages = {}
+    for name, seconds in list(timings):
+        runs, spent = stages.get(name, (0, 0.0))
+        stages[name] = (runs + 1, spent + seconds)
+    parts = [
+        f'{name};dur={spent * 1000:.1f}' + (f';desc="{runs} runs"' if runs > 1 else "")
+        for name, (runs, spent) in stages.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -1,4 +1,5 @@
 import bcrypt
+import hashlib
 from datetime import datetime, timedelta
 from jose import jwt
 import os
@@ -8,15 +9,29 @@ SECRET_KEY = os.getenv("SECRET_KEY", "a_very_secret_key_12345")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-def hash_password(password: str):
+# bcrypt cost factor; existing hashes are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS):
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
+def needs_rehash(hashed_password: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    # bcrypt hashes look like $2b$12$<salt+digest>
+    try:
+        return int(hashed_password.split('$')[2]) != rounds
+    except (IndexError, ValueError):
+        return True
+
 def verify_password(plain_password: str, hashed_password: str):
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+def password_version(hashed_password: str) -> str:
+    # Embedded in tokens so that changing the password revokes the old ones
+    return hashlib.sha256(hashed_password.encode('utf-8')).hexdigest()[:16]
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -0,0 +1,234 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# "local" coalesces within one process; "postgres" or "redis" also serialize
+# identical work across workers and processes
+SINGLEFLIGHT_BACKEND = os.getenv("SINGLEFLIGHT_BACKEND", "local")
+SINGLEFLIGHT_REDIS_URL = os.getenv("SINGLEFLIGHT_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+# How long a leader waits for the cross-worker lock before running uncoordinated
+SINGLEFLIGHT_LOCK_TIMEOUT = float(os.getenv("SINGLEFLIGHT_LOCK_TIMEOUT", "120"))
+SINGLEFLIGHT_POLL_INTERVAL = 0.05
+
+
+class PostgresAdvisoryLock:
+    """
+    Session-level pg advisory locks. Each held lock owns a connection from a
+    dedicated NullPool engine, so waiting leaders never drain the request pool.
+    """
+
+    def __init__(self, url: str):
+        from sqlalchemy.pool import NullPool
+        from app.database import make_engine
+        self.engine = make_engine(url, poolclass=NullPool)
+
+    @staticmethod
+    def lock_id(key: str) -> int:
+        return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big", signed=True)
+
+    def acquire(self, key: str, timeout: float):
+        from sqlalchemy import text
+        lock_id = self.lock_id(key)
+        conn = self.engine.connect()
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                if conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": lock_id}).scalar():
+                    return conn, lock_id
+                if time.monotonic() >= deadline:
+                    conn.close()
+                    return None
+                time.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+        except Exception:
+            conn.close()
+            raise
+
+    def release(self, handle):
+        from sqlalchemy import text
+        conn, lock_id = handle
+        try:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+        finally:
+            conn.close()
+
+
+class RedisLock:
+    """SET NX PX lock on any Redis-compatible server (Redis, Valkey, KeyDB, ...)."""
+
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, url: str):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def acquire(self, key: str, timeout: float):
+        name = f"singleflight:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        # The expiry frees the key if its holder dies mid-computation
+        while not self.client.set(name, token, nx=True, px=int(timeout * 1000)):
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+        return name, token
+
+    def release(self, handle):
+        name, token = handle
+        self.client.eval(self.RELEASE_SCRIPT, 1, name, token)
+
+
+_groups = {}
+_distributed_lock = None
+_lock_lock = threading.Lock()
+
+
+def distributed_lock():
+    """Builds the cross-worker lock selected by SINGLEFLIGHT_BACKEND, or None in local mode."""
+    global _distributed_lock
+    if SINGLEFLIGHT_BACKEND == "local":
+        return None
+    with _lock_lock:
+        if _distributed_lock is None:
+            if SINGLEFLIGHT_BACKEND == "postgres":
+                from app.database import DATABASE_URL
+                if not DATABASE_URL.startswith("postgres"):
+                    raise RuntimeError("SINGLEFLIGHT_BACKEND=postgres requires a PostgreSQL DATABASE_URL")
+                _distributed_lock = PostgresAdvisoryLock(DATABASE_URL)
+            elif SINGLEFLIGHT_BACKEND == "redis":
+                _distributed_lock = RedisLock(SINGLEFLIGHT_REDIS_URL)
+            else:
+                raise RuntimeError(f"Unknown SINGLEFLIGHT_BACKEND '{SINGLEFLIGHT_BACKEND}'")
+        return _distributed_lock
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution whose result,
+    or exception, is handed to every caller. do() is for coroutines and do_sync()
+    for threads. Only the leader of a flight takes the cross-worker lock, so the
+    function it runs should re-check its cache first: another worker may have
+    finished the same work while the leader waited.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self._tasks = {}
+        self._futures = {}
+        self._mutex = threading.Lock()
+        _groups[name] = self
+
+    def _count(self, leader: bool):
+        with self._mutex:
+            self.calls += 1
+            if leader:
+                self.executions += 1
+
+    def _acquire(self, key: str):
+        try:
+            lock = distributed_lock()
+            if lock is None:
+                return None, None
+            started = time.perf_counter()
+            handle = lock.acquire(f"{self.name}:{key}", SINGLEFLIGHT_LOCK_TIMEOUT)
+            with self._mutex:
+                self.lock_waits += 1
+                self.lock_wait_seconds += time.perf_counter() - started
+            if handle is None:
+                logger.warning("Timed out waiting for the %s lock on %s", self.name, key)
+            return lock, handle
+        except Exception as e:
+            # Coordination is an optimization: fall back to running uncoordinated
+            logger.warning("Single-flight lock unavailable: %s", e)
+            return None, None
+
+    @staticmethod
+    def _release(lock, handle):
+        try:
+            lock.release(handle)
+        except Exception as e:
+            logger.warning("Could not release single-flight lock: %s", e)
+
+    async def _lead(self, key: str, fn):
+        lock, handle = (None, None) if SINGLEFLIGHT_BACKEND == "local" else await run_in_threadpool(self._acquire, key)
+        try:
+            return await fn()
+        finally:
+            if handle is not None:
+                await run_in_threadpool(self._release, lock, handle)
+
+    async def do(self, key: str, fn):
+        """Awaits fn() once for all concurrent callers of key; fn takes no arguments."""
+        loop = asyncio.get_running_loop()
+        slot = (loop, key)
+        task = self._tasks.get(slot)
+        leader = task is None
+        if leader:
+            task = loop.create_task(self._lead(key, fn))
+            self._tasks[slot] = task
+            task.add_done_callback(lambda t: self._forget(slot, t))
+        self._count(leader)
+        # Shielded so that one caller disconnecting does not cancel the others' result
+        return await asyncio.shield(task)
+
+    def _forget(self, slot, task):
+        if self._tasks.get(slot) is task:
+            del self._tasks[slot]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller was cancelled
+
+    def do_sync(self, key: str, fn):
+        """Thread-based counterpart of do()."""
+        with self._mutex:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+        self._count(leader)
+        if not leader:
+            return future.result()
+
+        lock, handle = self._acquire(key)
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if handle is not None:
+                self._release(lock, handle)
+            with self._mutex:
+                del self._futures[key]
+
+    def stats(self) -> dict:
+        coalesced = self.calls - self.executions
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": coalesced,
+            "coalescing_ratio": round(coalesced / self.calls, 3) if self.calls else 0.0,
+            "in_flight": len(self._tasks) + len(self._futures),
+            "lock_waits": self.lock_waits,
+            "lock_wait_seconds": round(self.lock_wait_seconds, 3),
+        }
+
+
+def flight_stats() -> dict:
+    return {name: group.stats() for name, group in _groups.items()}
@@ -0,0 +1,21 @@
+import json
+from fastapi.responses import StreamingResponse
+
+def format_sse(data, event: str = None) -> str:
+    """Encodes one server-sent event; data is JSON-encoded."""
+    message = f"data: {json.dumps(data, default=str)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+def sse_response(events) -> StreamingResponse:
+    """Wraps an async iterator of (event, data) pairs in a text/event-stream response."""
+    async def body():
+        async for event, data in events:
+            yield format_sse(data, event=event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
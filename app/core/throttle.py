@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+
+class TokenBucket:
+    """Token bucket refilling `rate` tokens per second up to `capacity`, for async and sync callers."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Sync callers share buckets across threads
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        if self.rate <= 0:
+            return True
+        # A request larger than the bucket waits for a full bucket instead of forever
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def refund(self, tokens: float = 1.0):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` could be taken, 0 if they can be now."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            return max(0.0, min(tokens, self.capacity) - self.tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0):
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(max(self.wait_time(tokens), 0.001))
+
+    def acquire_sync(self, tokens: float = 1.0):
+        while not self.try_acquire(tokens):
+            time.sleep(max(self.wait_time(tokens), 0.001))
+
+
+class HostThrottle:
+    """
+    Politeness limits per remote host: at most `concurrency` requests in flight
+    and `rate` requests started per second. Semaphores are kept per event loop.
+    """
+
+    def __init__(self, rate: float, concurrency: int):
+        self.rate = rate
+        self.concurrency = concurrency
+        self._buckets = {}
+        self._semaphores = weakref.WeakKeyDictionary()
+        self.waited = 0.0
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        semaphore = semaphores.setdefault(host, asyncio.Semaphore(self.concurrency))
+        started = time.monotonic()
+        async with semaphore:
+            await self._buckets.setdefault(host, TokenBucket(self.rate)).acquire()
+            self.waited += time.monotonic() - started
+            yield
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "concurrency": self.concurrency,
+            "hosts": len(self._buckets),
+            "waited_seconds": round(self.waited, 3),
+        }
@@ -1,22 +1,178 @@
 import os
-from sqlalchemy import create_engine
+import time
+import threading
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
+from app.core import metrics
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Defaults to DATABASE_URL with its async driver (asyncpg / aiosqlite)
+DATABASE_ASYNC_URL = os.getenv("DATABASE_ASYNC_URL")
 
-engine = create_engine(DATABASE_URL)
+# Per-process pool: size it so that workers x (size + overflow) stays under the
+# server's max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# PostgreSQL statement_timeout in milliseconds, 0 to disable
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.timeouts += timed_out
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_seconds / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.max_wait_seconds * 1000, 2),
+        }
+
+
+def _pool_options(url: str) -> dict:
+    if url.startswith("sqlite") and ":memory:" in url:
+        # In-memory SQLite lives and dies with its single connection
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def sync_database_url(url: str = None) -> str:
+    url = url or DATABASE_URL
+    # psycopg2 is the driver we ship; SQLAlchemy 2.1 would otherwise pick psycopg 3
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg2://" + url[len(prefix):]
+    return url
+
+
+def make_engine(url: str = None, **overrides):
+    url = sync_database_url(url)
+    pool = _pool_options(url)
+    if pool and not issubclass(overrides.get("poolclass", TimedQueuePool), QueuePool):
+        # e.g. NullPool for one-off scripts: only the per-connection settings apply
+        pool = {key: pool[key] for key in ("pool_recycle", "pool_pre_ping")}
+    options = {"poolclass": TimedQueuePool, **pool} if pool else {}
+    if url.startswith("postgres") and DB_STATEMENT_TIMEOUT_MS > 0:
+        options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    options.update(overrides)
+    return create_engine(url, **options)
+
+
+def async_database_url(url: str = None) -> str:
+    url = DATABASE_ASYNC_URL or url or DATABASE_URL
+    for sync_prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+def make_async_engine(url: str = None, **overrides):
+    """Async engine for handlers that want non-blocking queries; needs asyncpg or aiosqlite."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_database_url(url)
+    options = _pool_options(url)
+    if url.startswith("postgresql+asyncpg") and DB_STATEMENT_TIMEOUT_MS > 0:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+
+def pool_stats(bind=None) -> dict:
+    pool = (bind or engine).pool
+    return pool.stats() if isinstance(pool, TimedQueuePool) else {"pool": type(pool).__name__}
+
+
+engine = make_engine()
+
+# expire_on_commit=False: reading ids of freshly committed rows must not reopen a
+# transaction, or async handlers would pin a pooled connection until teardown.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
+
+# Commit time, the final flush included, as the "db_commit" stage; on every
+# Session so that the sync side of async sessions is timed too
+@event.listens_for(Session, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        metrics.record("db_commit", time.perf_counter() - started)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _commit_abandoned(session, previous_transaction):
+    session.info.pop("commit_started", None)
+
+_async_sessionmaker = None
+
+
+def get_async_sessionmaker():
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        _async_sessionmaker = async_sessionmaker(make_async_engine(), expire_on_commit=False)
+    return _async_sessionmaker
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
@@ -1,10 +1,17 @@
+from app.core import metrics
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine
-from app.models import Base
-from app.api import auth, ingestion, ai, upload
+from app.api import auth, ingestion, ai, upload, jobs, search, metrics as metrics_api
+from app.core.instrumentation import InstrumentationMiddleware
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.services.ingestion import ingestion_service
+from app.services.jobs import job_queue, JOB_WORKERS
+from app.services.llm_cache import llm_cache
+from app.services.pdf_service import pdf_service
+from app.services.password_service import password_service
+from app.services.quota import quota_service
 
-Base.metadata.create_all(bind=engine)
+# The schema is managed by Alembic: run `alembic upgrade head` before starting
 
 app = FastAPI(
     title="WikiSmart Edu",
@@ -19,12 +26,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Server-Timing"],
 )
+# Added last, so it wraps CORS and times whole requests
+app.add_middleware(InstrumentationMiddleware)
 
 app.include_router(auth.router)
 app.include_router(ingestion.router)
 app.include_router(ai.router)
 app.include_router(upload.router)
+app.include_router(jobs.router)
+app.include_router(search.router)
+app.include_router(metrics_api.router)
+metrics.mark("import_seconds")
+
+@app.on_event("startup")
+async def start_job_workers():
+    if JOB_WORKERS > 0:
+        await job_queue.start(JOB_WORKERS)
+    metrics.mark("startup_seconds")
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await job_queue.stop()
+    await ingestion_service.aclose()
+    pdf_service.shutdown()
+    password_service.shutdown()
+    quota_service.shutdown()
+    llm_cache.flush_hits()
 
 @app.get("/")
 def root():
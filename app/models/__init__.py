@@ -1,6 +1,17 @@
 from app.database import Base
 from .user import User
-from .article import Article
+from .article import Article, ArticleAction
+from .source import Source, SourceKind
 from .quiz_attempt import QuizAttempt
+from .quiz import Quiz, QuizQuestion
+from .wiki_article import WikiArticle
+from .job import Job
+from .llm_result import LLMResult
+from .uploaded_document import UploadedDocument
+from .stat_counter import StatCounter
+from .quota_usage import QuotaUsage
+from .quota_override import QuotaOverride
+from .search_section import SearchSection
+from .question_bank import QuestionBank, BankQuestion, BankQuestionSeen
 
-__all__ = ["Base", "User", "Article", "QuizAttempt"]
+__all__ = ["Base", "User", "Article", "ArticleAction", "Source", "SourceKind", "QuizAttempt", "Quiz", "QuizQuestion", "WikiArticle", "Job", "LLMResult", "UploadedDocument", "StatCounter", "QuotaUsage", "QuotaOverride", "SearchSection", "QuestionBank", "BankQuestion", "BankQuestionSeen"]
@@ -1,17 +1,46 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+import enum
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
+class ArticleAction(str, enum.Enum):
+    SUMMARY = "summary"
+    TRANSLATION = "translation"
+    QUIZ = "quiz"
+    PDF_SUMMARY = "pdf_summary"
+    PDF_TRANSLATION = "pdf_translation"
+    PDF_QUIZ = "pdf_quiz"
+
 class Article(Base):
     __tablename__ = "articles"
+    __table_args__ = (
+        # History pages: WHERE owner_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_articles_owner_created", "owner_id", "created_at", "id"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    url = Column(String)
+    id = Column(Integer, primary_key=True)
     title = Column(String)
-    action = Column(String)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    action = Column(Enum(ArticleAction, name="article_action", values_callable=lambda actions: [a.value for a in actions]))
+    # Stamped in Python so that SQLite stores microseconds like the keyset cursors do
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
     
     owner_id = Column(Integer, ForeignKey("users.id"))
+    source_id = Column(Integer, ForeignKey("sources.id"), nullable=False)
+    result_key = Column(String(64), ForeignKey("llm_results.key"), nullable=True)
+    # The quiz language: quizzes sampled from the bank have no result to read it from
+    language = Column(String(16), nullable=True)
     
     owner = relationship("User", back_populates="articles")
+    source = relationship("Source")
+    quizzes = relationship("Quiz", back_populates="article")
+    result = relationship("LLMResult")
+
+    @property
+    def url(self):
+        return self.source.locator if self.source is not None else None
+
+    @property
+    def output(self):
+        return self.result.output if self.result is not None else None
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class LLMResult(Base):
+    __tablename__ = "llm_results"
+
+    key = Column(String(64), primary_key=True)
+    operation = Column(String(32), nullable=False)
+    model = Column(String(64), nullable=False)
+    prompt_version = Column(String(16), nullable=False)
+    language = Column(String(32))
+    output = Column(Text, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
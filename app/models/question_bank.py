@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class QuestionBank(Base):
+    """One row per source and quiz language: when its questions were last requested and built."""
+    __tablename__ = "question_banks"
+
+    source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), primary_key=True)
+    language = Column(String(16), primary_key=True)
+    questions = Column(Integer, nullable=False, default=0)
+    sections = Column(Integer, nullable=False, default=0)
+    # A build is under way while requested_at is recent and later than built_at
+    requested_at = Column(DateTime(timezone=True))
+    built_at = Column(DateTime(timezone=True))
+
+class BankQuestion(Base):
+    __tablename__ = "bank_questions"
+    __table_args__ = (
+        Index("ix_bank_questions_source_language", "source_id", "language"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), nullable=False)
+    language = Column(String(16), nullable=False)
+    section = Column(String, nullable=False)
+    difficulty = Column(String(16), nullable=False)
+    question = Column(Text, nullable=False)
+    options = Column(JSON)
+    answer = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class BankQuestionSeen(Base):
+    """Bank questions already served to a user, skipped in their next quizzes on the source."""
+    __tablename__ = "bank_questions_seen"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    question_id = Column(Integer, ForeignKey("bank_questions.id", ondelete="CASCADE"), primary_key=True, index=True)
+    seen_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
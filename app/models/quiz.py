@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class Quiz(Base):
+    __tablename__ = "quizzes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    article_id = Column(Integer, ForeignKey("articles.id"), index=True)
+    language = Column(String(16))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    article = relationship("Article", back_populates="quizzes")
+    questions = relationship(
+        "QuizQuestion",
+        back_populates="quiz",
+        order_by="QuizQuestion.position",
+        cascade="all, delete-orphan",
+    )
+
+class QuizQuestion(Base):
+    __tablename__ = "quiz_questions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), index=True)
+    position = Column(Integer, nullable=False)
+    question = Column(Text, nullable=False)
+    options = Column(JSON)
+    answer = Column(Text, nullable=False)
+
+    quiz = relationship("Quiz", back_populates="questions")
@@ -1,15 +1,21 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float, Index
+from datetime import datetime, timezone
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class QuizAttempt(Base):
     __tablename__ = "quiz_attempts"
+    __table_args__ = (
+        Index("ix_quiz_attempts_user_submitted", "user_id", "submitted_at", "id"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     article_id = Column(Integer, ForeignKey("articles.id"))
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=True)
     score = Column(Float)
-    submitted_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Stamped in Python so that SQLite stores microseconds like the keyset cursors do
+    submitted_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
 
     user = relationship("User", back_populates="quiz_attempts")
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class QuotaOverride(Base):
+    """Per-user replacement of the default quota limits, set by admins."""
+    __tablename__ = "quota_overrides"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    # Requests per window on each endpoint; NULL keeps the endpoint defaults
+    requests = Column(Integer)
+    # Tokens per window across all endpoints; NULL keeps QUOTA_USER_TOKENS
+    tokens = Column(BigInteger)
+    exempt = Column(Boolean, nullable=False, default=False)
+    note = Column(String(255))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
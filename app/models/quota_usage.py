@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from app.database import Base
+
+class QuotaUsage(Base):
+    """
+    Counters of the database quota store, one row per user, metric and fixed
+    window. Rows are dead once expires_at has passed and are purged lazily.
+    """
+    __tablename__ = "quota_usage"
+
+    key = Column(String(160), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
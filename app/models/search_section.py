@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, UniqueConstraint, DDL, event
+from app.database import Base
+
+class SearchSection(Base):
+    """
+    Searchable text: the parts of a source's sections (ref "source:<id>") and
+    the outputs generated from it (ref "result:<key>"). The full-text index is
+    not mapped: a GIN index on PostgreSQL and the FTS5 table search_sections_fts
+    on SQLite, created along with this table.
+    """
+    __tablename__ = "search_sections"
+    __table_args__ = (
+        UniqueConstraint("ref", "position", name="uq_search_sections_ref_position"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    ref = Column(String(80), nullable=False)
+    position = Column(Integer, nullable=False)
+    source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Set on generated outputs, which are visible to the owners of articles that reference them
+    result_key = Column(String(64), ForeignKey("llm_results.key", ondelete="CASCADE"), index=True)
+    heading = Column(String)
+    body = Column(Text, nullable=False)
+
+# Kept in step with migrations/versions/0007_search.py
+POSTGRES_INDEX = (
+    "CREATE INDEX ix_search_sections_document ON search_sections "
+    "USING gin (to_tsvector('simple', coalesce(heading, '') || ' ' || body))"
+)
+SQLITE_FTS = (
+    "CREATE VIRTUAL TABLE search_sections_fts USING fts5(heading, body, content='search_sections', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER search_sections_ai AFTER INSERT ON search_sections BEGIN "
+    "INSERT INTO search_sections_fts(rowid, heading, body) VALUES (new.id, new.heading, new.body); END",
+    "CREATE TRIGGER search_sections_ad AFTER DELETE ON search_sections BEGIN "
+    "INSERT INTO search_sections_fts(search_sections_fts, rowid, heading, body) "
+    "VALUES ('delete', old.id, old.heading, old.body); END",
+    "CREATE TRIGGER search_sections_au AFTER UPDATE ON search_sections BEGIN "
+    "INSERT INTO search_sections_fts(search_sections_fts, rowid, heading, body) "
+    "VALUES ('delete', old.id, old.heading, old.body); "
+    "INSERT INTO search_sections_fts(rowid, heading, body) VALUES (new.id, new.heading, new.body); END",
+)
+
+event.listen(SearchSection.__table__, "after_create", DDL(POSTGRES_INDEX).execute_if(dialect="postgresql"))
+for _statement in SQLITE_FTS:
+    event.listen(SearchSection.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(SearchSection.__table__, "before_drop", DDL("DROP TABLE IF EXISTS search_sections_fts").execute_if(dialect="sqlite"))
@@ -0,0 +1,18 @@
+import enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum
+from sqlalchemy.sql import func
+from app.database import Base
+
+class SourceKind(str, enum.Enum):
+    WIKI = "wiki"
+    DOCUMENT = "document"
+
+class Source(Base):
+    """One row per Wikipedia page or uploaded document, shared by every Article made from it."""
+    __tablename__ = "sources"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(Enum(SourceKind, name="source_kind", values_callable=lambda kinds: [k.value for k in kinds]), nullable=False)
+    locator = Column(String, unique=True, nullable=False)
+    title = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, BigInteger, Float
+from app.database import Base
+
+# Bucket holding all-time values; every other bucket is an ISO day (UTC)
+TOTAL_BUCKET = "total"
+
+class StatCounter(Base):
+    """
+    Rollup of dashboard counters, maintained as rows are inserted. Each increment
+    goes to the all-time bucket and to the bucket of its day, so the dashboard
+    reads a few hundred rows however large the underlying tables are.
+    """
+    __tablename__ = "stat_counters"
+
+    bucket = Column(String(10), primary_key=True)
+    metric = Column(String(32), primary_key=True)
+    dimension = Column(String(64), primary_key=True, default="")
+    count = Column(BigInteger, nullable=False, default=0)
+    # Running sum for averaged metrics such as quiz scores
+    total = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+class UploadedDocument(Base):
+    __tablename__ = "uploaded_documents"
+
+    sha256 = Column(String(64), primary_key=True)
+    filename = Column(String)
+    size = Column(BigInteger, nullable=False)
+    page_count = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+class WikiArticle(Base):
+    __tablename__ = "wiki_articles"
+    __table_args__ = (
+        UniqueConstraint("lang", "title", "revision_id", name="uq_wiki_articles_revision"),
+        Index("ix_wiki_articles_lang_title", "lang", "title"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    lang = Column(String(16), nullable=False)
+    title = Column(String, nullable=False)
+    canonical_title = Column(String, nullable=False)
+    revision_id = Column(BigInteger, nullable=False)
+    sections = Column(JSON, nullable=False)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -23,6 +23,7 @@ class ArticleHistory(BaseModel):
     title: str
     action: str
     created_at: datetime
+    output: Optional[str] = None
 
     class Config:
         from_attributes = True
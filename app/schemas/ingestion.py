@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+class BatchIngestRequest(BaseModel):
+    urls: List[str] = []
+    # A category name, with or without the "Category:" prefix, expanded to its articles
+    category: Optional[str] = None
+    lang: str = "en"
+    actions: List[Literal["summarize", "quiz"]] = []
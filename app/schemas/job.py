@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, Any
+
+class JobSubmitted(BaseModel):
+    job_id: str
+    status: str
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    result: Optional[Any] = None
+    progress: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,5 @@
+from pydantic import BaseModel, Field
+
+class ProfilingSettings(BaseModel):
+    sample_rate: float = Field(..., ge=0, le=1, description="Share of requests profiled, 0 to stop")
+    min_ms: float = Field(0, ge=0, description="Profiles of faster requests are discarded")
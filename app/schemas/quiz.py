@@ -8,6 +8,7 @@ class QuizAnswer(BaseModel):
 
 class QuizSubmission(BaseModel):
     article_id: int
+    quiz_id: Optional[int] = None
     answers: List[QuizAnswer]
 
 class QuizResult(BaseModel):
@@ -23,6 +24,7 @@ class QuizResult(BaseModel):
 class QuizAttemptOut(BaseModel):
     id: int
     article_id: int
+    quiz_id: Optional[int] = None
     score: float
     submitted_at: datetime
 
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+class QuotaOverrideIn(BaseModel):
+    requests: Optional[int] = Field(None, ge=0, description="Requests per window on each endpoint, 0 for no limit")
+    tokens: Optional[int] = Field(None, ge=0, description="LLM tokens per window, 0 for no limit")
+    exempt: bool = False
+    note: Optional[str] = Field(None, max_length=255)
+
+class QuotaOverrideOut(QuotaOverrideIn):
+    user_id: int
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
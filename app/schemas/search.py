@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class SearchHit(BaseModel):
+    article_id: int
+    title: Optional[str] = None
+    action: str
+    # Wikipedia page of the source; None for uploaded documents
+    url: Optional[str] = None
+    # "source" for article and document text, "output" for generated summaries, translations and quizzes
+    match: str
+    heading: Optional[str] = None
+    snippet: str
+    score: float
@@ -1,50 +1,224 @@
 import os
-from groq import Groq
-from dotenv import load_dotenv
+import asyncio
+from app.core.singleflight import SingleFlight
+from app.services.llm_cache import llm_cache
+from app.services.llm_router import llm_router
+from app.services.chunking import chunk_text
 
-load_dotenv()
+# Window size for map-reduce summarization, and how many chunk calls may hit Groq at once
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+
+LANG_MAP = {
+    "en": "English",
+    "fr": "French",
+    "ar": "Arabic",
+    "es": "Spanish"
+}
 
 class AIService:
+    # Bump whenever build_summary_messages changes so cached summaries are not reused
+    SUMMARY_PROMPT_VERSION = "2"
+    CHUNK_PROMPT_VERSION = "2"
+
     def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.model = "llama-3.3-70b-versatile"
+        # Calls go through the router; cache keys use its primary summarization model
+        self.model = llm_router.model_for("summarize")
+        self._chunk_slots = None
+        # Identical concurrent requests share one Groq call
+        self.flight = SingleFlight("groq")
+
+    def build_summary_messages(self, text: str, lang_code: str) -> list:
+        language_name = LANG_MAP.get(lang_code, lang_code)
+
+        system_prompt = (
+            f"Summarize the text for a student, in {language_name} only: a structured, dense summary "
+            f"of its key ideas, terms, names, dates and figures. Start directly with the content, no preamble."
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ]
+
+    def summary_spec(self, text: str, lang_code: str):
+        return llm_cache.spec("summarize", self.model, self.SUMMARY_PROMPT_VERSION, lang_code, text)
 
     def summarize_text(self, text: str, lang_code: str):
         """
         Summarizes text strictly in the provided language code.
         """
-        lang_map = {
-            "en": "English",
-            "fr": "French",
-            "ar": "Arabic",
-            "es": "Spanish"
-        }
-        language_name = lang_map.get(lang_code, lang_code)
+        spec = self.summary_spec(text, lang_code)
+        cached = llm_cache.get(spec)
+        if cached is not None:
+            return cached
 
-        system_prompt = (
-            f"### ROLE\n"
-            f"You are a Senior Academic Content Synthesizer. Your mission is to facilitate autonomous learning by "
-            f"transforming complex Wikipedia articles into high-density, structured educational summaries.\n\n"
-            f"### OBJECTIVE\n"
-            f"Synthesize the provided text into a logically structured summary in {language_name}.\n\n"
-            f"### OUTPUT CONSTRAINTS\n"
-            f"- **Language**: You MUST output exclusively in {language_name}.\n"
-            f"- **Zero Meta-Talk**: Do NOT include any introductory remarks (e.g., 'Here is the summary').\n"
-            f"- **Direct Entry**: Start the summary immediately with the first sentence."
+        try:
+            return self.flight.do_sync(spec.key, lambda: self._complete_summary(spec, text, lang_code))
+        except Exception as e:
+            return f"Error with Groq: {str(e)}"
+
+    def _complete_summary(self, spec, text: str, lang_code: str) -> str:
+        # Re-checked inside the flight: another worker may have just stored it
+        cached = llm_cache.get(spec, record=False)
+        if cached is not None:
+            return cached
+
+        completion = llm_router.complete_sync(
+            "summarize",
+            self.build_summary_messages(text, lang_code),
+            temperature=0.1,
+            max_tokens=1000,
         )
+        summary = completion.text.strip()
+        llm_cache.put(spec, summary, completion.model)
+        return summary
 
+    async def summarize_text_async(self, text: str, lang_code: str, raise_errors: bool = False):
+        """
+        Same as summarize_text, without blocking the event loop.
+        With raise_errors the Groq exception propagates instead of becoming the summary.
+        """
         try:
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ],
+            summary, _ = await self._summarize(text, lang_code)
+            return summary
+        except Exception as e:
+            if raise_errors:
+                raise
+            return f"Error with Groq: {str(e)}"
+
+    async def _summarize(self, text: str, lang_code: str) -> tuple:
+        """The summary and the model that wrote it; cached outputs are always self.model's."""
+        spec = self.summary_spec(text, lang_code)
+        cached = await llm_cache.get_async(spec)
+        if cached is not None:
+            return cached, self.model
+        return await self.flight.do(spec.key, lambda: self._complete_summary_async(spec, text, lang_code))
+
+    async def _complete_summary_async(self, spec, text: str, lang_code: str) -> tuple:
+        cached = await llm_cache.get_async(spec, record=False)
+        if cached is not None:
+            return cached, self.model
+
+        completion = await llm_router.complete(
+            "summarize",
+            self.build_summary_messages(text, lang_code),
+            temperature=0.1,
+            max_tokens=1000,
+        )
+        summary = completion.text.strip()
+        await llm_cache.put_async(spec, summary, completion.model)
+        return summary, completion.model
+
+    async def stream_summary(self, text: str, lang_code: str):
+        """
+        Yields the summary as the provider generates it. Errors propagate to the caller.
+        """
+        async for delta in llm_router.stream(
+            "summarize",
+            self.build_summary_messages(text, lang_code),
+            temperature=0.1,
+            max_tokens=1000,
+        ):
+            yield delta
+
+    def build_chunk_messages(self, text: str, lang_code: str) -> list:
+        language_name = LANG_MAP.get(lang_code, lang_code)
+
+        system_prompt = (
+            f"Condense this excerpt of a longer document into dense notes in {language_name} only. "
+            f"Keep every key fact, name, date and figure; drop examples and repetition. Output only the notes."
+        )
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ]
+
+    def document_summary_spec(self, chunks: list, lang_code: str):
+        if len(chunks) <= 1:
+            return self.summary_spec(chunks[0] if chunks else "", lang_code)
+        version = f"{self.SUMMARY_PROMPT_VERSION}.{self.CHUNK_PROMPT_VERSION}.{SUMMARY_CHUNK_TOKENS}"
+        return llm_cache.spec("summarize_document", self.model, version, lang_code, "\n\n".join(chunks))
+
+    async def _summarize_chunk(self, text: str, lang_code: str) -> tuple:
+        spec = llm_cache.spec("summarize_chunk", self.model, self.CHUNK_PROMPT_VERSION, lang_code, text)
+        cached = await llm_cache.get_async(spec)
+        if cached is not None:
+            return cached, self.model
+        return await self.flight.do(spec.key, lambda: self._complete_chunk(spec, text, lang_code))
+
+    async def _complete_chunk(self, spec, text: str, lang_code: str) -> tuple:
+        cached = await llm_cache.get_async(spec, record=False)
+        if cached is not None:
+            return cached, self.model
+
+        if self._chunk_slots is None:
+            self._chunk_slots = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+        async with self._chunk_slots:
+            completion = await llm_router.complete(
+                "summarize",
+                self.build_chunk_messages(text, lang_code),
                 temperature=0.1,
-                max_tokens=1000,
+                max_tokens=400,
             )
-            return completion.choices[0].message.content.strip()
+        notes = completion.text.strip()
+        await llm_cache.put_async(spec, notes, completion.model)
+        return notes, completion.model
+
+    async def condense_chunks(self, chunks: list, lang_code: str) -> tuple:
+        """
+        Map step over all chunks in parallel, then reduce the notes level by level
+        until they fit in a single window. Chunk notes are cached individually, so
+        documents sharing sections reuse each other's work. Returns the notes and
+        the model that wrote them, None when several did after a failover.
+        """
+        results = await asyncio.gather(*(self._summarize_chunk(c, lang_code) for c in chunks))
+        models = {model for _, model in results}
+        while True:
+            windows = chunk_text("\n\n".join(notes for notes, _ in results), SUMMARY_CHUNK_TOKENS)
+            if len(windows) <= 1:
+                return (windows[0] if windows else ""), (models.pop() if len(models) == 1 else None)
+            results = await asyncio.gather(*(self._summarize_chunk(w, lang_code) for w in windows))
+            models.update(model for _, model in results)
+
+    async def summarize_document_async(self, chunks: list, lang_code: str, raise_errors: bool = False):
+        """
+        Summarizes a whole document given as windows from app.services.chunking.
+        A single window is the same call as summarize_text_async.
+        """
+        if len(chunks) <= 1:
+            return await self.summarize_text_async(chunks[0] if chunks else "", lang_code, raise_errors=raise_errors)
+
+        spec = self.document_summary_spec(chunks, lang_code)
+        cached = await llm_cache.get_async(spec)
+        if cached is not None:
+            return cached
+
+        try:
+            return await self.flight.do(spec.key, lambda: self._complete_document(spec, chunks, lang_code))
         except Exception as e:
+            if raise_errors:
+                raise
             return f"Error with Groq: {str(e)}"
 
-ai_service = AIService()
\ No newline at end of file
+    async def _complete_document(self, spec, chunks: list, lang_code: str) -> str:
+        cached = await llm_cache.get_async(spec, record=False)
+        if cached is not None:
+            return cached
+
+        notes, notes_model = await self.condense_chunks(chunks, lang_code)
+        summary, model = await self._summarize(notes, lang_code)
+        await llm_cache.put_async(spec, summary, model if model == notes_model else None)
+        return summary
+
+    async def stream_document_summary(self, chunks: list, lang_code: str):
+        """
+        Runs the map and reduce steps up front, then streams the final summary.
+        """
+        text, model = await self.condense_chunks(chunks, lang_code) if len(chunks) > 1 else (chunks[0] if chunks else "", self.model)
+        async for delta in self.stream_summary(text, lang_code):
+            yield delta
+        if model != self.model:
+            # The notes came from a fallback provider, whoever streamed the summary
+            llm_router.clear_streamed_by()
+
+ai_service = AIService()
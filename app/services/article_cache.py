@@ -0,0 +1,125 @@
+import os
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from sqlalchemy.exc import SQLAlchemyError
+from app.core.cache import LRUCache
+from app.database import SessionLocal
+from app.models.wiki_article import WikiArticle
+from app.services.sections import SectionMap
+
+logger = logging.getLogger(__name__)
+
+WIKI_CACHE_TTL = int(os.getenv("WIKI_CACHE_TTL", "3600"))
+WIKI_CACHE_MAX_ENTRIES = int(os.getenv("WIKI_CACHE_MAX_ENTRIES", "512"))
+WIKI_CACHE_MAX_BYTES = int(os.getenv("WIKI_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+@dataclass
+class CachedArticle:
+    title: str
+    revision_id: int
+    # A SectionMap as segmented, a dict once read back from the database
+    sections: dict
+    fresh: bool = True
+
+
+def _sections_size(article: CachedArticle) -> int:
+    if isinstance(article.sections, SectionMap):
+        return article.sections.size
+    return sum(len(k) + len(v) for k, v in article.sections.items())
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class ArticleCache:
+    """
+    Two-tier cache of segmented Wikipedia articles keyed by (lang, normalized title).
+    Tier 1 is an in-process LRU bounded by entries and bytes; tier 2 is the
+    wiki_articles table, which survives restarts and is shared between workers.
+    Entries older than the TTL are returned as stale so the caller can revalidate
+    them with a revision check instead of refetching the whole page.
+    """
+
+    def __init__(self):
+        self.memory = LRUCache(
+            max_entries=WIKI_CACHE_MAX_ENTRIES,
+            max_bytes=WIKI_CACHE_MAX_BYTES,
+            ttl=WIKI_CACHE_TTL,
+            sizeof=_sections_size,
+        )
+
+    def get(self, lang: str, title: str):
+        return self.get_memory(lang, title) or self.get_persistent(lang, title)
+
+    def get_memory(self, lang: str, title: str):
+        hit = self.memory.peek((lang, title))
+        if hit is None:
+            return None
+        article, fresh = hit
+        return CachedArticle(article.title, article.revision_id, article.sections, fresh)
+
+    def get_persistent(self, lang: str, title: str):
+        try:
+            with SessionLocal() as db:
+                row = (
+                    db.query(WikiArticle)
+                    .filter(WikiArticle.lang == lang, WikiArticle.title == title)
+                    .order_by(WikiArticle.fetched_at.desc())
+                    .first()
+                )
+        except SQLAlchemyError as e:
+            logger.warning("Article cache lookup failed: %s", e)
+            return None
+        if row is None:
+            return None
+
+        age = (datetime.now(timezone.utc) - _as_utc(row.fetched_at)).total_seconds()
+        article = CachedArticle(row.canonical_title, row.revision_id, row.sections)
+        if age < WIKI_CACHE_TTL:
+            self.memory.set((lang, title), article)
+        return CachedArticle(article.title, article.revision_id, article.sections, age < WIKI_CACHE_TTL)
+
+    def put(self, lang: str, title: str, canonical_title: str, revision_id: int, sections: dict):
+        self.memory.set((lang, title), CachedArticle(canonical_title, revision_id, sections))
+        try:
+            with SessionLocal() as db:
+                db.query(WikiArticle).filter(
+                    WikiArticle.lang == lang,
+                    WikiArticle.title == title,
+                    WikiArticle.revision_id != revision_id,
+                ).delete(synchronize_session=False)
+                row = db.query(WikiArticle).filter(
+                    WikiArticle.lang == lang,
+                    WikiArticle.title == title,
+                    WikiArticle.revision_id == revision_id,
+                ).first()
+                if row is None:
+                    row = WikiArticle(lang=lang, title=title, revision_id=revision_id)
+                    db.add(row)
+                row.canonical_title = canonical_title
+                # Outlines from segment_content are stored flattened
+                row.sections = dict(sections)
+                row.fetched_at = datetime.now(timezone.utc)
+                db.commit()
+        except SQLAlchemyError as e:
+            logger.warning("Article cache write failed: %s", e)
+
+    def touch(self, lang: str, title: str, cached: CachedArticle):
+        """Marks a stale entry as fresh after its revision id was confirmed unchanged."""
+        self.memory.set((lang, title), CachedArticle(cached.title, cached.revision_id, cached.sections))
+        try:
+            with SessionLocal() as db:
+                db.query(WikiArticle).filter(
+                    WikiArticle.lang == lang,
+                    WikiArticle.title == title,
+                    WikiArticle.revision_id == cached.revision_id,
+                ).update({"fetched_at": datetime.now(timezone.utc)}, synchronize_session=False)
+                db.commit()
+        except SQLAlchemyError as e:
+            logger.warning("Article cache touch failed: %s", e)
+
+article_cache = ArticleCache()
@@ -0,0 +1,51 @@
+import re
+
+# Rough, language-agnostic estimate used for sizing windows
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _split_long(unit: str, max_chars: int):
+    """Splits an oversized block at whitespace so no piece exceeds max_chars."""
+    while len(unit) > max_chars:
+        cut = unit.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield unit[:cut].strip()
+        unit = unit[cut:].strip()
+    if unit:
+        yield unit
+
+
+def _pack(units, max_tokens: int, chars_per_token: float) -> list:
+    max_chars = int(max_tokens * chars_per_token)
+    chunks, current, size = [], [], 0
+    for unit in units:
+        for piece in _split_long(unit, max_chars):
+            if current and size + len(piece) > max_chars:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def chunk_text(text: str, max_tokens: int, chars_per_token: float = CHARS_PER_TOKEN) -> list:
+    """
+    Packs paragraphs of free text (e.g. PDF pages) into windows of at most max_tokens.
+    Pass the text's measured chars_per_token (see app.services.text_prep) for scripts
+    far from the default, such as Arabic.
+    """
+    paragraphs = (p.strip() for p in re.split(r"\n\s*\n", text))
+    return _pack((p for p in paragraphs if p), max_tokens, chars_per_token)
+
+
+def chunk_sections(sections: dict, max_tokens: int, chars_per_token: float = CHARS_PER_TOKEN) -> list:
+    """Packs consecutive article sections into windows, keeping each section's heading."""
+    units = (f"{title}\n{body.strip()}" for title, body in sections.items() if body.strip())
+    return _pack(units, max_tokens, chars_per_token)
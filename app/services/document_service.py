@@ -0,0 +1,101 @@
+import os
+import hashlib
+import logging
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models.uploaded_document import UploadedDocument
+from app.services.pdf_service import pdf_service
+from app.services.text_prep import text_prep
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_READ_CHUNK = int(os.getenv("UPLOAD_READ_CHUNK", str(1024 * 1024)))
+# Larger uploads are refused while they are read, before they are buffered whole
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+
+class DocumentService:
+    """
+    Content-addressed store of uploaded PDFs. Uploads are hashed while they are
+    read, and a document seen before is served from the uploaded_documents table
+    without being parsed again.
+    """
+
+    @staticmethod
+    def document_url(sha256: str) -> str:
+        return f"document:{sha256}"
+
+    async def read_upload(self, file: UploadFile):
+        """
+        Hashes the upload in chunks, returning its SHA-256 hex digest and size,
+        then rewinds it: extraction reads the spooled upload itself, so it is
+        never copied into memory. Raises 413 as soon as it grows past
+        MAX_UPLOAD_BYTES.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        while True:
+            chunk = await file.read(UPLOAD_READ_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Uploads are limited to {MAX_UPLOAD_BYTES} bytes",
+                )
+            digest.update(chunk)
+        await file.seek(0)
+        return digest.hexdigest(), size
+
+    def get(self, sha256: str):
+        with SessionLocal() as db:
+            return db.get(UploadedDocument, sha256)
+
+    def extract(self, sha256: str, source, size: int, filename: str, max_chars: int = None) -> UploadedDocument:
+        """
+        The document with its text, not stored. source is the PDF as bytes or
+        a seekable file; see PDFService.extract_pages for max_chars.
+        """
+        pages = pdf_service.extract_pages(source, max_chars)
+        return UploadedDocument(
+            sha256=sha256,
+            filename=filename,
+            size=size,
+            page_count=len(pages) if max_chars is None else pdf_service.page_count(source),
+            # Without page numbers, running headers and footers
+            text=text_prep.clean_pages(pages),
+        )
+
+    def store(self, sha256: str, source, size: int, filename: str) -> UploadedDocument:
+        document = self.extract(sha256, source, size, filename)
+        with SessionLocal() as db:
+            db.add(document)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another request stored the same document first
+                db.rollback()
+                return db.get(UploadedDocument, sha256)
+        return document
+
+    async def ingest(self, file: UploadFile, max_chars: int = None) -> UploadedDocument:
+        """
+        The upload's stored document, extracted and stored first if it is new.
+        Callers that use only the beginning of the text pass max_chars: a new
+        document is then read up to there and not stored, since stored text is
+        always whole.
+        """
+        sha256, size = await self.read_upload(file)
+        document = await run_in_threadpool(self.get, sha256)
+        if document is not None:
+            logger.debug("Reusing extracted text for %s", sha256)
+        elif max_chars is not None:
+            document = await run_in_threadpool(self.extract, sha256, file.file, size, file.filename, max_chars)
+        else:
+            document = await run_in_threadpool(self.store, sha256, file.file, size, file.filename)
+        return document
+
+document_service = DocumentService()
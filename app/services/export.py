@@ -1,47 +1,276 @@
+import os
+import re
+import time
+import zipfile
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import Counter
+from dataclasses import dataclass
 from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
-from io import BytesIO
-import textwrap
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+from app.core import metrics
+from app.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Rendered exports, named by the hash of what they were rendered from
+EXPORT_DIR = os.getenv("EXPORT_DIR", "var/exports")
+# Least recently downloaded artifacts are removed past this size
+EXPORT_MAX_BYTES = int(os.getenv("EXPORT_MAX_BYTES", str(512 * 1024 * 1024)))
+# Most articles in one history archive
+EXPORT_HISTORY_MAX = int(os.getenv("EXPORT_HISTORY_MAX", "500"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Bump when the layout changes so that stored artifacts are rendered again
+RENDER_VERSION = "2"
+MEDIA_TYPES = {"txt": "text/plain; charset=utf-8", "pdf": "application/pdf"}
+UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+@dataclass(frozen=True)
+class Artifact:
+    key: str
+    format: str
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.key}"'
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+    @property
+    def path(self) -> str:
+        return os.path.join(EXPORT_DIR, self.key[:2], f"{self.key}.{self.format}")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header lists etag (weak comparison, as for GET)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def export_filename(title: str, format: str) -> str:
+    name = UNSAFE_FILENAME.sub("_", title or "").strip(" .") or "export"
+    return f"{name[:120]}.{format}"
+
+
+class _ZipSink:
+    """Unseekable file object that buffers what ZipFile writes until it is drained."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        parts, self.parts = self.parts, []
+        return parts
+
 
 class ExportService:
+    """
+    Renders article outputs to TXT and PDF once and keeps the files under
+    EXPORT_DIR, keyed by a hash of format, renderer version, title and content.
+    The key doubles as the ETag, so unchanged downloads revalidate without
+    touching the disk and repeat downloads are served from the stored file.
+    """
+
+    def __init__(self):
+        self.flight = SingleFlight("export")
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._stored_bytes = None
+
+    @staticmethod
+    def quiz_to_text(quiz: dict) -> str:
+        lines = []
+        for i, q in enumerate(quiz.get("quiz", []), 1):
+            lines.append(f"{i}. {q.get('question', '')}")
+            for option in q.get("options", []):
+                lines.append(f"   - {option}")
+            lines.append(f"   Answer: {q.get('answer', '')}")
+            lines.append("")
+        return "\n".join(lines)
+
     @staticmethod
-    def export_to_txt(title: str, content: str) -> BytesIO:
-        buffer = BytesIO()
-        text = f"Title: {title}\n\n{content}"
-        buffer.write(text.encode('utf-8'))
-        buffer.seek(0)
-        return buffer
+    def artifact(format: str, title: str, content: str) -> Artifact:
+        digest = hashlib.sha256()
+        for part in (format, RENDER_VERSION, title or "", content):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return Artifact(digest.hexdigest(), format)
+
+    # Rendering
 
     @staticmethod
-    def export_to_pdf(title: str, content: str) -> BytesIO:
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=letter)
+    def write_txt(f, title: str, content: str):
+        f.write(f"Title: {title}\n\n".encode("utf-8"))
+        for start in range(0, len(content), EXPORT_CHUNK_BYTES):
+            f.write(content[start:start + EXPORT_CHUNK_BYTES].encode("utf-8"))
+
+    @staticmethod
+    def write_pdf(f, title: str, content: str):
+        """Lays out paragraphs wrapped to the measured text width, one text object per page."""
         width, height = letter
-        
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(1*inch, height - 1*inch, title)
-        
-        c.setFont("Helvetica", 11)
-        y_position = height - 1.5*inch
-        
-        wrapped_lines = []
-        for paragraph in content.split('\n'):
-            if paragraph.strip():
-                wrapped_lines.extend(textwrap.wrap(paragraph, width=80))
-                wrapped_lines.append('')
-        
-        for line in wrapped_lines:
-            if y_position < 1*inch:
-                c.showPage()
-                c.setFont("Helvetica", 11)
-                y_position = height - 1*inch
-            
-            c.drawString(1*inch, y_position, line)
-            y_position -= 0.2*inch
-        
+        margin, leading, font, size = 1 * inch, 0.2 * inch, "Helvetica", 11
+        c = canvas.Canvas(f, pagesize=letter, pageCompression=1)
+        c.setTitle(title or "")
+
+        text = c.beginText(margin, height - margin)
+        text.setFont("Helvetica-Bold", 16, 0.3 * inch)
+        for line in simpleSplit(title or "", "Helvetica-Bold", 16, width - 2 * margin):
+            text.textLine(line)
+        text.setFont(font, size, leading)
+        text.textLine("")
+
+        for paragraph in content.split("\n"):
+            if not paragraph.strip():
+                continue
+            for line in simpleSplit(paragraph, font, size, width - 2 * margin) + [""]:
+                if text.getY() < margin:
+                    c.drawText(text)
+                    c.showPage()
+                    text = c.beginText(margin, height - margin)
+                    text.setFont(font, size, leading)
+                text.textLine(line)
+        c.drawText(text)
         c.save()
-        buffer.seek(0)
-        return buffer
+
+    def _render(self, artifact: Artifact, title: str, content: str) -> str:
+        path = artifact.path
+        if os.path.exists(path):
+            return path
+        started = time.perf_counter()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written beside the final path and renamed, so readers never see a partial file
+        fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if artifact.format == "pdf":
+                    self.write_pdf(f, title, content)
+                else:
+                    self.write_txt(f, title, content)
+            os.replace(partial, path)
+        except BaseException:
+            os.unlink(partial)
+            raise
+        size = os.path.getsize(path)
+        rendered = time.perf_counter() - started
+        metrics.record("export_render", rendered)
+        with self._lock:
+            self.counters["renders"] += 1
+            self.counters["rendered_bytes"] += size
+            self.counters["render_ms"] += round(rendered * 1000)
+            if self._stored_bytes is not None:
+                self._stored_bytes += size
+            over = self._stored_bytes is None or self._stored_bytes > EXPORT_MAX_BYTES
+        if over:
+            self.prune()
+        return path
+
+    def materialize(self, artifact: Artifact, title: str, content: str) -> str:
+        """Path of the stored artifact, rendered first if it is not stored yet. Blocking."""
+        path = artifact.path
+        try:
+            # Refreshes the modification time that pruning orders by
+            os.utime(path)
+        except FileNotFoundError:
+            return self.flight.do_sync(artifact.key, lambda: self._render(artifact, title, content))
+        with self._lock:
+            self.counters["hits"] += 1
+        return path
+
+    def prune(self):
+        """Removes the least recently used artifacts until the store fits EXPORT_MAX_BYTES."""
+        files = []
+        for root, _, names in os.walk(EXPORT_DIR):
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        # Leaves a tenth of headroom so that pruning does not run on every render
+        for _, size, path in sorted(files):
+            if total <= EXPORT_MAX_BYTES * 0.9:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._stored_bytes = total
+            self.counters["pruned"] += removed
+        if removed:
+            logger.info("Pruned %d export artifacts", removed)
+
+    # Archives
+
+    @staticmethod
+    def archive_etag(format: str, versions: list) -> str:
+        """ETag of an archive of entries identified by versions, known before any of them is rendered."""
+        digest = hashlib.sha256()
+        for part in (format, RENDER_VERSION, *versions):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return f'"{digest.hexdigest()}"'
+
+    def zip_stream(self, entries: list):
+        """
+        Yields a zip of (name, artifact, title, content) entries as it is built,
+        rendering missing artifacts on the way. Blocking: iterate it in a thread.
+        """
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, "w") as archive:
+            for name, artifact, title, content in entries:
+                path = self.materialize(artifact, title, content)
+                # Compressed PDFs gain nothing from deflating them again
+                compression = zipfile.ZIP_STORED if artifact.format == "pdf" else zipfile.ZIP_DEFLATED
+                info = zipfile.ZipInfo(name, time.localtime()[:6])
+                info.compress_type = compression
+                with open(path, "rb") as source, archive.open(info, "w") as target:
+                    while block := source.read(EXPORT_CHUNK_BYTES):
+                        target.write(block)
+                        yield from sink.drain()
+                yield from sink.drain()
+        yield from sink.drain()
+        with self._lock:
+            self.counters["archives"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            stored = self._stored_bytes
+        served = counters.get("hits", 0) + counters.get("renders", 0)
+        return {
+            **counters,
+            "hit_ratio": round(counters.get("hits", 0) / served, 3) if served else 0.0,
+            "stored_bytes": stored,
+            "max_bytes": EXPORT_MAX_BYTES,
+        }
 
 export_service = ExportService()
@@ -1,56 +1,179 @@
-import os
 import json
-import google.generativeai as genai
-from dotenv import load_dotenv
-
-load_dotenv()
+from app.core.singleflight import SingleFlight
+from app.services.llm_cache import llm_cache
+from app.services.llm_router import llm_router
 
 class GeminiService:
+    # Bump whenever a prompt builder changes so cached outputs are not reused
+    TRANSLATION_PROMPT_VERSION = "2"
+    QUIZ_PROMPT_VERSION = "2"
+    BANK_PROMPT_VERSION = "1"
+    LANGUAGE_NAMES = {"en": "English", "fr": "French", "ar": "Arabic", "es": "Spanish"}
+
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        genai.configure(api_key=api_key)
-        
-        # Using gemini-2.5-flash - the latest stable model available
-        self.model_name = 'models/gemini-2.5-flash' 
-        self.model = genai.GenerativeModel(self.model_name)
+        # Identical concurrent requests share one Gemini call
+        self.flight = SingleFlight("gemini")
+
+    def build_translation_prompt(self, text: str, target_lang: str) -> str:
+        return f"Translate into {target_lang}. Output only the translation.\n\n{text}"
+
+    def build_quiz_prompt(self, text: str, lang_code: str) -> str:
+        language_name = self.LANGUAGE_NAMES.get(lang_code, lang_code)
+
+        return (
+            f"Write a 5-question multiple-choice quiz in {language_name} on the text. Return only JSON: "
+            f'{{"quiz": [{{"question": ..., "options": [4 strings], "answer": one of the options}}]}}\n\n{text}'
+        )
+
+    def build_bank_prompt(self, text: str, lang_code: str, count: int) -> str:
+        language_name = self.LANGUAGE_NAMES.get(lang_code, lang_code)
+
+        return (
+            f"Write {count} multiple-choice questions in {language_name} on this section of an article, "
+            "answerable from it alone and covering all of it: a third easy (a stated fact), a third medium "
+            "(how facts relate) and a third hard (what follows from them). Return only JSON: "
+            f'{{"quiz": [{{"question": ..., "options": [4 strings], "answer": one of the options, '
+            f'"difficulty": "easy", "medium" or "hard"}}]}}\n\n{text}'
+        )
+
+    def messages(self, prompt: str) -> list:
+        return [{"role": "user", "content": prompt}]
+
+    def translation_spec(self, text: str, target_lang: str):
+        return llm_cache.spec("translate", llm_router.model_for("translate"), self.TRANSLATION_PROMPT_VERSION, target_lang, text)
+
+    def quiz_spec(self, text: str, lang_code: str):
+        return llm_cache.spec("quiz", llm_router.model_for("quiz"), self.QUIZ_PROMPT_VERSION, lang_code, text)
+
+    def bank_spec(self, text: str, lang_code: str, count: int):
+        return llm_cache.spec("quiz_bank", llm_router.model_for("quiz"), f"{self.BANK_PROMPT_VERSION}.{count}", lang_code, text)
 
     def translate_text(self, text: str, target_lang: str):
         if not text: return "No text provided."
-        
-        prompt = (
-            f"You are a professional translator. Translate this text into {target_lang}. "
-            f"Output ONLY the translated text.\n\nText: {text}"
-        )
-        
+
+        spec = self.translation_spec(text, target_lang)
+        cached = llm_cache.get(spec)
+        if cached is not None:
+            return cached
+
+        try:
+            return self.flight.do_sync(spec.key, lambda: self._complete_translation(spec, text, target_lang))
+        except Exception as e:
+            return f"Gemini Error: {str(e)}"
+
+    def _complete_translation(self, spec, text: str, target_lang: str) -> str:
+        # Re-checked inside the flight: another worker may have just stored it
+        cached = llm_cache.get(spec, record=False)
+        if cached is not None:
+            return cached
+
+        completion = llm_router.complete_sync("translate", self.messages(self.build_translation_prompt(text, target_lang)))
+        if not completion.text:
+            return "Gemini returned an empty response (potentially blocked content)."
+        translation = completion.text.strip()
+        llm_cache.put(spec, translation, completion.model)
+        return translation
+
+    async def translate_text_async(self, text: str, target_lang: str, raise_errors: bool = False):
+        if not text: return "No text provided."
+
+        spec = self.translation_spec(text, target_lang)
+        cached = await llm_cache.get_async(spec)
+        if cached is not None:
+            return cached
+
         try:
-            # We add a safety timeout and check
-            response = self.model.generate_content(prompt)
-            if response.text:
-                return response.text.strip()
-            else:
-                return "Gemini returned an empty response (potentially blocked content)."
+            return await self.flight.do(spec.key, lambda: self._complete_translation_async(spec, text, target_lang))
         except Exception as e:
+            if raise_errors:
+                raise
             return f"Gemini Error: {str(e)}"
-        
+
+    async def _complete_translation_async(self, spec, text: str, target_lang: str) -> str:
+        cached = await llm_cache.get_async(spec, record=False)
+        if cached is not None:
+            return cached
+
+        completion = await llm_router.complete("translate", self.messages(self.build_translation_prompt(text, target_lang)))
+        if not completion.text:
+            return "Gemini returned an empty response (potentially blocked content)."
+        translation = completion.text.strip()
+        await llm_cache.put_async(spec, translation, completion.model)
+        return translation
+
+    async def stream_translation(self, text: str, target_lang: str):
+        """
+        Yields the translation as the provider generates it. Errors propagate to
+        the caller, empty text as a ValueError before anything is yielded.
+        """
+        if not text:
+            raise ValueError("No text provided.")
+
+        async for delta in llm_router.stream("translate", self.messages(self.build_translation_prompt(text, target_lang))):
+            yield delta
 
     def generate_quiz(self, text: str, lang_code: str):
-        lang_map = {"en": "English", "fr": "French", "ar": "Arabic", "es": "Spanish"}
-        language_name = lang_map.get(lang_code, lang_code)
-
-        prompt = (
-            f"Generate a 5-question MCQ quiz in {language_name} based on the text. "
-            f"Return ONLY a JSON object with a 'quiz' key containing a list of questions, "
-            f"each with 'question', 'options' (list of 4), and 'answer'.\n\n"
-            f"Text: {text}"
-        )
+        spec = self.quiz_spec(text, lang_code)
+        cached = llm_cache.get(spec)
+        if cached is not None:
+            return json.loads(cached)
 
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config={"response_mime_type": "application/json"}
-            )
-            return json.loads(response.text)
+            # Callers share the JSON text and each get a quiz of their own
+            return json.loads(self.flight.do_sync(spec.key, lambda: self._complete_quiz(spec, text, lang_code)))
         except Exception as e:
             return {"error": f"Quiz generation failed: {str(e)}"}
 
-gemini_service = GeminiService()
\ No newline at end of file
+    def _complete_quiz(self, spec, text: str, lang_code: str) -> str:
+        cached = llm_cache.get(spec, record=False)
+        if cached is not None:
+            return cached
+
+        completion = llm_router.complete_sync("quiz", self.messages(self.build_quiz_prompt(text, lang_code)), json_mode=True)
+        quiz_json = json.dumps(json.loads(completion.text))
+        llm_cache.put(spec, quiz_json, completion.model)
+        return quiz_json
+
+    async def generate_quiz_async(self, text: str, lang_code: str, raise_errors: bool = False):
+        spec = self.quiz_spec(text, lang_code)
+        cached = await llm_cache.get_async(spec)
+        if cached is not None:
+            return json.loads(cached)
+
+        try:
+            return json.loads(await self.flight.do(spec.key, lambda: self._complete_quiz_async(spec, text, lang_code)))
+        except Exception as e:
+            if raise_errors:
+                raise
+            return {"error": f"Quiz generation failed: {str(e)}"}
+
+    async def _complete_quiz_async(self, spec, text: str, lang_code: str) -> str:
+        cached = await llm_cache.get_async(spec, record=False)
+        if cached is not None:
+            return cached
+
+        completion = await llm_router.complete("quiz", self.messages(self.build_quiz_prompt(text, lang_code)), json_mode=True)
+        quiz_json = json.dumps(json.loads(completion.text))
+        await llm_cache.put_async(spec, quiz_json, completion.model)
+        return quiz_json
+
+    async def generate_section_questions_async(self, text: str, lang_code: str, count: int) -> list:
+        """Questions on one article section for the question bank. Errors propagate to the caller."""
+        spec = self.bank_spec(text, lang_code, count)
+        cached = await llm_cache.get_async(spec)
+        if cached is None:
+            cached = await self.flight.do(spec.key, lambda: self._complete_section_questions_async(spec, text, lang_code, count))
+        return json.loads(cached).get("quiz", [])
+
+    async def _complete_section_questions_async(self, spec, text: str, lang_code: str, count: int) -> str:
+        cached = await llm_cache.get_async(spec, record=False)
+        if cached is not None:
+            return cached
+
+        prompt = self.build_bank_prompt(text, lang_code, count)
+        completion = await llm_router.complete("quiz", self.messages(prompt), json_mode=True)
+        questions_json = json.dumps(json.loads(completion.text))
+        await llm_cache.put_async(spec, questions_json, completion.model)
+        return questions_json
+
+gemini_service = GeminiService()
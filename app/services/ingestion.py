@@ -1,20 +1,57 @@
+import os
+import asyncio
 import wikipedia
 import requests
+import httpx
 import urllib.parse
-import re
+from starlette.concurrency import run_in_threadpool
+from app.core import metrics
+from app.core.singleflight import SingleFlight
+from app.core.throttle import HostThrottle
+from app.services.article_cache import article_cache
+from app.services.sections import SectionMap, parse_sections
+
+USER_AGENT = "WikiSmartEdu/1.0 (contact: oussamaqasdaoui@gmail.com)"
+# Politeness limits for each <lang>.wikipedia.org, shared by every async request
+WIKI_HOST_RATE = float(os.getenv("WIKI_HOST_RATE", "20"))
+WIKI_HOST_CONCURRENCY = int(os.getenv("WIKI_HOST_CONCURRENCY", "8"))
+# Most titles the MediaWiki API accepts in one query from a non-bot client
+MULTI_TITLE_LIMIT = 50
+# MediaWiki API endpoint per language, e.g. a mirror or the fake of benchmarks.fakes
+WIKI_API_URL = os.getenv("WIKI_API_URL", "https://{lang}.wikipedia.org/w/api.php")
 
 class IngestionService:
     def __init__(self):
         self.session = requests.Session()
         self.session.headers.update({
-            "User-Agent": "WikiSmartEdu/1.0 (contact: oussamaqasdaoui@gmail.com)"
+            "User-Agent": USER_AGENT
         })
         wikipedia.requests = self.session
+        self._async_client = None
+        # Concurrent requests for the same page share one fetch
+        self.flight = SingleFlight("wikipedia")
+        self.throttle = HostThrottle(WIKI_HOST_RATE, WIKI_HOST_CONCURRENCY)
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the running event loop
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                timeout=httpx.Timeout(15.0, connect=5.0),
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            )
+        return self._async_client
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
 
     def parse_wiki_url(self, url: str):
 
         parsed_url = urllib.parse.urlparse(url)
-        
+
 
         domain_parts = parsed_url.netloc.split('.')
         lang_code = domain_parts[0] if len(domain_parts) > 1 else "en"
@@ -25,24 +62,114 @@ class IngestionService:
 
         return lang_code, clean_title
 
+    def normalize_title(self, title: str) -> str:
+        # MediaWiki treats underscores as spaces and upper-cases the first letter
+        title = " ".join(urllib.parse.unquote(title).replace('_', ' ').split())
+        return title[:1].upper() + title[1:]
+
+    def api_url(self, lang: str) -> str:
+        return WIKI_API_URL.format(lang=lang)
+
+    def page_url(self, lang: str, title: str) -> str:
+        return f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}"
+
+    async def _api_get(self, lang: str, params: dict) -> dict:
+        async with self.throttle.slot(f"{lang}.wikipedia.org"):
+            response = await self.async_client.get(self.api_url(lang), params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def revision_params(self, title: str) -> dict:
+        return {
+            "action": "query",
+            "prop": "revisions",
+            "rvprop": "ids",
+            "titles": title,
+            "redirects": 1,
+            "format": "json",
+            "formatversion": 2,
+        }
+
+    def page_params(self, title: str) -> dict:
+        # Same plain-text extract the wikipedia library uses for page.content
+        return {
+            "action": "query",
+            "prop": "extracts|revisions|pageprops",
+            "explaintext": 1,
+            "rvprop": "ids",
+            "ppprop": "disambiguation",
+            "titles": title,
+            "redirects": 1,
+            "format": "json",
+            "formatversion": 2,
+        }
+
+    def batch_params(self, titles: list) -> dict:
+        return {
+            **self.revision_params("|".join(titles)),
+            "prop": "revisions|pageprops",
+            "ppprop": "disambiguation",
+        }
+
+    def parse_revision_id(self, payload: dict):
+        pages = payload.get("query", {}).get("pages", [])
+        if not pages or "revisions" not in pages[0]:
+            return None
+        return pages[0]["revisions"][0]["revid"]
+
+    def get_revision_id(self, lang: str, title: str):
+        """Cheap revalidation: asks only for the latest revision id of a page."""
+        response = self.session.get(self.api_url(lang), params=self.revision_params(title), timeout=10)
+        response.raise_for_status()
+        return self.parse_revision_id(response.json())
+
+    async def get_revision_id_async(self, lang: str, title: str):
+        return self.parse_revision_id(await self._api_get(lang, self.revision_params(title)))
+
+    def article_payload(self, title: str, lang: str, url: str, sections: dict) -> dict:
+        return {
+            "title": title,
+            "language": lang,
+            "url": url,
+            "sections": sections
+        }
+
+    def with_url(self, payload: dict, url: str) -> dict:
+        # Coalesced callers share one payload; each gets a copy carrying its own url
+        return payload if "error" in payload else {**payload, "url": url}
+
     def fetch_wikipedia_data(self, url: str):
 
         lang, title = self.parse_wiki_url(url)
-        
+        title = self.normalize_title(title)
+
+        with metrics.stage("wiki_fetch"):
+            payload = self.flight.do_sync(f"{lang}:{title}", lambda: self._load_article(lang, title))
+        return self.with_url(payload, url)
+
+    def _load_article(self, lang: str, title: str) -> dict:
+        cached = article_cache.get(lang, title)
+        if cached is not None and not cached.fresh:
+            try:
+                if self.get_revision_id(lang, cached.title) == cached.revision_id:
+                    article_cache.touch(lang, title, cached)
+                    cached.fresh = True
+            except requests.RequestException:
+                # Wikipedia unreachable: a stale copy beats an error
+                cached.fresh = True
+        if cached is not None and cached.fresh:
+            return self.article_payload(cached.title, lang, None, cached.sections)
 
         wikipedia.set_lang(lang)
-        
+
         try:
             page = wikipedia.page(title, auto_suggest=False)
-            
+
             sections_dict = self.segment_content(page.content)
-            
-            return {
-                "title": page.title,
-                "language": lang, 
-                "url": url,
-                "sections": sections_dict
-            }
+            # page.content already fetched the revision id, so this costs no extra request
+            article_cache.put(lang, title, page.title, page.revision_id, sections_dict)
+
+            return self.article_payload(page.title, lang, None, sections_dict)
         except wikipedia.exceptions.DisambiguationError as e:
             return {"error": "Ambiguous title", "options": e.options[:5]}
         except wikipedia.exceptions.PageError:
@@ -50,13 +177,189 @@ class IngestionService:
         except Exception as e:
             return {"error": str(e)}
 
-    def segment_content(self, raw_text: str) -> dict:
-        sections = re.split(r'\n==+\s*(.*?)\s*==+\n', raw_text)
-        segmented_data = {"Introduction": sections[0].strip()}
-        for i in range(1, len(sections), 2):
-            title, content = sections[i].strip(), sections[i+1].strip()
-            if title.lower() not in ["references", "external links", "see also", "further reading", "notes"]:
-                segmented_data[title] = content
-        return segmented_data
+    async def fetch_wikipedia_data_async(self, url: str):
+        """Non-blocking twin of fetch_wikipedia_data, talking to the MediaWiki API over httpx."""
+        lang, title = self.parse_wiki_url(url)
+        title = self.normalize_title(title)
+
+        with metrics.stage("wiki_fetch"):
+            payload = await self.flight.do(f"{lang}:{title}", lambda: self._load_article_async(lang, title))
+        return self.with_url(payload, url)
+
+    async def _load_article_async(self, lang: str, title: str) -> dict:
+        cached = article_cache.get_memory(lang, title) or await run_in_threadpool(article_cache.get_persistent, lang, title)
+        if cached is not None and not cached.fresh:
+            try:
+                if await self.get_revision_id_async(lang, cached.title) == cached.revision_id:
+                    await run_in_threadpool(article_cache.touch, lang, title, cached)
+                    cached.fresh = True
+            except httpx.HTTPError:
+                cached.fresh = True
+        if cached is not None and cached.fresh:
+            return self.article_payload(cached.title, lang, None, cached.sections)
+        return await self._fetch_page_async(lang, title)
+
+    async def _fetch_page_async(self, lang: str, title: str) -> dict:
+        try:
+            pages = (await self._api_get(lang, self.page_params(title))).get("query", {}).get("pages", [])
+            page = pages[0] if pages else {"missing": True}
+
+            if page.get("missing") or page.get("invalid"):
+                return {"error": f"Article not found in language '{lang}'"}
+            if "disambiguation" in page.get("pageprops", {}):
+                return {"error": "Ambiguous title", "options": await self.disambiguation_options(lang, page["title"])}
+
+            sections_dict = self.segment_content(page.get("extract", ""))
+            revision_id = page["revisions"][0]["revid"]
+            await run_in_threadpool(article_cache.put, lang, title, page["title"], revision_id, sections_dict)
+
+            return self.article_payload(page["title"], lang, None, sections_dict)
+        except Exception as e:
+            return {"error": str(e)}
+
+    async def disambiguation_options(self, lang: str, title: str) -> list:
+        payload = await self._api_get(lang, {
+            "action": "query",
+            "prop": "links",
+            "plnamespace": 0,
+            "pllimit": 5,
+            "titles": title,
+            "format": "json",
+            "formatversion": 2,
+        })
+        pages = payload.get("query", {}).get("pages", [])
+        return [link["title"] for link in pages[0].get("links", [])] if pages else []
+
+    async def resolve_titles_async(self, lang: str, titles: list) -> dict:
+        """
+        Looks up many pages with one query per MULTI_TITLE_LIMIT titles. Maps each
+        requested title to its page (latest revision id, disambiguation flag) after
+        MediaWiki's normalization and redirects; absent pages map to {"missing": True}.
+        """
+        async def resolve(chunk: list) -> dict:
+            query = (await self._api_get(lang, self.batch_params(chunk))).get("query", {})
+            renamed = {r["from"]: r["to"] for r in query.get("normalized", []) + query.get("redirects", [])}
+            pages = {page["title"]: page for page in query.get("pages", [])}
+            resolved = {}
+            for title in chunk:
+                target = title
+                # At most a normalization followed by a redirect
+                for _ in range(2):
+                    target = renamed.get(target, target)
+                resolved[title] = pages.get(target, {"missing": True})
+            return resolved
+
+        chunks = [titles[i:i + MULTI_TITLE_LIMIT] for i in range(0, len(titles), MULTI_TITLE_LIMIT)]
+        resolved = {}
+        for part in await asyncio.gather(*(resolve(chunk) for chunk in chunks)):
+            resolved.update(part)
+        return resolved
+
+    async def category_titles_async(self, lang: str, category: str, limit: int) -> list:
+        """Titles of the articles (namespace 0) directly in a category, following continuation."""
+        if not category.lower().startswith("category:"):
+            category = f"Category:{category}"
+        params = {
+            "action": "query",
+            "list": "categorymembers",
+            "cmtitle": category,
+            "cmnamespace": 0,
+            "cmtype": "page",
+            "cmlimit": min(limit, 500),
+            "format": "json",
+            "formatversion": 2,
+        }
+        titles = []
+        while len(titles) < limit:
+            payload = await self._api_get(lang, params)
+            titles += [member["title"] for member in payload.get("query", {}).get("categorymembers", [])]
+            if "continue" not in payload:
+                break
+            params = {**params, **payload["continue"]}
+        return titles[:limit]
+
+    async def fetch_wikipedia_batch_async(self, urls: list, on_item=None) -> list:
+        """
+        fetch_wikipedia_data_async for many URLs at once. Cached copies are
+        revalidated and new titles resolved with one multi-title query per 50
+        titles and language, so only pages that changed or were never seen cost a
+        request of their own (TextExtracts serves full extracts one page at a
+        time). on_item(url, payload) is awaited as each URL completes.
+        """
+        requested, results = {}, {}
+
+        async def finish(key, payload):
+            for url in requested[key]:
+                results[url] = self.with_url(payload, url)
+                if on_item is not None:
+                    await on_item(url, results[url])
+
+        for url in dict.fromkeys(urls):
+            try:
+                lang, title = self.parse_wiki_url(url)
+                title = self.normalize_title(title)
+            except IndexError:
+                title = ""
+            if title:
+                requested.setdefault((lang, title), []).append(url)
+            else:
+                results[url] = {"error": "Invalid Wikipedia URL"}
+                if on_item is not None:
+                    await on_item(url, results[url])
+
+        async def lookup(lang: str, title: str):
+            return article_cache.get_memory(lang, title) or await run_in_threadpool(article_cache.get_persistent, lang, title)
+
+        keys = list(requested)
+        cached = dict(zip(keys, await asyncio.gather(*(lookup(*key) for key in keys))))
+        pending = {}
+        for key, entry in cached.items():
+            if entry is not None and entry.fresh:
+                await finish(key, self.article_payload(entry.title, key[0], None, entry.sections))
+            else:
+                pending.setdefault(key[0], []).append(key[1])
+
+        async def resolve(lang: str, titles: list):
+            try:
+                return lang, await self.resolve_titles_async(lang, titles)
+            except (httpx.HTTPError, ValueError):
+                # Fall back to loading those pages one by one
+                return lang, {}
+
+        async def load(lang: str, title: str, page: dict):
+            entry = cached[(lang, title)]
+            if page is None:
+                payload = await self.flight.do(f"{lang}:{title}", lambda: self._load_article_async(lang, title))
+            elif page.get("missing") or page.get("invalid"):
+                payload = {"error": f"Article not found in language '{lang}'"}
+            elif "disambiguation" in page.get("pageprops", {}):
+                try:
+                    options = await self.disambiguation_options(lang, page["title"])
+                except httpx.HTTPError:
+                    options = []
+                payload = {"error": "Ambiguous title", "options": options}
+            elif entry is not None and page.get("revisions", [{}])[0].get("revid") == entry.revision_id:
+                await run_in_threadpool(article_cache.touch, lang, title, entry)
+                payload = self.article_payload(entry.title, lang, None, entry.sections)
+            else:
+                payload = await self.flight.do(f"{lang}:{title}", lambda: self._fetch_page_async(lang, title))
+            await finish((lang, title), payload)
+
+        with metrics.stage("wiki_fetch"):
+            resolved = dict(await asyncio.gather(*(resolve(lang, titles) for lang, titles in pending.items())))
+            await asyncio.gather(*(
+                load(lang, title, resolved[lang].get(title))
+                for lang, titles in pending.items()
+                for title in titles
+            ))
+        return [results[url] for url in urls]
+
+    def segment_content(self, raw_text: str) -> SectionMap:
+        """
+        {title: body} of every section and subsection, sliced from the outline
+        only when read; see parse_sections.
+        """
+        with metrics.stage("segment"):
+            return SectionMap(parse_sections(raw_text))
 
-ingestion_service = IngestionService()
\ No newline at end of file
+ingestion_service = IngestionService()
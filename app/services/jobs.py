@@ -0,0 +1,271 @@
+import os
+import uuid
+import random
+import asyncio
+import time
+import logging
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models.job import Job
+from app.services import workflows
+from app.services.quota import quota_service
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Running jobs renew their lease this often, well within JOB_LEASE_SECONDS
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 3)))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# Minimum seconds between progress writes of one job
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "0.5"))
+BACKEND_CONCURRENCY = {
+    "groq": int(os.getenv("JOB_GROQ_CONCURRENCY", "4")),
+    "gemini": int(os.getenv("JOB_GEMINI_CONCURRENCY", "4")),
+    "wikipedia": int(os.getenv("JOB_WIKIPEDIA_CONCURRENCY", "2")),
+}
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+
+async def _run_summarize(db: Session, job: Job):
+    return await workflows.summarize_article(db, job.user_id, job.params["url"], raise_errors=True)
+
+async def _run_translate(db: Session, job: Job):
+    return await workflows.translate_article(db, job.user_id, job.params["url"], job.params["target_lang"], raise_errors=True)
+
+async def _run_quiz(db: Session, job: Job):
+    return await workflows.quiz_article(db, job.user_id, job.params["url"], raise_errors=True)
+
+async def _run_question_bank(db: Session, job: Job):
+    params = job.params
+    return await workflows.build_question_bank(db, params["url"], params["source_id"], params["lang"])
+
+async def _run_ingest_batch(db: Session, job: Job):
+    last_write = 0.0
+
+    async def progress(summary: dict):
+        nonlocal last_write
+        if time.monotonic() - last_write >= JOB_PROGRESS_INTERVAL:
+            last_write = time.monotonic()
+            await job_queue.report_progress(job.id, summary)
+
+    params = job.params
+    summary = await workflows.ingest_batch(
+        job.user_id, params.get("urls", []), params.get("category"), params.get("lang", "en"),
+        params.get("actions", []), progress,
+    )
+    await job_queue.report_progress(job.id, summary)
+    return {"total": summary["total"], "counts": summary["counts"]}
+
+# kind -> (backend whose concurrency limit applies, handler)
+JOB_KINDS = {
+    "summarize": ("groq", _run_summarize),
+    "translate": ("gemini", _run_translate),
+    "quiz": ("gemini", _run_quiz),
+    "ingest_batch": ("wikipedia", _run_ingest_batch),
+    "question_bank": ("gemini", _run_question_bank),
+}
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    """
+    Database-backed job queue drained by in-process asyncio workers.
+
+    Jobs are claimed with a conditional UPDATE and a lease, so several API
+    processes (or a dedicated `python -m app.worker`) can share one table, and a
+    job whose worker died is picked up again once its lease expires. Workers
+    renew the lease while the job runs, and record its outcome only while they
+    still hold it.
+    """
+
+    def __init__(self):
+        self.active = {backend: 0 for backend in BACKEND_CONCURRENCY}
+        self._tasks = []
+        self._wakeup = None
+        self._claim_lock = None
+        self._watchers = {}
+
+    def submit(self, db: Session, user_id: int, kind: str, params: dict) -> Job:
+        backend, _ = JOB_KINDS[kind]
+        job = Job(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            kind=kind,
+            backend=backend,
+            params=params,
+            status="pending",
+            attempts=0,
+            max_attempts=JOB_MAX_ATTEMPTS,
+            run_after=_now()
+        )
+        db.add(job)
+        db.commit()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def start(self, workers: int = JOB_WORKERS):
+        self._wakeup = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def wait_for_update(self, job_id: str, timeout: float):
+        """Sleeps until a local worker touches the job, or the timeout elapses."""
+        event = asyncio.Event()
+        self._watchers.setdefault(job_id, set()).add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._watchers[job_id].discard(event)
+            if not self._watchers[job_id]:
+                del self._watchers[job_id]
+
+    async def report_progress(self, job_id: str, progress: dict):
+        await run_in_threadpool(self._set_progress, job_id, progress)
+        self._notify(job_id)
+
+    def _set_progress(self, job_id: str, progress: dict):
+        with SessionLocal() as db:
+            db.query(Job).filter(Job.id == job_id).update({"progress": progress}, synchronize_session=False)
+            db.commit()
+
+    def _notify(self, job_id: str):
+        for event in self._watchers.get(job_id, ()):
+            event.set()
+
+    async def _worker(self):
+        while True:
+            async with self._claim_lock:
+                free = [b for b, limit in BACKEND_CONCURRENCY.items() if self.active[b] < limit]
+                job = await run_in_threadpool(self._claim, free) if free else None
+                if job is not None:
+                    self.active[job.backend] += 1
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            try:
+                await self._execute(job)
+            finally:
+                self.active[job.backend] -= 1
+                self._wakeup.set()
+
+    def _claim(self, backends: list):
+        now = _now()
+        expired = and_(Job.status == "running", Job.locked_until < now)
+        claimable = or_(
+            and_(Job.status == "pending", Job.run_after <= now),
+            and_(expired, Job.attempts < Job.max_attempts),
+        )
+        with SessionLocal() as db:
+            # Jobs whose worker died on their last attempt, e.g. because the job crashes it
+            db.query(Job).filter(expired, Job.attempts >= Job.max_attempts).update({
+                "status": "failed", "error": "Lease expired on the last attempt", "locked_until": None,
+            }, synchronize_session=False)
+            db.commit()
+            candidates = (
+                db.query(Job.id)
+                .filter(claimable, Job.backend.in_(backends))
+                .order_by(Job.run_after)
+                .limit(5)
+                .all()
+            )
+            for (job_id,) in candidates:
+                claimed = db.query(Job).filter(Job.id == job_id, claimable).update({
+                    "status": "running",
+                    "attempts": Job.attempts + 1,
+                    "locked_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                }, synchronize_session=False)
+                db.commit()
+                if claimed:
+                    return db.get(Job, job_id)
+        return None
+
+    async def _execute(self, job: Job):
+        self._notify(job.id)
+        _, handler = JOB_KINDS[job.kind]
+        # LLM tokens the job spends count against its owner's quota
+        endpoint = "batch" if job.kind == "ingest_batch" else job.kind
+        # Jobs without an owner, such as question bank builds, are shared work charged to nobody
+        charging = quota_service.charging(job.user_id, endpoint) if job.user_id is not None else nullcontext()
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, job.attempts))
+        try:
+            with SessionLocal() as db, charging:
+                result = await handler(db, job)
+        except Exception as e:
+            retryable = getattr(e, "retryable", True) and job.attempts < job.max_attempts
+            logger.warning("Job %s (%s) attempt %s failed: %s", job.id, job.kind, job.attempts, e)
+            held = await run_in_threadpool(self._fail, job.id, str(e), retryable, job.attempts)
+        else:
+            held = await run_in_threadpool(self._finish, job.id, job.attempts, result)
+        finally:
+            heartbeat.cancel()
+        if not held:
+            logger.warning("Job %s (%s) attempt %s lost its lease; its outcome was discarded", job.id, job.kind, job.attempts)
+        self._notify(job.id)
+
+    async def _heartbeat(self, job_id: str, attempt: int):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                if not await run_in_threadpool(self._renew, job_id, attempt):
+                    return
+            except Exception as e:
+                # The lease may still be renewed by the next beat
+                logger.warning("Could not renew the lease of job %s: %s", job_id, e)
+
+    @staticmethod
+    def _held(job_id: str, attempt: int):
+        # The claim that bumped attempts to this value is the one holding the lease
+        return and_(Job.id == job_id, Job.status == "running", Job.attempts == attempt)
+
+    def _renew(self, job_id: str, attempt: int) -> bool:
+        with SessionLocal() as db:
+            renewed = db.query(Job).filter(self._held(job_id, attempt)).update({
+                "locked_until": _now() + timedelta(seconds=JOB_LEASE_SECONDS)
+            }, synchronize_session=False)
+            db.commit()
+        return bool(renewed)
+
+    def _finish(self, job_id: str, attempt: int, result: dict) -> bool:
+        with SessionLocal() as db:
+            finished = db.query(Job).filter(self._held(job_id, attempt)).update({
+                "status": "succeeded", "result": result, "error": None, "locked_until": None
+            }, synchronize_session=False)
+            db.commit()
+        return bool(finished)
+
+    def _fail(self, job_id: str, error: str, retryable: bool, attempt: int) -> bool:
+        values = {"error": error, "locked_until": None, "status": "failed"}
+        if retryable:
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, JOB_RETRY_BASE * 2 ** attempt)
+            values.update(status="pending", run_after=_now() + timedelta(seconds=delay))
+        with SessionLocal() as db:
+            failed = db.query(Job).filter(self._held(job_id, attempt)).update(values, synchronize_session=False)
+            db.commit()
+        return bool(failed)
+
+job_queue = JobQueue()
@@ -0,0 +1,231 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+from app.core.cache import LRUCache
+from app.database import SessionLocal
+from app.models.article import Article
+from app.models.llm_result import LLMResult
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024"))
+# Eviction runs once every this many writes, to amortize the DELETE
+LLM_CACHE_EVICT_EVERY = 100
+# Hit counts and last use of stored rows are written back once this many hits
+# have piled up, or this many seconds after the last write, so reads stay reads
+LLM_CACHE_TOUCH_EVERY = 100
+LLM_CACHE_TOUCH_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class CacheSpec:
+    operation: str
+    model: str
+    prompt_version: str
+    language: str
+    key: str
+
+
+def content_hash(text: str) -> str:
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Durable memo of LLM outputs in the llm_results table, fronted by a small LRU.
+
+    Keys hash the whitespace-normalized input together with the operation, model,
+    prompt version and language, so changing any of them is a clean miss. Rows that
+    an Article points at are never evicted; the rest are trimmed least recently
+    used first once the table exceeds LLM_CACHE_MAX_ENTRIES.
+    """
+
+    def __init__(self):
+        self.memory = LRUCache(max_entries=LLM_CACHE_MEMORY_ENTRIES)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self.failover_skips = 0
+        self._pending_hits = Counter()
+        self._touched_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def spec(self, operation: str, model: str, prompt_version: str, language: str, text: str) -> CacheSpec:
+        raw = "\0".join([operation, model, prompt_version, language or "", content_hash(text)])
+        return CacheSpec(operation, model, prompt_version, language, hashlib.sha256(raw.encode("utf-8")).hexdigest())
+
+    def get(self, spec: CacheSpec, record: bool = True):
+        output = self.memory.get(spec.key)
+        if output is None:
+            try:
+                with SessionLocal() as db:
+                    output = db.query(LLMResult.output).filter(LLMResult.key == spec.key).scalar()
+            except SQLAlchemyError as e:
+                logger.warning("LLM cache lookup failed: %s", e)
+            if output is not None:
+                self.memory.set(spec.key, output)
+                self._touch(spec.key)
+
+        if record:
+            with self._lock:
+                if output is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        return output
+
+    def _touch(self, key: str):
+        with self._lock:
+            self._pending_hits[key] += 1
+            due = (
+                sum(self._pending_hits.values()) >= LLM_CACHE_TOUCH_EVERY
+                or time.monotonic() - self._touched_at >= LLM_CACHE_TOUCH_SECONDS
+            )
+        if due:
+            self.flush_hits()
+
+    def flush_hits(self):
+        """Writes the pending hit counts and last-use times, one UPDATE per distinct count."""
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, Counter()
+            self._touched_at = time.monotonic()
+        if not pending:
+            return
+        keys_by_hits = defaultdict(list)
+        for key, hits in pending.items():
+            keys_by_hits[hits].append(key)
+        now = datetime.now(timezone.utc)
+        try:
+            with SessionLocal() as db:
+                for hits, keys in keys_by_hits.items():
+                    db.query(LLMResult).filter(LLMResult.key.in_(keys)).update(
+                        {"hits": LLMResult.hits + hits, "last_used_at": now}, synchronize_session=False
+                    )
+                db.commit()
+        except SQLAlchemyError as e:
+            logger.warning("LLM cache hit counts not written: %s", e)
+
+    def put(self, spec: CacheSpec, output: str, model: str):
+        """
+        Stores output, written by model. Skipped when model is not spec.model:
+        a fallback provider's answer must not be served as the primary's.
+        """
+        if model != spec.model:
+            with self._lock:
+                self.failover_skips += 1
+            return
+        try:
+            with SessionLocal() as db:
+                row = db.get(LLMResult, spec.key)
+                if row is None:
+                    db.add(LLMResult(
+                        key=spec.key,
+                        operation=spec.operation,
+                        model=spec.model,
+                        prompt_version=spec.prompt_version,
+                        language=spec.language,
+                        output=output,
+                        hits=0,
+                    ))
+                else:
+                    row.output = output
+                db.commit()
+        except SQLAlchemyError as e:
+            logger.warning("LLM cache write failed: %s", e)
+            return
+        self.memory.set(spec.key, output)
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % LLM_CACHE_EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def stored_key(self, spec: CacheSpec):
+        """
+        Returns spec.key if an output is stored under it, so an Article may
+        reference it. A failed lookup is None: the article is then recorded
+        without its output rather than lost.
+        """
+        if self.memory.get(spec.key) is not None:
+            return spec.key
+        try:
+            with SessionLocal() as db:
+                exists = db.query(LLMResult.key).filter(LLMResult.key == spec.key).first()
+        except SQLAlchemyError as e:
+            logger.warning("LLM cache lookup failed: %s", e)
+            return None
+        return spec.key if exists else None
+
+    def pin(self, db, key: str):
+        """
+        key if its output is still stored, else None. Eviction may have run
+        since stored_key, so articles take their result_key through this, in
+        the transaction that inserts them: on PostgreSQL the row stays locked
+        (FOR KEY SHARE) against deletion until that transaction ends.
+        """
+        if key is None:
+            return None
+        row = db.query(LLMResult.key).filter(LLMResult.key == key).with_for_update(read=True, key_share=True).first()
+        return key if row is not None else None
+
+    async def stored_key_async(self, spec: CacheSpec):
+        if self.memory.get(spec.key) is not None:
+            return spec.key
+        return await run_in_threadpool(self.stored_key, spec)
+
+    async def get_async(self, spec: CacheSpec, record: bool = True):
+        """record=False is for re-checks of a lookup that has already been counted."""
+        output = self.memory.get(spec.key)
+        if output is not None:
+            if record:
+                with self._lock:
+                    self.hits += 1
+            return output
+        return await run_in_threadpool(self.get, spec, record)
+
+    async def put_async(self, spec: CacheSpec, output: str, model: str):
+        await run_in_threadpool(self.put, spec, output, model)
+
+    def evict(self):
+        # Recent use decides what goes, so it is written first
+        self.flush_hits()
+        try:
+            with SessionLocal() as db:
+                excess = db.query(LLMResult).count() - LLM_CACHE_MAX_ENTRIES
+                if excess <= 0:
+                    return
+                referenced = db.query(Article.result_key).filter(Article.result_key.isnot(None))
+                victims = (
+                    db.query(LLMResult.key)
+                    .filter(LLMResult.key.notin_(referenced))
+                    .order_by(LLMResult.last_used_at)
+                    .limit(excess)
+                )
+                deleted = db.query(LLMResult).filter(LLMResult.key.in_(victims.scalar_subquery())).delete(synchronize_session=False)
+                db.commit()
+            self.memory.clear()
+            logger.info("Evicted %s cached LLM results", deleted)
+        except SQLAlchemyError as e:
+            logger.warning("LLM cache eviction failed: %s", e)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "memory_entries": len(self.memory),
+            "failover_skips": self.failover_skips,
+        }
+
+llm_cache = LLMCache()
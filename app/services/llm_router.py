@@ -0,0 +1,618 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import contextvars
+import threading
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from app.core import metrics
+from app.core.metrics import percentile_ms
+from app.core.throttle import TokenBucket
+from app.services.quota import quota_service
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")
+# host:port of another Gemini gRPC endpoint, e.g. a proxy or the fake of
+# benchmarks.fakes; the groq SDK reads GROQ_BASE_URL by itself
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+# Serve every task from the local fake provider, for offline load tests
+LLM_FAKE = os.getenv("LLM_FAKE", "false").lower() in ("1", "true", "yes")
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", "0.05"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "0.5"))
+# Pause after a 429 that did not say how long to wait
+LLM_RATE_LIMIT_COOLDOWN = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN", "10"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# task -> providers tried in order; override with LLM_ROUTE_<TASK>="gemini,groq"
+DEFAULT_ROUTES = {
+    "summarize": "groq,gemini",
+    "translate": "gemini,groq",
+    "quiz": "gemini,groq",
+}
+# Per provider, overridable as LLM_<PROVIDER>_<SETTING>; 0 RPM/TPM means unlimited
+DEFAULT_LIMITS = {"CONCURRENCY": "8", "TIMEOUT": "60", "RPM": "0", "TPM": "0"}
+
+
+def _setting(provider: str, name: str) -> str:
+    return os.getenv(f"LLM_{provider.upper()}_{name}", DEFAULT_LIMITS.get(name, "0"))
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for the languages we serve
+    return max(1, len(text) // 4)
+
+
+def _int(value):
+    return value if isinstance(value, int) else None
+
+
+class LLMError(Exception):
+    """No provider on the route could serve the request."""
+
+
+class ProviderError(Exception):
+    """A provider failure, classified as "rate_limited", "retryable" or "fatal"."""
+
+    def __init__(self, message: str, kind: str = "retryable", retry_after: float = None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+@dataclass
+class Completion:
+    text: str
+    provider: str
+    model: str
+    input_tokens: int = None
+    output_tokens: int = None
+
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self, model: str = GROQ_MODEL):
+        from groq import Groq, AsyncGroq
+        self.model = model
+        # The router owns retries, so the SDK must surface 429s and timeouts at once
+        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+        self.async_client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
+
+    def _request(self, messages: list, max_tokens: int, temperature: float, json_mode: bool) -> dict:
+        request = {"model": self.model, "messages": messages}
+        if max_tokens is not None:
+            request["max_tokens"] = max_tokens
+        if temperature is not None:
+            request["temperature"] = temperature
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}
+        return request
+
+    def _completion(self, completion) -> Completion:
+        usage = getattr(completion, "usage", None)
+        return Completion(
+            completion.choices[0].message.content or "", self.name, self.model,
+            _int(getattr(usage, "prompt_tokens", None)), _int(getattr(usage, "completion_tokens", None)),
+        )
+
+    async def complete(self, messages: list, max_tokens=None, temperature=None, json_mode=False) -> Completion:
+        return self._completion(await self.async_client.chat.completions.create(
+            **self._request(messages, max_tokens, temperature, json_mode)
+        ))
+
+    def complete_sync(self, messages: list, max_tokens=None, temperature=None, json_mode=False, timeout=None) -> Completion:
+        return self._completion(self.client.chat.completions.create(
+            **self._request(messages, max_tokens, temperature, json_mode), timeout=timeout
+        ))
+
+    async def stream(self, messages: list, max_tokens=None, temperature=None):
+        stream = await self.async_client.chat.completions.create(
+            **self._request(messages, max_tokens, temperature, False), stream=True
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    def classify(self, error: Exception) -> ProviderError:
+        import groq
+        if isinstance(error, groq.RateLimitError):
+            retry_after = error.response.headers.get("retry-after")
+            return ProviderError(str(error), "rate_limited", float(retry_after) if retry_after else None)
+        if isinstance(error, (groq.APITimeoutError, groq.APIConnectionError, groq.InternalServerError)):
+            return ProviderError(str(error), "retryable")
+        if isinstance(error, groq.APIStatusError) and error.status_code >= 500:
+            return ProviderError(str(error), "retryable")
+        return ProviderError(str(error), "fatal")
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, model: str = GEMINI_MODEL):
+        import google.generativeai as genai
+        client_options = {"api_endpoint": GEMINI_API_ENDPOINT} if GEMINI_API_ENDPOINT else None
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"), client_options=client_options)
+        self.model = model
+        self.client = genai.GenerativeModel(model)
+
+    def _prompt(self, messages: list) -> str:
+        # Gemini takes one prompt; system instructions go first
+        return "\n\n".join(message["content"] for message in messages)
+
+    def _config(self, temperature: float, json_mode: bool) -> dict:
+        # max_tokens is not passed on: 2.5 models spend part of max_output_tokens thinking
+        config = {}
+        if temperature is not None:
+            config["temperature"] = temperature
+        if json_mode:
+            config["response_mime_type"] = "application/json"
+        return config
+
+    def _completion(self, response) -> Completion:
+        try:
+            text = response.text
+        except ValueError:
+            # No parts, e.g. blocked content
+            text = ""
+        usage = getattr(response, "usage_metadata", None)
+        return Completion(
+            text or "", self.name, self.model,
+            _int(getattr(usage, "prompt_token_count", None)), _int(getattr(usage, "candidates_token_count", None)),
+        )
+
+    async def complete(self, messages: list, max_tokens=None, temperature=None, json_mode=False) -> Completion:
+        return self._completion(await self.client.generate_content_async(
+            self._prompt(messages), generation_config=self._config(temperature, json_mode)
+        ))
+
+    def complete_sync(self, messages: list, max_tokens=None, temperature=None, json_mode=False, timeout=None) -> Completion:
+        return self._completion(self.client.generate_content(
+            self._prompt(messages),
+            generation_config=self._config(temperature, json_mode),
+            request_options={"timeout": timeout} if timeout else None,
+        ))
+
+    async def stream(self, messages: list, max_tokens=None, temperature=None):
+        response = await self.client.generate_content_async(
+            self._prompt(messages), generation_config=self._config(temperature, False), stream=True
+        )
+        async for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+
+    def classify(self, error: Exception) -> ProviderError:
+        from google.api_core import exceptions
+        if isinstance(error, (exceptions.ResourceExhausted, exceptions.TooManyRequests)):
+            return ProviderError(str(error), "rate_limited")
+        if isinstance(error, (exceptions.ServiceUnavailable, exceptions.DeadlineExceeded,
+                              exceptions.InternalServerError, exceptions.Aborted)):
+            return ProviderError(str(error), "retryable")
+        return ProviderError(str(error), "fatal")
+
+
+class FakeProvider:
+    """
+    Offline stand-in answering after a fixed latency with text derived from the
+    prompt. Any provider name starting with "fake" is one, so failover can be
+    exercised with e.g. LLM_ROUTE_SUMMARIZE=fake_a,fake_b and
+    LLM_FAKE_A_ERROR_RATE=0.5 (LLM_<NAME>_RATE_LIMIT_RATE injects 429s).
+    """
+
+    def __init__(self, name: str = "fake"):
+        self.name = name
+        self.model = name
+        self.latency = float(os.getenv(f"LLM_{name.upper()}_LATENCY", str(LLM_FAKE_LATENCY)))
+        self.error_rate = float(_setting(name, "ERROR_RATE"))
+        self.rate_limit_rate = float(_setting(name, "RATE_LIMIT_RATE"))
+
+    def _answer(self, messages: list, json_mode: bool) -> Completion:
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            raise ProviderError(f"{self.name}: rate limited", "rate_limited", 1.0)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise ProviderError(f"{self.name}: injected failure", "retryable")
+        prompt = messages[-1]["content"]
+        if json_mode:
+            text = json.dumps({"quiz": [
+                {"question": f"Question {i + 1}?", "options": ["A", "B", "C", "D"], "answer": "A",
+                 "difficulty": ("easy", "medium", "hard")[i % 3]}
+                for i in range(5)
+            ]})
+        else:
+            text = " ".join(prompt.split()[:80]) or "(empty)"
+        return Completion(text, self.name, self.model, estimate_tokens(prompt), estimate_tokens(text))
+
+    async def complete(self, messages: list, max_tokens=None, temperature=None, json_mode=False) -> Completion:
+        await asyncio.sleep(self.latency)
+        return self._answer(messages, json_mode)
+
+    def complete_sync(self, messages: list, max_tokens=None, temperature=None, json_mode=False, timeout=None) -> Completion:
+        time.sleep(self.latency)
+        return self._answer(messages, json_mode)
+
+    async def stream(self, messages: list, max_tokens=None, temperature=None):
+        await asyncio.sleep(self.latency)
+        words = self._answer(messages, False).text.split(" ")
+        for i in range(0, len(words), 8):
+            yield " ".join(words[i:i + 8]) + " "
+
+    def classify(self, error: Exception) -> ProviderError:
+        return error if isinstance(error, ProviderError) else ProviderError(str(error), "fatal")
+
+
+def make_provider(name: str):
+    if name.startswith("fake"):
+        return FakeProvider(name)
+    if name == "groq":
+        return GroqProvider()
+    if name == "gemini":
+        return GeminiProvider()
+    raise ValueError(f"Unknown LLM provider '{name}'")
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for `reset_after`
+    seconds; then lets calls through again, closing on the first success and
+    re-opening on the first failure.
+    """
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.reset_after else "half_open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class ProviderSlot:
+    """A provider together with its limits, breaker and counters."""
+
+    def __init__(self, provider):
+        name = provider.name
+        self.provider = provider
+        self.concurrency = int(_setting(name, "CONCURRENCY"))
+        self.timeout = float(_setting(name, "TIMEOUT"))
+        rpm, tpm = float(_setting(name, "RPM")), float(_setting(name, "TPM"))
+        self.requests = TokenBucket(rpm / 60, rpm or None)
+        self.tokens = TokenBucket(tpm / 60, tpm or None)
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+        self.cooldown_until = 0.0
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._thread_slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0, "failures": 0, "rate_limited": 0, "timeouts": 0, "retries": 0,
+            "skipped": 0, "abandoned": 0, "in_flight": 0, "input_tokens": 0, "output_tokens": 0,
+        }
+        self.latencies = deque(maxlen=1024)
+
+    @property
+    def name(self) -> str:
+        return self.provider.name
+
+    def try_admit(self, tokens: int) -> bool:
+        """Takes the rate-limit tokens for one call if that needs no waiting."""
+        if time.monotonic() < self.cooldown_until or not self.requests.try_acquire():
+            return False
+        if not self.tokens.try_acquire(tokens):
+            self.requests.refund()
+            return False
+        return True
+
+    def add(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counters[key] += amount
+
+    async def admit(self, tokens: int):
+        await asyncio.sleep(max(0.0, self.cooldown_until - time.monotonic()))
+        await self.requests.acquire()
+        await self.tokens.acquire(tokens)
+
+    def admit_sync(self, tokens: int):
+        time.sleep(max(0.0, self.cooldown_until - time.monotonic()))
+        self.requests.acquire_sync()
+        self.tokens.acquire_sync(tokens)
+
+    @asynccontextmanager
+    async def running(self):
+        semaphore = self._semaphores.setdefault(asyncio.get_running_loop(), asyncio.Semaphore(self.concurrency))
+        async with semaphore:
+            self.add("in_flight")
+            try:
+                yield
+            finally:
+                self.add("in_flight", -1)
+
+    @contextmanager
+    def running_sync(self):
+        with self._thread_slots:
+            self.add("in_flight")
+            try:
+                yield
+            finally:
+                self.add("in_flight", -1)
+
+    def succeeded(self, completion: Completion, prompt_tokens: int, seconds: float) -> int:
+        """Records the call and returns the tokens it used."""
+        input_tokens = completion.input_tokens or prompt_tokens
+        output_tokens = completion.output_tokens or estimate_tokens(completion.text)
+        self.breaker.record_success()
+        self.add("calls")
+        self.add("input_tokens", input_tokens)
+        self.add("output_tokens", output_tokens)
+        self.latencies.append(seconds)
+        metrics.llm_call_seconds.observe(seconds, self.name)
+        metrics.llm_tokens.inc(input_tokens, self.name, "input")
+        metrics.llm_tokens.inc(output_tokens, self.name, "output")
+        return input_tokens + output_tokens
+
+    def failed(self, error: Exception) -> ProviderError:
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+            failure = ProviderError(f"timed out after {self.timeout:g}s", "retryable")
+            self.add("timeouts")
+        else:
+            failure = self.provider.classify(error)
+        self.add("calls")
+        self.add("failures")
+        if failure.kind == "rate_limited":
+            self.add("rate_limited")
+            self.cooldown_until = time.monotonic() + (failure.retry_after or LLM_RATE_LIMIT_COOLDOWN)
+        elif failure.kind == "retryable":
+            self.breaker.record_failure()
+        logger.warning("LLM provider %s failed (%s): %s", self.name, failure.kind, failure)
+        return failure
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            **self.counters,
+            "model": self.provider.model,
+            "breaker": self.breaker.state,
+            "cooldown_seconds": round(max(0.0, self.cooldown_until - time.monotonic()), 1),
+            "latency_p50_ms": percentile_ms(latencies, 0.5),
+            "latency_p95_ms": percentile_ms(latencies, 0.95),
+        }
+
+
+def _budget(messages: list, max_tokens) -> tuple:
+    """(estimated prompt tokens, tokens to reserve against a TPM limit)."""
+    prompt_tokens = estimate_tokens("".join(message["content"] for message in messages))
+    return prompt_tokens, prompt_tokens + (max_tokens or 0)
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter
+    return random.uniform(0, LLM_RETRY_BASE * 2 ** attempt)
+
+
+# Model that served the stream last consumed in the current context
+_streamed_by = contextvars.ContextVar("llm_streamed_by", default=None)
+
+
+class LLMRouter:
+    """
+    Sends each task to the first provider on its route that can take it. A
+    provider is passed over while its breaker is open, while it is cooling down
+    after a 429, or when its rate limits would make the caller wait and another
+    provider remains; the last provider on a route is waited for instead.
+    Retryable failures (timeouts, 5xx) are retried with jittered backoff before
+    failing over; a 429 fails over at once.
+    """
+
+    def __init__(self):
+        self.slots = {}
+        self.routes = {}
+        self.failovers = 0
+        self._lock = threading.Lock()
+        for task, default in DEFAULT_ROUTES.items():
+            route = "fake" if LLM_FAKE else os.getenv(f"LLM_ROUTE_{task.upper()}", default)
+            self.routes[task] = [name.strip() for name in route.split(",") if name.strip()]
+
+    def slot(self, name: str) -> ProviderSlot:
+        with self._lock:
+            if name not in self.slots:
+                self.slots[name] = ProviderSlot(make_provider(name))
+            return self.slots[name]
+
+    def provider(self, name: str):
+        return self.slot(name).provider
+
+    def model_for(self, task: str) -> str:
+        """Model of the first provider on the task's route; cache keys are built from it."""
+        return self.provider(self.routes[task][0]).model
+
+    def streamed_by(self):
+        """Model of the last stream consumed to its end in this context, None when unknown."""
+        return _streamed_by.get()
+
+    def clear_streamed_by(self):
+        """For streams whose text also depends on completions the router did not stream."""
+        _streamed_by.set(None)
+
+    def route(self, task: str) -> list:
+        return [self.slot(name) for name in self.routes[task]]
+
+    def _admitted(self, slot: ProviderSlot, tokens: int, fallback_left: bool, errors: list) -> bool:
+        """
+        Non-blocking admission while another provider remains on the route. The
+        caller waits on the rate limits itself only for the last provider.
+        """
+        if not slot.breaker.allow():
+            reason = "circuit open"
+        elif not fallback_left or slot.try_admit(tokens):
+            return True
+        else:
+            reason = "throttled"
+        slot.add("skipped")
+        errors.append(f"{slot.name}: {reason}")
+        return False
+
+    def _served(self, position: int):
+        if position:
+            with self._lock:
+                self.failovers += 1
+
+    def _give_up(self, failure: ProviderError, fallback_left: bool, attempt: int) -> bool:
+        return (
+            failure.kind == "fatal"
+            or (failure.kind == "rate_limited" and fallback_left)
+            or attempt == LLM_MAX_RETRIES
+        )
+
+    async def complete(self, task: str, messages: list, max_tokens=None, temperature=None, json_mode=False) -> Completion:
+        with metrics.stage("llm"):
+            prompt_tokens, tokens = _budget(messages, max_tokens)
+            route, errors = self.route(task), []
+            for position, slot in enumerate(route):
+                fallback_left = position < len(route) - 1
+                for attempt in range(LLM_MAX_RETRIES + 1):
+                    if not self._admitted(slot, tokens, fallback_left, errors):
+                        break
+                    if not fallback_left:
+                        await slot.admit(tokens)
+                    started = time.monotonic()
+                    try:
+                        async with slot.running():
+                            completion = await asyncio.wait_for(
+                                slot.provider.complete(messages, max_tokens, temperature, json_mode), slot.timeout
+                            )
+                    except Exception as e:
+                        failure = slot.failed(e)
+                        errors.append(f"{slot.name}: {failure}")
+                        if self._give_up(failure, fallback_left, attempt):
+                            break
+                        slot.add("retries")
+                        await asyncio.sleep(_backoff(attempt))
+                        continue
+                    quota_service.charge(slot.succeeded(completion, prompt_tokens, time.monotonic() - started))
+                    self._served(position)
+                    return completion
+            raise LLMError(f"No provider could serve '{task}': " + "; ".join(errors))
+
+    def complete_sync(self, task: str, messages: list, max_tokens=None, temperature=None, json_mode=False) -> Completion:
+        """Blocking twin of complete, for callers running in threads."""
+        with metrics.stage("llm"):
+            prompt_tokens, tokens = _budget(messages, max_tokens)
+            route, errors = self.route(task), []
+            for position, slot in enumerate(route):
+                fallback_left = position < len(route) - 1
+                for attempt in range(LLM_MAX_RETRIES + 1):
+                    if not self._admitted(slot, tokens, fallback_left, errors):
+                        break
+                    if not fallback_left:
+                        slot.admit_sync(tokens)
+                    started = time.monotonic()
+                    try:
+                        with slot.running_sync():
+                            completion = slot.provider.complete_sync(messages, max_tokens, temperature, json_mode, timeout=slot.timeout)
+                    except Exception as e:
+                        failure = slot.failed(e)
+                        errors.append(f"{slot.name}: {failure}")
+                        if self._give_up(failure, fallback_left, attempt):
+                            break
+                        slot.add("retries")
+                        time.sleep(_backoff(attempt))
+                        continue
+                    quota_service.charge(slot.succeeded(completion, prompt_tokens, time.monotonic() - started))
+                    self._served(position)
+                    return completion
+            raise LLMError(f"No provider could serve '{task}': " + "; ".join(errors))
+
+    async def stream(self, task: str, messages: list, max_tokens=None, temperature=None):
+        """
+        Yields text deltas. Fails over only until the first delta arrives; an
+        error after that propagates to the caller. A stream that fails or is
+        abandoned midway is charged for what it streamed.
+        """
+        _streamed_by.set(None)
+        with metrics.stage("llm"):
+            prompt_tokens, tokens = _budget(messages, max_tokens)
+            route, errors = self.route(task), []
+            for position, slot in enumerate(route):
+                fallback_left = position < len(route) - 1
+                if not self._admitted(slot, tokens, fallback_left, errors):
+                    continue
+                if not fallback_left:
+                    await slot.admit(tokens)
+                started = time.monotonic()
+                async with slot.running():
+                    deltas = slot.provider.stream(messages, max_tokens, temperature)
+                    parts = []
+                    try:
+                        parts.append(await asyncio.wait_for(deltas.__anext__(), slot.timeout))
+                    except StopAsyncIteration:
+                        pass
+                    except Exception as e:
+                        errors.append(f"{slot.name}: {slot.failed(e)}")
+                        await deltas.aclose()
+                        continue
+                    self._served(position)
+                    finished = False
+                    try:
+                        for part in parts:
+                            yield part
+                        async for delta in deltas:
+                            parts.append(delta)
+                            yield delta
+                        finished = True
+                    except GeneratorExit:
+                        # The consumer went away mid-stream, e.g. a client disconnect
+                        slot.add("abandoned")
+                        raise
+                    except Exception as e:
+                        slot.failed(e)
+                        raise
+                    finally:
+                        await deltas.aclose()
+                        if not finished:
+                            # Generated all the same: charge what was streamed
+                            quota_service.charge(prompt_tokens + estimate_tokens("".join(parts)))
+                    text = "".join(parts)
+                    used = slot.succeeded(Completion(text, slot.name, slot.provider.model), prompt_tokens, time.monotonic() - started)
+                    quota_service.charge(used)
+                    _streamed_by.set(slot.provider.model)
+                    return
+            raise LLMError(f"No provider could serve '{task}': " + "; ".join(errors))
+
+    def stats(self) -> dict:
+        return {
+            "routes": self.routes,
+            "failovers": self.failovers,
+            "providers": {name: slot.stats() for name, slot in list(self.slots.items())},
+        }
+
+llm_router = LLMRouter()
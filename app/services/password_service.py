@@ -0,0 +1,90 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from app.core.metrics import percentile_ms
+from app.core.security import hash_password, verify_password, needs_rehash, BCRYPT_ROUNDS
+
+# Worker processes dedicated to bcrypt; kept below the core count so request
+# handling keeps CPU to itself during a login burst
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+# Hash and verify calls admitted at once, running or queued; the rest get a 503
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "64"))
+
+
+class PasswordQueueFull(Exception):
+    pass
+
+
+class PasswordService:
+    """
+    Runs bcrypt in a bounded process pool so that sign-in storms neither block
+    the event loop nor take over the threadpool the sync endpoints share.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=1024)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+        return self._pool
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= PASSWORD_QUEUE_LIMIT:
+                self.rejected += 1
+                raise PasswordQueueFull()
+            self.pending += 1
+
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.latencies.append(time.perf_counter() - started)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, BCRYPT_ROUNDS)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        try:
+            return await self._run(verify_password, password, hashed_password)
+        except ValueError:
+            # Not a bcrypt hash at all
+            return False
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        return needs_rehash(hashed_password, BCRYPT_ROUNDS)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            pending = self.pending
+        return {
+            "workers": PASSWORD_WORKERS,
+            "rounds": BCRYPT_ROUNDS,
+            "in_flight": pending,
+            "queue_depth": max(0, pending - PASSWORD_WORKERS),
+            "queue_limit": PASSWORD_QUEUE_LIMIT,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_p50_ms": percentile_ms(latencies, 0.5),
+            "latency_p95_ms": percentile_ms(latencies, 0.95),
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+password_service = PasswordService()
@@ -0,0 +1,98 @@
+import os
+import threading
+from dataclasses import dataclass
+from sqlalchemy import event
+from app.core.cache import LRUCache
+from app.core.security import password_version
+from app.database import SessionLocal
+from app.models.user import User
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as handlers see it: no session, no lazy relationships."""
+    id: int
+    username: str
+    email: str
+    password_version: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.username, user.email, password_version(user.hashed_password))
+
+
+class PrincipalCache:
+    """
+    Short-lived cache of authenticated users keyed by id, so that requests with a
+    valid token skip the users table. Changes made through the ORM in this process
+    invalidate their entry at once; other workers converge within the TTL.
+    """
+
+    def __init__(self):
+        self.memory = LRUCache(max_entries=PRINCIPAL_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL)
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int):
+        principal = self.memory.get(user_id)
+        with self._lock:
+            if principal is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return principal
+
+    def load(self, user_id: int = None, email: str = None):
+        """Reads the user from the database and caches it. Tokens issued before uid existed look up by email."""
+        generation = self._generation
+        with SessionLocal() as db:
+            query = db.query(User)
+            user = query.filter(User.id == user_id).first() if user_id is not None else query.filter(User.email == email).first()
+            if user is None:
+                return None
+            principal = Principal.from_user(user)
+        # Skip the write if the user changed while we were reading it
+        with self._lock:
+            if generation == self._generation:
+                self.memory.set(principal.id, principal)
+        return principal
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._generation += 1
+        self.memory.delete(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+        self.memory.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "entries": len(self.memory),
+        }
+
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target):
+    principal_cache.invalidate(target.id)
+
+
+@event.listens_for(SessionLocal, "after_bulk_update")
+@event.listens_for(SessionLocal, "after_bulk_delete")
+def _invalidate_bulk(update_context):
+    # Query.update()/delete() bypass the mapper events, so drop everything
+    if update_context.mapper.class_ is User:
+        principal_cache.clear()
@@ -0,0 +1,215 @@
+import os
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.models.question_bank import QuestionBank, BankQuestion, BankQuestionSeen
+from app.services.sections import SectionMap
+
+# Questions in a quiz served from the bank
+QUIZ_BANK_QUESTIONS = int(os.getenv("QUIZ_BANK_QUESTIONS", "5"))
+# Difficulties of a mixed quiz, repeated or cut to the quiz length
+QUIZ_DIFFICULTY_MIX = os.getenv("QUIZ_DIFFICULTY_MIX", "easy,medium,easy,hard,medium").split(",")
+# Questions asked of the LLM per section, and the sections worth asking about
+BANK_QUESTIONS_PER_SECTION = int(os.getenv("BANK_QUESTIONS_PER_SECTION", "6"))
+BANK_MIN_SECTION_WORDS = int(os.getenv("BANK_MIN_SECTION_WORDS", "60"))
+BANK_MAX_SECTIONS = int(os.getenv("BANK_MAX_SECTIONS", "40"))
+# Sections generated at once by one build, on top of the router's own limits
+BANK_SECTION_CONCURRENCY = int(os.getenv("BANK_SECTION_CONCURRENCY", "4"))
+# A build requested this long ago without finishing is requested again
+BANK_RETRY_SECONDS = int(os.getenv("BANK_RETRY_SECONDS", "900"))
+# Banks are rebuilt in the background once this old, and served meanwhile
+BANK_TTL_DAYS = float(os.getenv("BANK_TTL_DAYS", "30"))
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class QuestionBankService:
+    """
+    Multiple-choice questions generated once per section of a source and
+    language by a background job, then sampled into quizzes without calling an
+    LLM. Each user is served questions they have not seen on the source until
+    the bank runs out, and a new round starts. Quizzes mix difficulties and
+    spread their questions over as many sections as they can.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    # Building
+
+    def request_build(self, db: Session, source_id: int, url: str, language: str) -> bool:
+        """
+        Queues a build of the source's bank unless one is under way or the bank
+        is fresh. Claimed with a conditional UPDATE, so concurrent requests from
+        any process queue a single job. Commits the session.
+        """
+        now = _now()
+        claimed = db.query(QuestionBank).filter(
+            QuestionBank.source_id == source_id,
+            QuestionBank.language == language,
+            or_(QuestionBank.requested_at.is_(None), QuestionBank.requested_at < now - timedelta(seconds=BANK_RETRY_SECONDS)),
+            or_(QuestionBank.built_at.is_(None), QuestionBank.built_at < now - timedelta(days=BANK_TTL_DAYS)),
+        ).update({"requested_at": now}, synchronize_session=False)
+        if not claimed and db.get(QuestionBank, (source_id, language)) is None:
+            try:
+                with db.begin_nested():
+                    db.add(QuestionBank(source_id=source_id, language=language, questions=0, sections=0, requested_at=now))
+                claimed = 1
+            except IntegrityError:
+                # Requested concurrently by another request
+                pass
+        if not claimed:
+            # Even an UPDATE that matched nothing holds SQLite's write lock until the transaction ends
+            db.commit()
+            return False
+
+        from app.services.jobs import job_queue
+        job_queue.submit(db, None, "question_bank", {"url": url, "source_id": source_id, "lang": language})
+        self._count("builds_requested")
+        return True
+
+    def eligible_sections(self, sections: dict) -> dict:
+        """Sections with enough text to ask about, in document order."""
+        if isinstance(sections, SectionMap):
+            # Counted over the outline, so that short sections are never sliced
+            words = sections.words
+        else:
+            words = lambda title: len(sections[title].split())
+        eligible = [title for title in sections if words(title) >= BANK_MIN_SECTION_WORDS]
+        return {title: sections[title] for title in eligible[:BANK_MAX_SECTIONS]}
+
+    @staticmethod
+    def valid_question(q) -> bool:
+        return (
+            isinstance(q, dict) and bool(q.get("question")) and q.get("answer") is not None
+            and isinstance(q.get("options"), list) and len(q["options"]) >= 2
+        )
+
+    def store(self, db: Session, source_id: int, language: str, generated: dict) -> int:
+        """Replaces the bank with generated ({section: questions}) and marks it built. Commits."""
+        old = [question_id for (question_id,) in db.query(BankQuestion.id).filter(
+            BankQuestion.source_id == source_id, BankQuestion.language == language
+        )]
+        if old:
+            # Deleted explicitly: SQLite does not enforce the cascade by default
+            db.query(BankQuestionSeen).filter(BankQuestionSeen.question_id.in_(old)).delete(synchronize_session=False)
+            db.query(BankQuestion).filter(BankQuestion.id.in_(old)).delete(synchronize_session=False)
+
+        rows = []
+        for section, questions in generated.items():
+            for q in filter(self.valid_question, questions):
+                difficulty = str(q.get("difficulty", "")).lower()
+                rows.append(BankQuestion(
+                    source_id=source_id,
+                    language=language,
+                    section=section,
+                    difficulty=difficulty if difficulty in DIFFICULTIES else "medium",
+                    question=q["question"],
+                    options=[str(option) for option in q["options"]],
+                    answer=str(q["answer"]),
+                ))
+        db.add_all(rows)
+        db.query(QuestionBank).filter(
+            QuestionBank.source_id == source_id, QuestionBank.language == language
+        ).update({"questions": len(rows), "sections": len(generated), "built_at": _now()}, synchronize_session=False)
+        db.commit()
+        self._count("builds")
+        self._count("questions_generated", len(rows))
+        return len(rows)
+
+    # Serving
+
+    def _pick(self, candidates: list, levels: list, sections: Counter, rng: random.Random) -> list:
+        """
+        One candidate per entry of levels, of that difficulty when the bank has
+        one left, taken from the sections least used so far.
+        """
+        pool = list(candidates)
+        rng.shuffle(pool)
+        chosen = []
+        for level in levels:
+            if not pool:
+                break
+            matching = [row for row in pool if row.difficulty == level] or pool
+            row = min(matching, key=lambda r: sections[r.section])
+            pool.remove(row)
+            sections[row.section] += 1
+            chosen.append(row)
+        return chosen
+
+    def sample(self, db: Session, source_id: int, language: str, user_id: int,
+               count: int = QUIZ_BANK_QUESTIONS, difficulty: str = None) -> list:
+        """
+        A quiz of count questions from the bank, as dicts shaped like generated
+        quiz questions plus their section and difficulty, recorded as seen by
+        the user. Empty while the bank has not been built. Leaves the commit to
+        the caller.
+        """
+        with metrics.stage("question_bank"):
+            rows = db.query(
+                BankQuestion.id, BankQuestion.section, BankQuestion.difficulty,
+                BankQuestionSeen.question_id.isnot(None).label("seen"),
+            ).outerjoin(BankQuestionSeen, and_(
+                BankQuestionSeen.question_id == BankQuestion.id, BankQuestionSeen.user_id == user_id
+            )).filter(BankQuestion.source_id == source_id, BankQuestion.language == language).all()
+            if not rows:
+                self._count("misses")
+                return []
+
+            rng = random.Random()
+            levels = [difficulty] * count if difficulty else [QUIZ_DIFFICULTY_MIX[i % len(QUIZ_DIFFICULTY_MIX)] for i in range(count)]
+            sections = Counter()
+            unseen = [row for row in rows if not row.seen]
+            chosen = self._pick(unseen, levels, sections, rng)
+            if len(chosen) < count:
+                # The user has been through the bank: start the next round with the rest of this quiz
+                seen = [row for row in rows if row.seen]
+                db.query(BankQuestionSeen).filter(
+                    BankQuestionSeen.user_id == user_id, BankQuestionSeen.question_id.in_([row.id for row in seen])
+                ).delete(synchronize_session=False)
+                chosen += self._pick(seen, levels[len(chosen):], sections, rng)
+                self._count("rounds_restarted")
+
+            ids = [row.id for row in chosen]
+            self._mark_seen(db, user_id, ids)
+            questions = {q.id: q for q in db.query(BankQuestion).filter(BankQuestion.id.in_(ids))}
+            self._count("quizzes_served")
+        order = {level: i for i, level in enumerate(DIFFICULTIES)}
+        return [
+            {"question": q.question, "options": q.options, "answer": q.answer, "section": q.section, "difficulty": q.difficulty}
+            for q in sorted((questions[i] for i in ids if i in questions), key=lambda q: order.get(q.difficulty, 1))
+        ]
+
+    def _mark_seen(self, db: Session, user_id: int, question_ids: list):
+        if not question_ids:
+            return
+        table = BankQuestionSeen.__table__
+        rows = [{"user_id": user_id, "question_id": question_id, "seen_at": _now()} for question_id in question_ids]
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+            # Served concurrently to the same user by another request
+            db.execute(statement.on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.question_id]), rows)
+        else:
+            db.execute(table.insert(), rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+question_bank = QuestionBankService()
@@ -0,0 +1,42 @@
+from sqlalchemy.orm import Session
+from app.models.quiz import Quiz, QuizQuestion
+
+class QuizService:
+    @staticmethod
+    def save_quiz(db: Session, article_id: int, quiz_data: dict, language: str):
+        """
+        Stores a generated quiz and its answer key so submissions can be graded
+        without regenerating it. Returns None when generation failed.
+        """
+        questions = quiz_data.get("quiz") if isinstance(quiz_data, dict) else None
+        if not questions:
+            return None
+
+        quiz = Quiz(article_id=article_id, language=language)
+        for position, q in enumerate(questions):
+            if not q.get("question") or q.get("answer") is None:
+                continue
+            quiz.questions.append(QuizQuestion(
+                position=position,
+                question=q["question"],
+                options=q.get("options", []),
+                answer=str(q["answer"])
+            ))
+        db.add(quiz)
+        db.flush()
+        return quiz
+
+    @staticmethod
+    def get_quiz(db: Session, article_id: int, quiz_id: int = None):
+        query = db.query(Quiz).filter(Quiz.article_id == article_id)
+        if quiz_id is not None:
+            return query.filter(Quiz.id == quiz_id).first()
+        return query.order_by(Quiz.id.desc()).first()
+
+    @staticmethod
+    def grade(quiz: Quiz, answers) -> int:
+        # Last answer wins if a question is submitted twice
+        submitted = {a.question: a.user_answer for a in answers}
+        return sum(1 for q in quiz.questions if submitted.get(q.question) == q.answer)
+
+quiz_service = QuizService()
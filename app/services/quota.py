@@ -0,0 +1,399 @@
+import os
+import math
+import time
+import logging
+import threading
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.core.cache import LRUCache
+from app.database import SessionLocal, engine
+from app.models.quota_override import QuotaOverride
+from app.models.quota_usage import QuotaUsage
+
+logger = logging.getLogger(__name__)
+
+QUOTA_ENABLED = os.getenv("QUOTA_ENABLED", "true").lower() in ("1", "true", "yes")
+# "memory" counts per process (one worker); "database" or "redis" share the
+# counters between workers
+QUOTA_STORE = os.getenv("QUOTA_STORE", "memory")
+QUOTA_REDIS_URL = os.getenv("QUOTA_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+QUOTA_WINDOW_SECONDS = int(os.getenv("QUOTA_WINDOW_SECONDS", "3600"))
+# LLM tokens per user and window, shared by every endpoint; 0 for no limit
+QUOTA_USER_TOKENS = int(os.getenv("QUOTA_USER_TOKENS", "200000"))
+QUOTA_OVERRIDE_TTL = float(os.getenv("QUOTA_OVERRIDE_TTL", "60"))
+
+# Requests per user and window; override with QUOTA_<ENDPOINT>_REQUESTS, and
+# cap an endpoint's own token use with QUOTA_<ENDPOINT>_TOKENS
+DEFAULT_REQUESTS = {
+    "summarize": 60,
+    "translate": 60,
+    "quiz": 30,
+    "batch": 10,
+}
+
+
+@dataclass(frozen=True)
+class Limits:
+    requests: int
+    endpoint_tokens: int
+    user_tokens: int
+
+
+@dataclass(frozen=True)
+class Override:
+    requests: int = None
+    tokens: int = None
+    exempt: bool = False
+
+    @classmethod
+    def from_row(cls, row: QuotaOverride) -> "Override":
+        return cls(row.requests, row.tokens, bool(row.exempt))
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class MemoryQuotaStore:
+    """Counters in this process only."""
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._purged = time.monotonic()
+
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._purged > ttl:
+                self._counts = {k: v for k, v in self._counts.items() if v[1] > now}
+                self._purged = now
+            count, expires = self._counts.get(key, (0, 0.0))
+            if expires <= now:
+                count = 0
+            count += amount
+            self._counts[key] = (count, now + ttl)
+            return count
+
+    def get_many(self, keys: list) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [count if expires > now else 0 for count, expires in (self._counts.get(k, (0, 0.0)) for k in keys)]
+
+
+class DatabaseQuotaStore:
+    """Counters in the quota_usage table, upserted like stat_counters."""
+
+    name = "database"
+    blocking = True
+
+    def __init__(self, bind=None):
+        self.bind = bind or engine
+        self._purged = 0.0
+
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        table = QuotaUsage.__table__
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl)
+        with self.bind.begin() as connection:
+            dialect = connection.dialect.name
+            if dialect in ("postgresql", "sqlite"):
+                insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+                statement = insert(table).values(key=key, count=amount, expires_at=expires_at)
+                connection.execute(statement.on_conflict_do_update(
+                    index_elements=[table.c.key],
+                    set_={"count": table.c.count + amount, "expires_at": statement.excluded.expires_at},
+                ))
+            else:
+                result = connection.execute(
+                    update(table).where(table.c.key == key).values(count=table.c.count + amount, expires_at=expires_at)
+                )
+                if result.rowcount == 0:
+                    connection.execute(table.insert(), {"key": key, "count": amount, "expires_at": expires_at})
+            count = connection.execute(select(table.c.count).where(table.c.key == key)).scalar()
+            if time.monotonic() - self._purged > ttl:
+                self._purged = time.monotonic()
+                connection.execute(delete(table).where(table.c.expires_at < datetime.now(timezone.utc)))
+        return count
+
+    def get_many(self, keys: list) -> list:
+        table = QuotaUsage.__table__
+        with self.bind.connect() as connection:
+            counts = dict(connection.execute(
+                select(table.c.key, table.c.count)
+                .where(table.c.key.in_(keys), table.c.expires_at > datetime.now(timezone.utc))
+            ).all())
+        return [counts.get(key, 0) for key in keys]
+
+
+class RedisQuotaStore:
+    """Counters on any Redis-compatible server, expired by the server."""
+
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def incr(self, key: str, amount: int, ttl: int) -> int:
+        name = f"quota:{key}"
+        pipeline = self.client.pipeline()
+        pipeline.incrby(name, amount)
+        pipeline.expire(name, ttl)
+        return int(pipeline.execute()[0])
+
+    def get_many(self, keys: list) -> list:
+        return [int(value or 0) for value in self.client.mget([f"quota:{key}" for key in keys])]
+
+
+def make_store(kind: str = QUOTA_STORE):
+    if kind == "memory":
+        return MemoryQuotaStore()
+    if kind == "database":
+        return DatabaseQuotaStore()
+    if kind == "redis":
+        return RedisQuotaStore(QUOTA_REDIS_URL)
+    raise RuntimeError(f"Unknown QUOTA_STORE '{kind}'")
+
+
+def retry_after(current: int, previous: int, elapsed: float, limit: int, cost: int, window: int) -> int:
+    """
+    Seconds until the sliding estimate, the current window's count plus the
+    previous one's scaled by how much of it still overlaps, leaves room for cost.
+    """
+    room = limit - cost
+    if room < 0:
+        return 2 * window
+    if current <= room and previous > 0:
+        excess = previous * (1 - elapsed / window) + current - room
+        seconds = min(window - elapsed, window * excess / previous)
+    else:
+        # Only the current window's count decaying after it rolls over frees room
+        seconds = (window - elapsed) + window * (1 - room / current)
+    return max(1, math.ceil(seconds))
+
+
+_charging = contextvars.ContextVar("quota_charging", default=None)
+
+
+class QuotaService:
+    """
+    Per-user request and token budgets on the AI endpoints, counted over a
+    sliding window approximated from two fixed windows. Requests are counted at
+    admission; LLM tokens are charged by the router after each call to whoever
+    is bound to the current context, and a user whose budget is spent is turned
+    away until enough of it slides out of the window. Store errors admit the
+    request: quotas protect the shared provider budget, not correctness.
+    """
+
+    def __init__(self, window: int = QUOTA_WINDOW_SECONDS):
+        self.window = window
+        self._store = None
+        self._writer = None
+        self.overrides = LRUCache(max_entries=10000, ttl=QUOTA_OVERRIDE_TTL)
+        self.admitted = Counter()
+        self.rejected = Counter()
+        self.tokens_charged = Counter()
+        self.store_errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        with self._lock:
+            if self._store is None:
+                self._store = make_store()
+            return self._store
+
+    def limits(self, endpoint: str, override: Override = None) -> Limits:
+        """None for exempt users. 0 means unlimited."""
+        if override is not None and override.exempt:
+            return None
+        requests = int(os.getenv(f"QUOTA_{endpoint.upper()}_REQUESTS", DEFAULT_REQUESTS[endpoint]))
+        endpoint_tokens = int(os.getenv(f"QUOTA_{endpoint.upper()}_TOKENS", "0"))
+        user_tokens = QUOTA_USER_TOKENS
+        if override is not None:
+            requests = requests if override.requests is None else override.requests
+            user_tokens = user_tokens if override.tokens is None else override.tokens
+        return Limits(requests, endpoint_tokens, user_tokens)
+
+    def _windows(self) -> tuple:
+        """(current window index, seconds into it)."""
+        now = time.time()
+        return int(now // self.window), now % self.window
+
+    @staticmethod
+    def _key(user_id: int, metric: str, index: int) -> str:
+        return f"{user_id}:{metric}:{index}"
+
+    # Overrides
+
+    def cached_override(self, user_id: int):
+        """(hit, override) from the local cache; override is None for users without one."""
+        entry = self.overrides.peek(user_id)
+        if entry is None or not entry[1]:
+            return False, None
+        return True, entry[0]
+
+    def load_override(self, user_id: int) -> Override:
+        with SessionLocal() as db:
+            row = db.get(QuotaOverride, user_id)
+            override = Override.from_row(row) if row is not None else None
+        self.overrides.set(user_id, override)
+        return override
+
+    def set_override(self, db: Session, user_id: int, requests: int = None, tokens: int = None,
+                     exempt: bool = False, note: str = None) -> QuotaOverride:
+        row = db.get(QuotaOverride, user_id) or QuotaOverride(user_id=user_id)
+        row.requests, row.tokens, row.exempt, row.note = requests, tokens, exempt, note
+        db.add(row)
+        db.commit()
+        # Other workers pick the change up within QUOTA_OVERRIDE_TTL
+        self.overrides.delete(user_id)
+        return row
+
+    def delete_override(self, db: Session, user_id: int) -> bool:
+        deleted = db.query(QuotaOverride).filter(QuotaOverride.user_id == user_id).delete()
+        db.commit()
+        self.overrides.delete(user_id)
+        return bool(deleted)
+
+    # Admission and charging
+
+    def admit(self, user_id: int, endpoint: str, override: Override = None):
+        """Counts one request against the user's quota, or raises QuotaExceeded."""
+        limits = self.limits(endpoint, override)
+        if not QUOTA_ENABLED or limits is None:
+            return
+        index, elapsed = self._windows()
+        weight = 1 - elapsed / self.window
+        budgets = [
+            (f"{endpoint} token budget", f"{endpoint}:tokens", limits.endpoint_tokens),
+            ("token budget", "tokens", limits.user_tokens),
+        ]
+        budgets = [budget for budget in budgets if budget[2] > 0]
+        try:
+            keys = [self._key(user_id, metric, i) for _, metric, _ in budgets for i in (index, index - 1)]
+            keys.append(self._key(user_id, f"{endpoint}:requests", index - 1))
+            counts = self.store.get_many(keys)
+            for position, (label, _, limit) in enumerate(budgets):
+                current, previous = counts[2 * position], counts[2 * position + 1]
+                if previous * weight + current + 1 > limit:
+                    self._reject(endpoint, f"{label} of {limit} tokens", current, previous, elapsed, limit)
+
+            if limits.requests > 0:
+                key = self._key(user_id, f"{endpoint}:requests", index)
+                current, previous = self.store.incr(key, 1, 2 * self.window), counts[-1]
+                if previous * weight + current > limits.requests:
+                    self.store.incr(key, -1, 2 * self.window)
+                    self._reject(endpoint, f"limit of {limits.requests} {endpoint} requests",
+                                 current - 1, previous, elapsed, limits.requests)
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            with self._lock:
+                self.store_errors += 1
+            logger.warning("Quota store unavailable, admitting request: %s", e)
+        with self._lock:
+            self.admitted[endpoint] += 1
+
+    def _reject(self, endpoint: str, what: str, current: int, previous: int, elapsed: float, limit: int):
+        with self._lock:
+            self.rejected[endpoint] += 1
+        seconds = retry_after(current, previous, elapsed, limit, 1, self.window)
+        raise QuotaExceeded(f"Quota exceeded: {what} per {self.window}s. Retry in {seconds}s", seconds)
+
+    def bind(self, user_id: int, endpoint: str):
+        """Charges LLM tokens spent in the current context to user_id and endpoint."""
+        return _charging.set((user_id, endpoint))
+
+    @contextmanager
+    def charging(self, user_id: int, endpoint: str):
+        token = self.bind(user_id, endpoint)
+        try:
+            yield
+        finally:
+            _charging.reset(token)
+
+    def charge(self, tokens: int):
+        bound = _charging.get()
+        if bound is None or not QUOTA_ENABLED or tokens <= 0:
+            return
+        user_id, endpoint = bound
+        with self._lock:
+            self.tokens_charged[endpoint] += tokens
+        if self.store.blocking:
+            # Called from the event loop: never wait on the store there
+            with self._lock:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quota")
+            self._writer.submit(self._write_tokens, user_id, endpoint, tokens)
+        else:
+            self._write_tokens(user_id, endpoint, tokens)
+
+    def _write_tokens(self, user_id: int, endpoint: str, tokens: int):
+        index, _ = self._windows()
+        try:
+            for metric in ("tokens", f"{endpoint}:tokens"):
+                self.store.incr(self._key(user_id, metric, index), tokens, 2 * self.window)
+        except Exception as e:
+            with self._lock:
+                self.store_errors += 1
+            logger.warning("Could not charge %s tokens to user %s: %s", tokens, user_id, e)
+
+    # Reports
+
+    def usage(self, user_id: int, override: Override = None) -> dict:
+        """Sliding-window usage of one user against their limits."""
+        index, elapsed = self._windows()
+        weight = 1 - elapsed / self.window
+        metrics = ["tokens"] + [f"{e}:{kind}" for e in DEFAULT_REQUESTS for kind in ("requests", "tokens")]
+        counts = self.store.get_many([self._key(user_id, m, i) for m in metrics for i in (index, index - 1)])
+        used = {m: round(counts[2 * n + 1] * weight + counts[2 * n]) for n, m in enumerate(metrics)}
+        endpoints = {}
+        for endpoint in DEFAULT_REQUESTS:
+            limits = self.limits(endpoint, override)
+            endpoints[endpoint] = {
+                "requests": used[f"{endpoint}:requests"],
+                "tokens": used[f"{endpoint}:tokens"],
+                "request_limit": limits.requests if limits else None,
+                "token_limit": limits.endpoint_tokens if limits else None,
+            }
+        limits = self.limits("summarize", override)
+        return {
+            "window_seconds": self.window,
+            "exempt": limits is None,
+            "tokens": used["tokens"],
+            "token_limit": limits.user_tokens if limits else None,
+            "endpoints": endpoints,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "enabled": QUOTA_ENABLED,
+            "store": QUOTA_STORE,
+            "window_seconds": self.window,
+            "defaults": {endpoint: self.limits(endpoint).__dict__ for endpoint in DEFAULT_REQUESTS},
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "tokens_charged": dict(self.tokens_charged),
+            "store_errors": self.store_errors,
+        }
+
+    def shutdown(self):
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+quota_service = QuotaService()
@@ -0,0 +1,317 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.article import Article
+from app.models.llm_result import LLMResult
+from app.models.search_section import SearchSection
+from app.models.source import Source, SourceKind
+from app.models.uploaded_document import UploadedDocument
+from app.models.wiki_article import WikiArticle
+from app.services.chunking import chunk_text
+from app.services.ingestion import ingestion_service
+
+logger = logging.getLogger(__name__)
+
+# Sections are indexed in parts of about this size, so that hits point at a passage
+SEARCH_PART_TOKENS = int(os.getenv("SEARCH_PART_TOKENS", "300"))
+SEARCH_REINDEX_BATCH = 200
+SNIPPET_WORDS = 24
+HIGHLIGHT = ("**", "**")
+OUTPUT_HEADINGS = {"summarize": "Summary", "summarize_document": "Summary", "translate": "Translation", "quiz": "Quiz"}
+WORD = re.compile(r"[^\W_]+")
+TERM = re.compile(r'(-?)(?:"([^"]*)"?|(\S+))')
+
+HEADLINE_OPTIONS = f"MaxFragments=2, MinWords=8, MaxWords={SNIPPET_WORDS}, StartSel={HIGHLIGHT[0]}, StopSel={HIGHLIGHT[1]}"
+
+_OWNED = """
+    (s.result_key IN (SELECT result_key FROM articles WHERE owner_id = :user_id AND result_key IS NOT NULL)
+     OR (s.result_key IS NULL AND s.source_id IN (SELECT source_id FROM articles WHERE owner_id = :user_id)))
+"""
+_POSTGRES_SEARCH = text(f"""
+    SELECT ranked.id, ranked.source_id, ranked.result_key, ranked.heading, ranked.score,
+           ts_headline('simple', ranked.body, ranked.query, :headline) AS snippet
+    FROM (
+        SELECT s.id, s.source_id, s.result_key, s.heading, s.body, q.query,
+               ts_rank_cd(to_tsvector('simple', coalesce(s.heading, '') || ' ' || s.body), q.query, 1) AS score
+        FROM search_sections s, websearch_to_tsquery('simple', :query) AS q(query)
+        WHERE to_tsvector('simple', coalesce(s.heading, '') || ' ' || s.body) @@ q.query AND {_OWNED}
+        ORDER BY score DESC, s.id
+        LIMIT :limit
+    ) ranked
+    ORDER BY ranked.score DESC, ranked.id
+""")
+_SQLITE_SEARCH = text(f"""
+    SELECT s.id, s.source_id, s.result_key, s.heading,
+           snippet(search_sections_fts, 1, '{HIGHLIGHT[0]}', '{HIGHLIGHT[1]}', '…', {SNIPPET_WORDS}) AS snippet,
+           -bm25(search_sections_fts, 2.0, 1.0) AS score
+    FROM search_sections_fts JOIN search_sections s ON s.id = search_sections_fts.rowid
+    WHERE search_sections_fts MATCH :query AND {_OWNED}
+    ORDER BY bm25(search_sections_fts, 2.0, 1.0), s.id
+    LIMIT :limit
+""")
+
+
+def source_ref(source_id: int) -> str:
+    return f"source:{source_id}"
+
+
+def result_ref(result_key: str) -> str:
+    return f"result:{result_key}"
+
+
+class SearchService:
+    """
+    Full-text search over what users have processed: the sections of their
+    Wikipedia articles, the text of their PDFs and the outputs generated from
+    them. Sources and outputs are indexed once, by a background writer after
+    the transaction that records the first article referencing them commits,
+    so that chunking a large document never adds to request latency. A query
+    only ranks the matches inside the searching user's own articles, found
+    through the index.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._writer = None
+
+    # Indexing
+
+    def _source_parts(self, connection, source) -> list:
+        if source.kind == SourceKind.DOCUMENT:
+            document_text = connection.execute(
+                select(UploadedDocument.text).where(UploadedDocument.sha256 == source.locator.split(":", 1)[1])
+            ).scalar()
+            return [(None, part) for part in chunk_text(document_text or "", SEARCH_PART_TOKENS)]
+
+        lang, title = ingestion_service.parse_wiki_url(source.locator)
+        sections = connection.execute(
+            select(WikiArticle.sections)
+            .where(WikiArticle.lang == lang, WikiArticle.title == ingestion_service.normalize_title(title))
+            .order_by(WikiArticle.fetched_at.desc())
+            .limit(1)
+        ).scalar()
+        return [
+            (heading, part)
+            for heading, body in (sections or {}).items()
+            for part in chunk_text(body, SEARCH_PART_TOKENS)
+        ]
+
+    @staticmethod
+    def _output_parts(operation: str, output: str) -> list:
+        heading = OUTPUT_HEADINGS.get(operation, operation)
+        if operation == "quiz":
+            try:
+                questions = json.loads(output).get("quiz", [])
+            except (ValueError, AttributeError):
+                return []
+            output = "\n\n".join(
+                " ".join([q.get("question", ""), *map(str, q.get("options", [])), str(q.get("answer", ""))])
+                for q in questions if isinstance(q, dict)
+            )
+        return [(heading, part) for part in chunk_text(output, SEARCH_PART_TOKENS)]
+
+    def _insert(self, connection, rows: list):
+        table = SearchSection.__table__
+        dialect = connection.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+            # Indexed concurrently by another transaction
+            statement = statement.on_conflict_do_nothing(index_elements=[table.c.ref, table.c.position])
+        else:
+            statement = insert(table)
+        connection.execute(statement, rows)
+
+    def index(self, connection, pairs: set) -> int:
+        """
+        Indexes the sources and outputs of (source_id, result_key) pairs that are
+        not indexed yet. Runs on the caller's connection and transaction.
+        """
+        refs = {source_ref(source_id) for source_id, _ in pairs} | {result_ref(key) for _, key in pairs if key}
+        indexed = set(connection.execute(
+            select(SearchSection.ref).where(SearchSection.ref.in_(refs), SearchSection.position == 0)
+        ).scalars())
+        source_ids = {source_id for source_id, _ in pairs if source_ref(source_id) not in indexed}
+        results = {key: source_id for source_id, key in pairs if key and result_ref(key) not in indexed}
+        if not source_ids and not results:
+            return 0
+
+        started = time.perf_counter()
+        rows = []
+        for source in connection.execute(select(Source).where(Source.id.in_(source_ids))).all():
+            for position, (heading, body) in enumerate(self._source_parts(connection, source)):
+                rows.append({"ref": source_ref(source.id), "position": position, "source_id": source.id,
+                             "result_key": None, "heading": heading, "body": body})
+        if results:
+            outputs = connection.execute(
+                select(LLMResult.key, LLMResult.operation, LLMResult.output).where(LLMResult.key.in_(results))
+            ).all()
+            for key, operation, output in outputs:
+                for position, (heading, body) in enumerate(self._output_parts(operation, output)):
+                    rows.append({"ref": result_ref(key), "position": position, "source_id": results[key],
+                                 "result_key": key, "heading": heading, "body": body})
+        if rows:
+            self._insert(connection, rows)
+        with self._lock:
+            self.counters["indexed_parts"] += len(rows)
+            self.counters["index_ms"] += round((time.perf_counter() - started) * 1000)
+        return len(rows)
+
+    def index_later(self, pairs: set):
+        """Indexes committed (source_id, result_key) pairs on the background writer; reindex catches up on any lost."""
+        with self._lock:
+            if self._writer is None:
+                # One writer: index inserts never contend with each other
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-index")
+        self._writer.submit(self._index_committed, pairs)
+
+    def _index_committed(self, pairs: set):
+        try:
+            with SessionLocal() as db:
+                self.index(db.connection(), pairs)
+                db.commit()
+        except Exception as e:
+            with self._lock:
+                self.counters["index_errors"] += 1
+            logger.warning("Could not index %s articles for search: %s", len(pairs), e)
+
+    def reindex(self, db: Session) -> int:
+        """Indexes whatever articles reference but the index lacks, e.g. rows older than the index."""
+        pairs = [tuple(pair) for pair in db.query(Article.source_id, Article.result_key).distinct()]
+        total = 0
+        for start in range(0, len(pairs), SEARCH_REINDEX_BATCH):
+            total += self.index(db.connection(), set(pairs[start:start + SEARCH_REINDEX_BATCH]))
+        db.commit()
+        return total
+
+    # Queries
+
+    @staticmethod
+    def fts5_query(query: str) -> str:
+        """
+        Web-style input (words, "quoted phrases", -excluded) as an FTS5 query in
+        which every word or phrase must match; operators and column filters in
+        the input are taken as words.
+        """
+        included, excluded = [], []
+        for negated, phrase, word in TERM.findall(query):
+            words = WORD.findall(phrase or word)
+            if words:
+                (excluded if negated else included).append('"' + " ".join(words) + '"')
+        if not included:
+            return ""
+        return " ".join(included) + "".join(f" NOT {term}" for term in excluded)
+
+    @staticmethod
+    def _snippet(body: str, words: list) -> str:
+        lowered = body.lower()
+        found = [lowered.find(word) for word in words if word in lowered]
+        start = max(0, min(found) - 60) if found else 0
+        excerpt = " ".join(body[start:].split()[:SNIPPET_WORDS])
+        for word in words:
+            excerpt = re.sub(f"(?i)({re.escape(word)})", rf"{HIGHLIGHT[0]}\1{HIGHLIGHT[1]}", excerpt)
+        return ("…" if start else "") + excerpt
+
+    def _search_scan(self, db: Session, user_id: int, query: str, limit: int) -> list:
+        # Databases without a full-text index: a filtered scan, unranked
+        words = [word.lower() for word in WORD.findall(query)]
+        rows = db.execute(
+            text(f"SELECT s.id, s.source_id, s.result_key, s.heading, s.body FROM search_sections s WHERE {_OWNED}"
+                 + "".join(f" AND lower(s.body) LIKE :w{i}" for i in range(len(words)))
+                 + " ORDER BY s.id LIMIT :limit"),
+            {"user_id": user_id, "limit": limit, **{f"w{i}": f"%{word}%" for i, word in enumerate(words)}},
+        ).mappings().all()
+        return [{**row, "snippet": self._snippet(row["body"], words), "score": 0.0} for row in rows]
+
+    def search(self, db: Session, user_id: int, query: str, limit: int = 20) -> list:
+        """Best matches among the user's own sources and outputs, with the article each came from."""
+        if not WORD.search(query):
+            return []
+        started = time.perf_counter()
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            rows = db.execute(_POSTGRES_SEARCH, {
+                "query": query, "user_id": user_id, "limit": limit, "headline": HEADLINE_OPTIONS
+            }).mappings().all()
+        elif dialect == "sqlite":
+            match = self.fts5_query(query)
+            rows = db.execute(_SQLITE_SEARCH, {"query": match, "user_id": user_id, "limit": limit}).mappings().all() if match else []
+        else:
+            rows = self._search_scan(db, user_id, query, limit)
+
+        hits = []
+        if rows:
+            source_ids = {row["source_id"] for row in rows}
+            result_keys = {row["result_key"] for row in rows if row["result_key"]}
+            articles = db.query(Article.id, Article.title, Article.action, Article.source_id, Article.result_key).filter(
+                Article.owner_id == user_id,
+                Article.source_id.in_(source_ids) | Article.result_key.in_(result_keys)
+            ).order_by(Article.created_at.desc(), Article.id.desc()).all()
+            sources = dict(db.query(Source.id, Source.locator).filter(Source.id.in_(source_ids)).all())
+            # The most recent article of the source, or that references the output
+            by_source, by_result = {}, {}
+            for article in articles:
+                by_source.setdefault(article.source_id, article)
+                if article.result_key:
+                    by_result.setdefault(article.result_key, article)
+
+            for row in rows:
+                article = by_result.get(row["result_key"]) if row["result_key"] else by_source.get(row["source_id"])
+                if article is None:
+                    continue
+                locator = sources.get(row["source_id"])
+                hits.append({
+                    "article_id": article.id,
+                    "title": article.title,
+                    "action": getattr(article.action, "value", article.action),
+                    "url": locator if locator and not locator.startswith("document:") else None,
+                    "match": "output" if row["result_key"] else "source",
+                    "heading": row["heading"],
+                    "snippet": row["snippet"],
+                    "score": round(float(row["score"]), 4),
+                })
+
+        with self._lock:
+            self.counters["searches"] += 1
+            self.counters["search_ms"] += round((time.perf_counter() - started) * 1000)
+        return hits
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        searches = counters.get("searches", 0)
+        return {
+            **counters,
+            "search_avg_ms": round(counters.get("search_ms", 0) / searches, 2) if searches else 0.0,
+        }
+
+search_service = SearchService()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_articles(session, flush_context):
+    # Dirty articles too: legacy articles get their result_key set on export
+    pairs = {(obj.source_id, obj.result_key) for obj in session.new | session.dirty if isinstance(obj, Article)}
+    if pairs:
+        session.info.setdefault("search_pairs", set()).update(pairs)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _index_articles(session):
+    pairs = session.info.pop("search_pairs", None)
+    if pairs:
+        search_service.index_later(pairs)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_articles(session):
+    session.info.pop("search_pairs", None)
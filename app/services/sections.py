@@ -0,0 +1,158 @@
+import re
+from collections.abc import Mapping
+from app.services.chunking import CHARS_PER_TOKEN
+
+# "== Title ==" at level 2 down to "====== Title ======" at level 6, on a line of its own.
+# The literal "\n==" prefix lets re skip straight to candidate lines instead of
+# trying every position; extracts open with the lead, never with a heading.
+HEADING = re.compile(r"\n==(={0,4})[ \t]*([^\n]+?)[ \t]*==\1[ \t]*(?=\n|\Z)")
+WORD = re.compile(r"\w+")
+# Top-level sections that carry no article content; their subsections go with them
+EXCLUDED_SECTIONS = frozenset(["references", "external links", "see also", "further reading", "notes"])
+
+
+class Section:
+    """
+    A node of an article's outline: the lead (level 1, "Introduction") is the
+    root and "== ... ==" sections are its children. Holds offsets into the
+    original text instead of copies: the body (the text up to the first
+    subsection) is sliced on access, and its sizes are counted over the span.
+    """
+
+    __slots__ = ("source", "level", "title", "start", "body_end", "parent", "children", "_words")
+
+    def __init__(self, source: str, level: int, title: str, start: int, parent=None):
+        self.source = source
+        self.level = level
+        self.title = title
+        self.start = start
+        self.body_end = len(source)
+        self.parent = parent
+        self.children = []
+        self._words = None
+
+    def __repr__(self):
+        return f"Section({self.level}, {self.title!r}, {self.start}:{self.body_end})"
+
+    @property
+    def body(self) -> str:
+        return self.source[self.start:self.body_end].strip()
+
+    @property
+    def words(self) -> int:
+        if self._words is None:
+            # finditer over the span: no copy of the body
+            self._words = sum(1 for _ in WORD.finditer(self.source, self.start, self.body_end))
+        return self._words
+
+    @property
+    def tokens(self) -> int:
+        """Estimated from the body's offsets."""
+        return (self.body_end - self.start) // CHARS_PER_TOKEN
+
+    def walk(self):
+        """This section and its descendants, in document order."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def entries(self, excluded=EXCLUDED_SECTIONS) -> dict:
+        """
+        {title: section} in document order. Top-level sections in excluded are
+        dropped with their subsections. A title seen before is qualified with
+        its parent's, then numbered, so that no section overwrites another.
+        """
+        entries = {}
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.parent is self and node.title.lower() in excluded:
+                continue
+            key = node.title
+            if key in entries and node.parent is not self and node is not self:
+                key = f"{node.parent.title} / {node.title}"
+            base, n = key, 2
+            while key in entries:
+                key, n = f"{base} ({n})", n + 1
+            entries[key] = node
+            stack.extend(reversed(node.children))
+        return entries
+
+    def flatten(self, excluded=EXCLUDED_SECTIONS) -> dict:
+        """{title: body} in document order, keyed as in entries; every body is sliced."""
+        return {key: node.body for key, node in self.entries(excluded).items()}
+
+
+class SectionMap(Mapping):
+    """
+    Read-only {title: body} view of an outline, keyed like Section.flatten,
+    that slices a body only when it is read. IngestionService.segment_content
+    returns it; the database tier of the article cache stores it as a dict.
+    """
+
+    __slots__ = ("root", "nodes")
+
+    def __init__(self, root: Section, excluded=EXCLUDED_SECTIONS):
+        self.root = root
+        self.nodes = root.entries(excluded)
+
+    def __getitem__(self, key: str) -> str:
+        return self.nodes[key].body
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f"SectionMap({list(self.nodes)!r})"
+
+    @property
+    def size(self) -> int:
+        """Characters held: the source text once, plus the titles."""
+        return len(self.root.source) + sum(len(key) for key in self.nodes)
+
+    def words(self, key: str) -> int:
+        return self.nodes[key].words
+
+    def tokens(self, key: str) -> int:
+        return self.nodes[key].tokens
+
+    def select(self, max_tokens: int) -> dict:
+        """
+        {title: body} of sections taken outline level by level (the lead, then
+        top-level sections, then their subsections) until their bodies reach
+        max_tokens, in document order. The lead is always taken, and the last
+        section taken may cross max_tokens for the caller to cut. Sizes come
+        from offsets, so only the chosen bodies are sliced.
+        """
+        keys = {id(node): key for key, node in self.nodes.items()}
+        chosen, used, level = {id(self.root)}, self.root.tokens, self.root.children
+        while level:
+            for node in level:
+                if id(node) in keys and used < max_tokens:
+                    chosen.add(id(node))
+                    used += node.tokens
+            level = [child for node in level if id(node) in chosen for child in node.children]
+        return {key: node.body for key, node in self.nodes.items() if id(node) in chosen}
+
+
+def parse_sections(text: str, lead_title: str = "Introduction") -> Section:
+    """Outline of a plain-text MediaWiki extract, built in one pass over its headings."""
+    root = Section(text, 1, lead_title, 0)
+    open_sections = [root]
+    previous = root
+    for match in HEADING.finditer(text):
+        level = 2 + len(match.group(1))
+        previous.body_end = match.start()
+        while open_sections[-1].level >= level:
+            open_sections.pop()
+        parent = open_sections[-1]
+        section = Section(text, level, match.group(2), min(match.end() + 1, len(text)), parent)
+        parent.children.append(section)
+        open_sections.append(section)
+        previous = section
+    return root
@@ -0,0 +1,55 @@
+import os
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.cache import LRUCache
+from app.models.source import Source, SourceKind
+from app.services.ingestion import ingestion_service
+
+SOURCE_CACHE_ENTRIES = int(os.getenv("SOURCE_CACHE_ENTRIES", "10000"))
+
+
+class SourceService:
+    """
+    Resolves article URLs and document locators to rows of the sources table.
+    Wikipedia URLs are normalized first, so every spelling of a page shares one
+    source. Ids of committed sources are memoized to skip the lookup query.
+    """
+
+    def __init__(self):
+        self.ids = LRUCache(max_entries=SOURCE_CACHE_ENTRIES)
+
+    def locator_for(self, url: str) -> str:
+        if url.startswith("document:"):
+            return url
+        try:
+            lang, title = ingestion_service.parse_wiki_url(url)
+            title = ingestion_service.normalize_title(title)
+        except (IndexError, ValueError):
+            return url
+        if not title:
+            return url
+        return ingestion_service.page_url(lang, title)
+
+    def get_or_create(self, db: Session, url: str, title: str = None) -> int:
+        locator = self.locator_for(url)
+        source_id = self.ids.get(locator)
+        if source_id is not None:
+            return source_id
+
+        source = db.query(Source).filter(Source.locator == locator).first()
+        if source is not None:
+            self.ids.set(locator, source.id)
+            return source.id
+
+        kind = SourceKind.DOCUMENT if locator.startswith("document:") else SourceKind.WIKI
+        try:
+            with db.begin_nested():
+                source = Source(kind=kind, locator=locator, title=title)
+                db.add(source)
+        except IntegrityError:
+            # Created concurrently by another request
+            source = db.query(Source).filter(Source.locator == locator).one()
+        # Not memoized yet: the enclosing transaction may still roll back
+        return source.id
+
+source_service = SourceService()
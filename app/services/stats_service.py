@@ -0,0 +1,210 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import Date, cast, event, func, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models.article import Article
+from app.models.llm_result import LLMResult
+from app.models.quiz_attempt import QuizAttempt
+from app.models.source import Source
+from app.models.stat_counter import StatCounter, TOTAL_BUCKET
+from app.models.user import User
+from app.services.ai_service import LANG_MAP
+
+_LANGUAGE_CODES = {name.lower(): code for code, name in LANG_MAP.items()}
+
+
+def language_code(language: str) -> str:
+    """Summaries and quizzes are keyed by code, translations by name ("French"); count both as the code."""
+    if not language:
+        return "unknown"
+    value = language.strip().lower()
+    return _LANGUAGE_CODES.get(value, value)[:64]
+
+
+def _value(kind) -> str:
+    return getattr(kind, "value", kind)
+
+
+class StatsService:
+    """
+    Dashboard counters kept in stat_counters. Inserts of users, articles and quiz
+    attempts made through SessionLocal add to them in the same transaction, so
+    they commit or roll back with the rows they count. rebuild() recomputes them
+    from the base tables after writes that bypassed the ORM.
+    """
+
+    def increments(self, connection, users: list, articles: list, attempts: list) -> dict:
+        """(metric, dimension) -> [count, total] for a batch of new rows."""
+        counts = defaultdict(lambda: [0, 0.0])
+        if users:
+            counts[("users", "")][0] += len(users)
+        if attempts:
+            counts[("quiz_attempts", "")][0] += len(attempts)
+            counts[("quiz_attempts", "")][1] += sum(a.score or 0.0 for a in attempts)
+        if articles:
+            source_ids = {a.source_id for a in articles}
+            kinds = dict(connection.execute(select(Source.id, Source.kind).where(Source.id.in_(source_ids))).all())
+            result_keys = {a.result_key for a in articles if a.result_key and not a.language}
+            languages = dict(connection.execute(
+                select(LLMResult.key, LLMResult.language).where(LLMResult.key.in_(result_keys))
+            ).all()) if result_keys else {}
+            for article in articles:
+                counts[("articles", "")][0] += 1
+                counts[("articles.action", _value(article.action) or "unknown")][0] += 1
+                counts[("articles.source", _value(kinds.get(article.source_id)) or "unknown")][0] += 1
+                counts[("articles.language", language_code(article.language or languages.get(article.result_key)))][0] += 1
+        return counts
+
+    def apply(self, connection, counts: dict, day: date = None):
+        """Adds counts to the all-time bucket and to day's bucket (today by default)."""
+        if not counts:
+            return
+        day = (day or datetime.now(timezone.utc).date()).isoformat()
+        rows = [
+            {"bucket": bucket, "metric": metric, "dimension": dimension, "count": count, "total": total}
+            for (metric, dimension), (count, total) in counts.items()
+            for bucket in (TOTAL_BUCKET, day)
+        ]
+        self._upsert(connection, rows)
+
+    def _upsert(self, connection, rows: list):
+        table = StatCounter.__table__
+        dialect = connection.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.bucket, table.c.metric, table.c.dimension],
+                set_={
+                    "count": table.c.count + statement.excluded["count"],
+                    "total": table.c.total + statement.excluded.total,
+                },
+            )
+            connection.execute(statement, rows)
+            return
+
+        for row in rows:
+            result = connection.execute(
+                update(table)
+                .where(table.c.bucket == row["bucket"], table.c.metric == row["metric"], table.c.dimension == row["dimension"])
+                .values(count=table.c.count + row["count"], total=table.c.total + row["total"])
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert(), row)
+
+    def dashboard(self, db: Session, days: int = 30) -> dict:
+        """All-time totals, breakdowns and the last `days` daily buckets, read in one query."""
+        wanted = StatCounter.bucket == TOTAL_BUCKET
+        if days:
+            since = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+            wanted = or_(wanted, StatCounter.bucket.between(since, "9999-12-31"))
+        rows = db.query(StatCounter).filter(wanted).all()
+
+        totals = defaultdict(dict)
+        series = defaultdict(lambda: defaultdict(dict))
+        for row in rows:
+            target = totals if row.bucket == TOTAL_BUCKET else series[row.bucket]
+            target[row.metric][row.dimension] = (row.count, row.total)
+
+        def summarize(buckets) -> dict:
+            attempts, score_sum = buckets.get("quiz_attempts", {}).get("", (0, 0.0))
+            return {
+                "users": buckets.get("users", {}).get("", (0, 0))[0],
+                "articles": buckets.get("articles", {}).get("", (0, 0))[0],
+                "quiz_attempts": attempts,
+                "average_quiz_score": round(score_sum / attempts, 2) if attempts else 0,
+                "by_action": {k: v[0] for k, v in buckets.get("articles.action", {}).items()},
+                "by_language": {k: v[0] for k, v in buckets.get("articles.language", {}).items()},
+                "by_source": {k: v[0] for k, v in buckets.get("articles.source", {}).items()},
+            }
+
+        overall = summarize(totals)
+        return {
+            "total_users": overall["users"],
+            "total_articles": overall["articles"],
+            "total_summaries": overall["by_action"].get("summary", 0),
+            "total_translations": overall["by_action"].get("translation", 0),
+            "average_quiz_score": overall["average_quiz_score"],
+            "total_quiz_attempts": overall["quiz_attempts"],
+            "breakdown": {
+                "action": overall["by_action"],
+                "language": overall["by_language"],
+                "source": overall["by_source"],
+            },
+            "daily": [dict(summarize(series[day]), day=day) for day in sorted(series)],
+        }
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Recomputes every bucket from the base tables with a few GROUP BY scans.
+        Inserts committed while it runs may be counted twice or not at all, so run
+        it when writes are quiet. Returns the number of counter rows.
+        """
+        day = self._day_expression(db)
+        per_day = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+
+        # users has no timestamp, so only its total can be recovered
+        per_day[None][("users", "")][0] += db.query(func.count(User.id)).scalar()
+
+        for submitted, count, score_sum in db.query(
+            day(QuizAttempt.submitted_at), func.count(QuizAttempt.id), func.sum(QuizAttempt.score)
+        ).group_by(day(QuizAttempt.submitted_at)):
+            counts = per_day[submitted][("quiz_attempts", "")]
+            counts[0] += count
+            counts[1] += score_sum or 0.0
+
+        article_language = func.coalesce(Article.language, LLMResult.language)
+        grouped = (
+            db.query(day(Article.created_at), Article.action, Source.kind, article_language, func.count(Article.id))
+            .join(Source, Source.id == Article.source_id)
+            .outerjoin(LLMResult, LLMResult.key == Article.result_key)
+            .group_by(day(Article.created_at), Article.action, Source.kind, article_language)
+        )
+        for created, action, kind, language, count in grouped:
+            counts = per_day[created]
+            counts[("articles", "")][0] += count
+            counts[("articles.action", _value(action) or "unknown")][0] += count
+            counts[("articles.source", _value(kind))][0] += count
+            counts[("articles.language", language_code(language))][0] += count
+
+        db.query(StatCounter).delete(synchronize_session=False)
+        connection = db.connection()
+        for created, counts in per_day.items():
+            if created is None:
+                # No timestamp: totals only
+                self._upsert(connection, [
+                    {"bucket": TOTAL_BUCKET, "metric": metric, "dimension": dimension, "count": count, "total": total}
+                    for (metric, dimension), (count, total) in counts.items()
+                ])
+            else:
+                self.apply(connection, counts, day=date.fromisoformat(str(created)[:10]))
+        db.commit()
+        return db.query(StatCounter).count()
+
+    @staticmethod
+    def _day_expression(db: Session):
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            return lambda column: func.date(column)
+        if dialect == "postgresql":
+            return lambda column: cast(func.timezone("UTC", column), Date)
+        return lambda column: cast(column, Date)
+
+stats_service = StatsService()
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _count_inserts(session, flush_context):
+    users, articles, attempts = [], [], []
+    for obj in session.new:
+        if isinstance(obj, User):
+            users.append(obj)
+        elif isinstance(obj, Article):
+            articles.append(obj)
+        elif isinstance(obj, QuizAttempt):
+            attempts.append(obj)
+    if users or articles or attempts:
+        connection = session.connection()
+        stats_service.apply(connection, stats_service.increments(connection, users, articles, attempts))
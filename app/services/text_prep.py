@@ -0,0 +1,276 @@
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from app.services.ai_service import SUMMARY_CHUNK_TOKENS
+from app.services.chunking import chunk_sections, chunk_text
+from app.services.llm_router import llm_router
+from app.services.sections import SectionMap
+
+logger = logging.getLogger(__name__)
+
+# Input tokens per call; sections beyond the budget are dropped, least informative first.
+# 0 keeps everything: summaries map-reduce over the whole input in windows of
+# SUMMARY_CHUNK_TOKENS, so each of their calls is bounded already.
+PROMPT_BUDGETS = {
+    "summarize": int(os.getenv("PROMPT_BUDGET_SUMMARIZE", "0")),
+    "translate": int(os.getenv("PROMPT_BUDGET_TRANSLATE", "1500")),
+    "quiz": int(os.getenv("PROMPT_BUDGET_QUIZ", "2000")),
+}
+# tiktoken encoding per provider, or "estimate". Llama 3 (Groq) extends
+# cl100k's vocabulary; o200k is the closer proxy for Gemini's multilingual one.
+DEFAULT_ENCODINGS = {"groq": "cl100k_base", "gemini": "o200k_base"}
+# A section cut to fit the budget must keep at least this many tokens
+PREP_MIN_PARTIAL_TOKENS = int(os.getenv("PREP_MIN_PARTIAL_TOKENS", "100"))
+# Size of the parts free text (PDFs) is split into before selection
+PREP_PART_TOKENS = int(os.getenv("PREP_PART_TOKENS", "400"))
+# Upper bound of raw characters per token, to read just enough of a document for a budget
+PREP_MAX_CHARS_PER_TOKEN = 8
+# Budgets of an outline's sections that are sliced and ranked; the rest is never copied
+PREP_CANDIDATE_BUDGETS = int(os.getenv("PREP_CANDIDATE_BUDGETS", "3"))
+
+CITATION = re.compile(
+    r"\[(?:\d+(?:\s*[,–-]\s*\d+)*|[a-z]|(?:citation|clarification) needed|edit|note \d+|nb \d+)\]",
+    re.IGNORECASE,
+)
+HYPHENATED = re.compile(r"(\w)-\n\s*([^\W\d_])")
+SPACES = re.compile(r"[ \t\u00a0\u200b]+")
+BLANK_LINES = re.compile(r"\n\s*\n\s*(?:\n\s*)+")
+PAGE_NUMBER = re.compile(r"^(?:page\s*)?[-–]?\s*\d+\s*[-–]?(?:\s*(?:of|/)\s*\d+)?$", re.IGNORECASE)
+SENTENCE_END = re.compile(r"[.!?。؟]\s")
+TERM = re.compile(r"[^\W\d_]{3,}")
+
+
+class Tokenizer:
+    """
+    Counts tokens with a tiktoken encoding, or with a script-aware estimate
+    when tiktoken or its encoding files are unavailable (e.g. offline).
+    """
+
+    def __init__(self, encoding: str):
+        self.name = encoding
+        self.encoding = None
+        if encoding != "estimate":
+            try:
+                import tiktoken
+                self.encoding = tiktoken.get_encoding(encoding)
+            except Exception as e:
+                logger.warning("Tokenizer %s unavailable, estimating token counts: %s", encoding, e)
+                self.name = "estimate"
+
+    @staticmethod
+    def estimate(text: str) -> int:
+        # ~4 characters per token for Latin script, ~2 for Arabic, CJK and the like
+        ascii_chars = len(text.encode("ascii", "ignore"))
+        return max(1, math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 2)) if text else 0
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return self.estimate(text)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix within max_tokens, cut at a sentence end, or else a word boundary."""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            prefix = self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+        else:
+            low, high = 0, len(text)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.estimate(text[:middle]) <= max_tokens:
+                    low = middle
+                else:
+                    high = middle - 1
+            prefix = text[:low]
+        ends = [m.end() for m in SENTENCE_END.finditer(prefix)]
+        if ends and ends[-1] >= len(prefix) * 0.7:
+            return prefix[:ends[-1]].strip()
+        cut = prefix.rfind(" ")
+        return (prefix[:cut] if cut > 0 else prefix).strip()
+
+
+@dataclass
+class Prepared:
+    text: str
+    # Kept sections in document order; free text gets numbered, untitled parts
+    sections: dict
+    headings: bool
+    tokens: int
+    original_tokens: int
+
+    @property
+    def saved(self) -> int:
+        return max(0, self.original_tokens - self.tokens)
+
+    @property
+    def chars_per_token(self) -> float:
+        return len(self.text) / self.tokens if self.tokens else 4.0
+
+
+class TextPrepService:
+    """
+    Turns article sections and document text into LLM input: strips citation
+    markers, whitespace runs, PDF page furniture and line-break hyphenation,
+    then keeps the most informative sections that fit the task's token budget,
+    counted with the tokenizer of the task's primary model.
+    """
+
+    def __init__(self):
+        self._tokenizers = {}
+        self._lock = threading.Lock()
+        self.counters = {task: Counter() for task in PROMPT_BUDGETS}
+
+    def tokenizer(self, task: str) -> Tokenizer:
+        provider = llm_router.routes[task][0]
+        encoding = os.getenv(f"TOKENIZER_{provider.upper()}", DEFAULT_ENCODINGS.get(provider, "estimate"))
+        with self._lock:
+            if encoding not in self._tokenizers:
+                self._tokenizers[encoding] = Tokenizer(encoding)
+            return self._tokenizers[encoding]
+
+    # Cleaning
+
+    def clean(self, text: str) -> str:
+        text = CITATION.sub("", text)
+        text = HYPHENATED.sub(r"\1\2", text)
+        text = SPACES.sub(" ", text)
+        text = "\n".join(line.strip() for line in text.split("\n"))
+        return BLANK_LINES.sub("\n\n", text).strip()
+
+    def clean_pages(self, pages: list) -> str:
+        """
+        Joins extracted PDF pages, dropping page numbers and the running headers
+        and footers: lines at the top or bottom of at least half the pages that
+        are equal once digits are ignored.
+        """
+        split = [[line.strip() for line in page.split("\n") if line.strip()] for page in pages]
+
+        def shape(line: str) -> str:
+            return re.sub(r"\d+", "#", line.lower())
+
+        edges = Counter()
+        for lines in split:
+            edges.update({shape(line) for line in lines[:2] + lines[-2:]})
+        repeated = {s for s, n in edges.items() if len(pages) >= 3 and n >= max(2, len(pages) / 2)}
+
+        kept = []
+        for lines in split:
+            top, bottom = 0, len(lines)
+            while top < bottom and top < 2 and (shape(lines[top]) in repeated or PAGE_NUMBER.match(lines[top])):
+                top += 1
+            while bottom > top and len(lines) - bottom < 2 and (shape(lines[bottom - 1]) in repeated or PAGE_NUMBER.match(lines[bottom - 1])):
+                bottom -= 1
+            kept.append("\n".join(lines[top:bottom]))
+        return self.clean("\n\n".join(page for page in kept if page))
+
+    # Selection
+
+    def _select(self, task: str, units: dict, headings: bool, original: str, skipped: dict = None) -> Prepared:
+        """skipped: sections left out before selection, as {title: estimated tokens}."""
+        tokenizer = self.tokenizer(task)
+        budget = PROMPT_BUDGETS[task]
+        rendered = {}
+        for title, body in units.items():
+            body = self.clean(body)
+            if body:
+                rendered[title] = f"{title}\n{body}" if headings else body
+        sizes = {title: tokenizer.count(text) for title, text in rendered.items()}
+        budget = budget or sum(sizes.values())
+
+        # Informative: rich in terms that few other sections use, per token
+        terms = {title: Counter(t.lower() for t in TERM.findall(text)) for title, text in rendered.items()}
+        spread = Counter(term for counts in terms.values() for term in counts)
+        n = len(rendered)
+
+        def density(title) -> float:
+            weight = sum((1 + math.log(tf)) * math.log((1 + n) / spread[t]) for t, tf in terms[title].items())
+            return weight / max(sizes[title], 50)
+
+        titles = list(rendered)
+        if sum(sizes.values()) <= budget:
+            order = titles
+        else:
+            # The lead section always goes first: it is what the reader asked about
+            order = titles[:1] + sorted(titles[1:], key=density, reverse=True)
+        kept, used = {}, 0
+        for title in order:
+            left = budget - used
+            if sizes[title] <= left:
+                kept[title] = rendered[title]
+                used += sizes[title]
+            elif left >= PREP_MIN_PARTIAL_TOKENS:
+                kept[title] = tokenizer.truncate(rendered[title], left)
+                used = budget
+
+        selected = {title: kept[title] for title in titles if title in kept}
+        text = "\n\n".join(selected.values())
+        sections = {title: text[len(title) + 1:] if headings else text for title, text in selected.items()}
+        skipped = skipped or {}
+        original_tokens = tokenizer.count(original) + sum(skipped.values())
+        prepared = Prepared(text, sections, headings, tokenizer.count(text), original_tokens)
+        with self._lock:
+            counters = self.counters[task]
+            counters["prepared"] += 1
+            counters["input_tokens"] += prepared.original_tokens
+            counters["output_tokens"] += prepared.tokens
+            counters["sections_dropped"] += len(units) + len(skipped) - len(selected)
+        return prepared
+
+    def sections(self, sections: dict, task: str) -> Prepared:
+        """
+        Article sections, as from IngestionService.segment_content. From an
+        outline, only the sections that fit PREP_CANDIDATE_BUDGETS budgets by
+        their estimated tokens are sliced, then ranked like any others.
+        """
+        skipped = None
+        if PROMPT_BUDGETS[task] and isinstance(sections, SectionMap):
+            outline = sections
+            sections = outline.select(PROMPT_BUDGETS[task] * PREP_CANDIDATE_BUDGETS)
+            skipped = {title: outline.tokens(title) for title in outline if title not in sections}
+        original = "\n\n".join(f"{title}\n{body}" for title, body in sections.items())
+        return self._select(task, sections, True, original, skipped)
+
+    def document(self, text: str, task: str) -> Prepared:
+        """Free text such as an extracted PDF, split into parts of PREP_PART_TOKENS."""
+        parts = chunk_text(text, PREP_PART_TOKENS)
+        return self._select(task, {str(i): part for i, part in enumerate(parts)}, False, text)
+
+    def lead(self, text: str, task: str) -> Prepared:
+        """The beginning of text up to the budget, for tasks that must keep the order (translation)."""
+        tokenizer = self.tokenizer(task)
+        kept = tokenizer.truncate(self.clean(text), PROMPT_BUDGETS[task])
+        return self._select(task, {"": kept}, False, text)
+
+    def char_budget(self, task: str):
+        """
+        Raw characters sure to hold the task's token budget, so that no more of
+        a document is read than the budget keeps; None when it keeps everything.
+        """
+        budget = PROMPT_BUDGETS[task]
+        return budget * PREP_MAX_CHARS_PER_TOKEN if budget else None
+
+    def chunks(self, prepared: Prepared) -> list:
+        """Map-reduce summary windows of prepared input, sized with its own characters per token."""
+        if prepared.headings:
+            return chunk_sections(prepared.sections, SUMMARY_CHUNK_TOKENS, prepared.chars_per_token)
+        return chunk_text(prepared.text, SUMMARY_CHUNK_TOKENS, prepared.chars_per_token)
+
+    def stats(self) -> dict:
+        stats = {}
+        for task, counters in self.counters.items():
+            saved = max(0, counters["input_tokens"] - counters["output_tokens"])
+            stats[task] = {
+                **counters,
+                "budget": PROMPT_BUDGETS[task],
+                "tokenizer": self.tokenizer(task).name,
+                "tokens_saved": saved,
+                "saved_ratio": round(saved / counters["input_tokens"], 3) if counters["input_tokens"] else 0.0,
+            }
+        return stats
+
+text_prep = TextPrepService()
@@ -0,0 +1,278 @@
+import os
+import asyncio
+import logging
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models.article import Article
+from app.services.ingestion import ingestion_service
+from app.services.ai_service import ai_service
+from app.services.text_prep import text_prep
+from app.services.gemini_service import gemini_service
+from app.services.quiz_service import quiz_service
+from app.services.llm_cache import llm_cache
+from app.services.llm_router import llm_router
+from app.services.source_service import source_service
+from app.services.question_bank import question_bank, BANK_QUESTIONS_PER_SECTION, BANK_SECTION_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+# LLM calls in flight per batch, on top of the fetches the host throttle allows
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+
+class WorkflowError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+async def _fetch_article(url: str, raise_errors: bool):
+    wiki_data = await ingestion_service.fetch_wikipedia_data_async(url)
+    if "error" in wiki_data and raise_errors:
+        # Missing and ambiguous pages will not fix themselves on retry
+        permanent = "options" in wiki_data or wiki_data["error"].startswith("Article not found")
+        raise WorkflowError(wiki_data["error"], retryable=not permanent)
+    return wiki_data
+
+
+def record_article(db: Session, user_id: int, url: str, title: str, action: str, result_key: str = None,
+                   language: str = None) -> Article:
+    article = Article(
+        source_id=source_service.get_or_create(db, url, title),
+        title=title,
+        action=action,
+        owner_id=user_id,
+        result_key=llm_cache.pin(db, result_key),
+        language=language
+    )
+    db.add(article)
+    db.flush()
+    return article
+
+
+def save_article(db: Session, user_id: int, url: str, title: str, action: str, result_key: str = None,
+                 quiz: dict = None, lang_code: str = None) -> tuple:
+    """
+    Records the article, and its quiz if any, and commits: the database step
+    that ends every workflow. Blocking, so async callers run it in the
+    threadpool. Returns the ids of the article and quiz.
+    """
+    article = record_article(db, user_id, url, title, action, result_key, lang_code)
+    saved_quiz = quiz_service.save_quiz(db, article.id, quiz, lang_code) if quiz is not None else None
+    # Read before the commit expires them
+    ids = article.id, saved_quiz.id if saved_quiz else None
+    db.commit()
+    return ids
+
+
+def _quiz_from_bank(db: Session, user_id: int, url: str, title: str, lang_code: str, difficulty: str):
+    """A saved quiz sampled from the bank as (questions, article id, quiz id), or None after queueing its build."""
+    source_id = source_service.get_or_create(db, url, title)
+    questions = question_bank.sample(db, source_id, lang_code, user_id, difficulty=difficulty)
+    if not questions:
+        question_bank.request_build(db, source_id, url, lang_code)
+        return None
+    return (questions, *save_article(db, user_id, url, title, "quiz", quiz={"quiz": questions}, lang_code=lang_code))
+
+
+async def summarize_article(db: Session, user_id: int, url: str, raise_errors: bool = False) -> dict:
+    """
+    Fetches a Wikipedia article, summarizes it and records it in the user's history.
+    Shared by the /ai routes and the job workers.
+    """
+    wiki_data = await _fetch_article(url, raise_errors)
+    if "error" in wiki_data: return wiki_data
+
+    lang_code = wiki_data.get("language", "en")
+    chunks = text_prep.chunks(await run_in_threadpool(text_prep.sections, wiki_data["sections"], "summarize"))
+
+    summary = await ai_service.summarize_document_async(chunks, lang_code, raise_errors=raise_errors)
+    result_key = await llm_cache.stored_key_async(ai_service.document_summary_spec(chunks, lang_code))
+
+    article_id, _ = await run_in_threadpool(save_article, db, user_id, url, wiki_data["title"], "summary", result_key)
+
+    return {"title": wiki_data["title"], "summary": summary, "article_id": article_id}
+
+
+async def translate_article(db: Session, user_id: int, url: str, target_lang: str, raise_errors: bool = False) -> dict:
+    wiki_data = await _fetch_article(url, raise_errors)
+    if "error" in wiki_data: return wiki_data
+
+    text = (await run_in_threadpool(text_prep.lead, wiki_data["sections"].get("Introduction", ""), "translate")).text
+    translation = await gemini_service.translate_text_async(text, target_lang, raise_errors=raise_errors)
+    result_key = await llm_cache.stored_key_async(gemini_service.translation_spec(text, target_lang))
+
+    article_id, _ = await run_in_threadpool(save_article, db, user_id, url, wiki_data["title"], "translation", result_key)
+
+    return {"original_title": wiki_data["title"], "translation": translation, "article_id": article_id}
+
+
+async def quiz_article(db: Session, user_id: int, url: str, raise_errors: bool = False, difficulty: str = None) -> dict:
+    """
+    Samples a quiz from the article's question bank. Until the bank is built,
+    queues its build and generates a quiz from the lead sections as before.
+    """
+    wiki_data = await _fetch_article(url, raise_errors)
+    if "error" in wiki_data: return wiki_data
+
+    lang_code = wiki_data.get("language", "en")
+    banked = await run_in_threadpool(_quiz_from_bank, db, user_id, url, wiki_data["title"], lang_code, difficulty)
+    if banked is not None:
+        questions, article_id, quiz_id = banked
+        return {"title": wiki_data["title"], "quiz": {"quiz": questions}, "article_id": article_id, "quiz_id": quiz_id}
+
+    text = (await run_in_threadpool(text_prep.sections, wiki_data["sections"], "quiz")).text
+
+    quiz = await gemini_service.generate_quiz_async(text, lang_code, raise_errors=raise_errors)
+    if raise_errors and "error" in quiz:
+        raise WorkflowError(quiz["error"])
+
+    result_key = await llm_cache.stored_key_async(gemini_service.quiz_spec(text, lang_code))
+
+    article_id, quiz_id = await run_in_threadpool(
+        save_article, db, user_id, url, wiki_data["title"], "quiz", result_key, quiz, lang_code
+    )
+
+    return {
+        "title": wiki_data["title"],
+        "quiz": quiz,
+        "article_id": article_id,
+        "quiz_id": quiz_id
+    }
+
+
+async def build_question_bank(db: Session, url: str, source_id: int, lang_code: str) -> dict:
+    """
+    Generates the questions of every section worth asking about, several
+    sections at a time, and replaces the source's bank with them. A section
+    whose generation fails is left out; the build fails only when all do.
+    """
+    wiki_data = await _fetch_article(url, raise_errors=True)
+    sections = question_bank.eligible_sections(wiki_data["sections"]) or dict(list(wiki_data["sections"].items())[:1])
+    limiter = asyncio.Semaphore(BANK_SECTION_CONCURRENCY)
+
+    async def generate(title: str, body: str):
+        async with limiter:
+            text = (await run_in_threadpool(text_prep.lead, f"{title}\n{body}", "quiz")).text
+            try:
+                return title, await gemini_service.generate_section_questions_async(text, lang_code, BANK_QUESTIONS_PER_SECTION)
+            except Exception as e:
+                logger.warning("Questions on %r of %s failed: %s", title, url, e)
+                return title, None
+
+    results = await asyncio.gather(*(generate(title, body) for title, body in sections.items()))
+    generated = {title: questions for title, questions in results if questions}
+    if not generated:
+        raise WorkflowError(f"No questions generated for {wiki_data['title']}")
+
+    stored = await run_in_threadpool(question_bank.store, db, source_id, lang_code, generated)
+    return {"title": wiki_data["title"], "sections": len(generated), "failed_sections": len(sections) - len(generated), "questions": stored}
+
+
+async def stream_and_record(deltas, user_id: int, url: str, title: str, action: str, spec=None):
+    """
+    Relays streamed LLM output as ("delta", ...) events and records the article
+    once the stream has completed, ending with a ("done", ...) event that carries
+    the full text. The request session may already be closed while a response
+    streams, so the article is written through a session of its own.
+    When the output for spec is already cached it is sent as a single delta.
+    A stream that fails or yields nothing ends with an ("error", ...) event
+    instead, and nothing is cached or recorded.
+    """
+    cached = await llm_cache.get_async(spec) if spec else None
+    if cached is not None:
+        await deltas.aclose()
+        parts = [cached]
+        yield "delta", {"text": cached}
+    else:
+        parts = []
+        try:
+            async for delta in deltas:
+                parts.append(delta)
+                yield "delta", {"text": delta}
+        except Exception as e:
+            yield "error", {"error": str(e)}
+            return
+
+    text = "".join(parts)
+    if not text.strip():
+        yield "error", {"error": "No output was generated"}
+        return
+
+    result_key = None
+    if spec is not None:
+        if cached is None:
+            await llm_cache.put_async(spec, text, llm_router.streamed_by())
+        result_key = await llm_cache.stored_key_async(spec)
+
+    def save():
+        with SessionLocal() as db:
+            return save_article(db, user_id, url, title, action, result_key)
+
+    article_id, _ = await run_in_threadpool(save)
+
+    yield "done", {"title": title, "text": text, "article_id": article_id}
+
+
+BATCH_ACTIONS = {
+    "summarize": summarize_article,
+    "quiz": quiz_article,
+}
+
+
+async def ingest_batch(user_id: int, urls: list, category: str = None, lang: str = "en", actions: list = (), progress=None) -> dict:
+    """
+    Fetches a reading list (URLs and/or the articles of a category) in one
+    batched ingestion pass, then runs the requested actions on each article as
+    soon as it has loaded. A failing item is reported in its entry instead of
+    failing the batch. progress(summary) is awaited whenever an item changes.
+    """
+    urls = list(dict.fromkeys(urls))
+    if category:
+        titles = await ingestion_service.category_titles_async(lang, category, BATCH_MAX_ITEMS - len(urls))
+        urls = list(dict.fromkeys(urls + [ingestion_service.page_url(lang, title) for title in titles]))
+
+    items = {url: {"url": url, "status": "pending"} for url in urls}
+    limiter = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+    tasks = []
+
+    def summary() -> dict:
+        counts = {}
+        for item in items.values():
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+        return {"total": len(items), "counts": counts, "items": list(items.values())}
+
+    async def report():
+        if progress is not None:
+            await progress(summary())
+
+    async def run_actions(url: str):
+        item = items[url]
+        for action in actions:
+            async with limiter:
+                try:
+                    with SessionLocal() as db:
+                        result = await BATCH_ACTIONS[action](db, user_id, url, raise_errors=True)
+                    item.setdefault("article_ids", {})[action] = result["article_id"]
+                except Exception as e:
+                    item.setdefault("errors", {})[action] = str(e)
+        item["status"] = "failed" if item.get("errors") else "done"
+        await report()
+
+    async def loaded(url: str, payload: dict):
+        item = items[url]
+        if "error" in payload:
+            item.update(status="failed", error=payload["error"])
+            if "options" in payload:
+                item["options"] = payload["options"]
+        else:
+            item.update(status="fetched" if actions else "done", title=payload["title"])
+            if actions:
+                tasks.append(asyncio.create_task(run_actions(url)))
+        await report()
+
+    await ingestion_service.fetch_wikipedia_batch_async(urls, on_item=loaded)
+    await asyncio.gather(*tasks)
+    return summary()
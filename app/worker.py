@@ -0,0 +1,18 @@
+"""
+Standalone job worker, for deployments that keep AI jobs out of the API processes:
+
+    JOB_WORKERS=0 uvicorn app.main:app      # API only
+    python -m app.worker                    # drains the jobs table
+"""
+import asyncio
+import logging
+import os
+from app.services.jobs import job_queue
+
+async def main():
+    await job_queue.start(int(os.getenv("WORKER_CONCURRENCY", "8")))
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
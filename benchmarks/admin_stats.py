@@ -0,0 +1,62 @@
+"""
+Admin dashboard cost: the former per-request COUNT/AVG scans against one read of
+stat_counters, on the database seeded by benchmarks.history_queries.
+
+    python -m benchmarks.admin_stats --articles 1000000 --attempts 1000000
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.history_queries import seed
+from sqlalchemy import func
+
+from app.database import SessionLocal, engine
+from app.models import User, Article, QuizAttempt
+from app.services.stats_service import stats_service
+
+
+def full_scans(db):
+    return {
+        "total_users": db.query(User).count(),
+        "total_articles": db.query(Article).count(),
+        "total_summaries": db.query(Article).filter(Article.action == "summary").count(),
+        "total_translations": db.query(Article).filter(Article.action == "translation").count(),
+        "average_quiz_score": round(db.query(func.avg(QuizAttempt.score)).scalar() or 0, 2),
+        "total_quiz_attempts": db.query(QuizAttempt).count(),
+    }
+
+
+def timed(fn, repeat: int):
+    samples, result = [], None
+    for _ in range(repeat):
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            result = fn(db)
+            samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=1_000_000)
+    parser.add_argument("--attempts", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.articles, args.attempts, users=5000, sources=50000)
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        rows = stats_service.rebuild(db)
+    print(f"{engine.dialect.name}: rebuilt {rows} counter rows in {time.perf_counter() - started:.1f}s")
+
+    scans_ms, scans = timed(full_scans, args.repeat)
+    rollup_ms, dashboard = timed(lambda db: stats_service.dashboard(db, days=30), args.repeat)
+    print(f"  full-table counts   {scans_ms:9.2f} ms")
+    print(f"  stat_counters read  {rollup_ms:9.2f} ms")
+    mismatched = [key for key, value in scans.items() if dashboard[key] != value]
+    print(f"  totals agree: {not mismatched}" + (f" (differ: {mismatched})" if mismatched else ""))
+
+
+if __name__ == "__main__":
+    main()
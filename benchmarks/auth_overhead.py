@@ -0,0 +1,120 @@
+"""
+Per-request cost of authentication: the old get_current_user (JWT decode, then a
+users query by email on a get_db session, run on the threadpool) against the
+principal cache (JWT decode, then a dict lookup on the event loop).
+
+Both are timed as bare dependencies and end to end through a trivial route.
+
+    python -m benchmarks.auth_overhead --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from jose import jwt
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import get_current_user, oauth2_scheme
+from app.core.security import SECRET_KEY, ALGORITHM, create_access_token, password_version
+from app.database import SessionLocal, get_db
+from app.models.user import User
+
+
+def legacy_get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    user = db.query(User).filter(User.email == payload.get("sub")).first()
+    if user is None:
+        raise HTTPException(status_code=401)
+    db.close()
+    return user
+
+
+def create_token() -> str:
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == "bench@example.com").first()
+        if user is None:
+            user = User(username="bench", email="bench@example.com", hashed_password="x")
+            db.add(user)
+            db.commit()
+        return create_access_token({
+            "sub": user.email,
+            "uid": user.id,
+            "pwv": password_version(user.hashed_password)
+        })
+
+
+def build_app() -> FastAPI:
+    bench = FastAPI()
+
+    @bench.get("/legacy")
+    def legacy(current_user=Depends(legacy_get_current_user)):
+        return {"id": current_user.id}
+
+    @bench.get("/cached")
+    async def cached(current_user=Depends(get_current_user)):
+        return {"id": current_user.id}
+
+    return bench
+
+
+def report(label: str, elapsed: float, count: int):
+    print(f"  {label:<26} {elapsed / count * 1e6:9.1f} us/request")
+
+
+async def time_dependencies(token: str, count: int):
+    def legacy_once():
+        db = SessionLocal()
+        try:
+            return legacy_get_current_user(token, db)
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await run_in_threadpool(legacy_once)
+    report("legacy dependency", time.perf_counter() - started, count)
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await get_current_user(token)
+    report("cached dependency", time.perf_counter() - started, count)
+
+
+async def time_routes(token: str, count: int):
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/legacy", "/cached"):
+            await client.get(path, headers=headers)
+            started = time.perf_counter()
+            for _ in range(count):
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, response.text
+            report(f"end to end {path}", time.perf_counter() - started, count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    from app.database import engine
+    from app.models import Base
+    Base.metadata.create_all(bind=engine)
+
+    token = create_token()
+    print(f"{args.requests} sequential requests, {engine.dialect.name}")
+    asyncio.run(time_dependencies(token, args.requests))
+    asyncio.run(time_routes(token, args.requests))
+
+
+if __name__ == "__main__":
+    main()
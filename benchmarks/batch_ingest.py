@@ -0,0 +1,99 @@
+"""
+Course setup: ingesting a reading list one URL at a time against the batched
+path, with MediaWiki stubbed by a fixed-latency fake. Reports wall time and how
+many API requests each path made, cold and when every cached copy is stale.
+
+    python -m benchmarks.batch_ingest --urls 150 --latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+import httpx
+
+from app.database import engine, SessionLocal
+from app.models import Base, WikiArticle
+from app.services.article_cache import article_cache
+from app.services.ingestion import ingestion_service
+
+BODY = "Lead paragraph.\n== History ==\n" + "Some history. " * 200 + "\n== See also ==\nx\n"
+
+
+def fake_mediawiki(latency: float, requests: Counter):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        params = request.url.params
+        titles = params.get("titles", "").split("|")
+        if "extracts" in params.get("prop", ""):
+            requests["extract"] += 1
+            title = titles[0].replace("Redirect", "Topic")
+            page = {"title": title, "extract": BODY, "revisions": [{"revid": 1}]}
+            return httpx.Response(200, json={"query": {"pages": [page]}})
+        requests["revisions"] += 1
+        redirects = [{"from": t, "to": t.replace("Redirect", "Topic")} for t in titles if t.startswith("Redirect")]
+        pages = [{"title": t.replace("Redirect", "Topic"), "revisions": [{"revid": 1}]} for t in titles]
+        return httpx.Response(200, json={"query": {"redirects": redirects, "pages": pages}})
+    return handler
+
+
+def reset(stale: bool):
+    article_cache.memory.clear()
+    with SessionLocal() as db:
+        if stale:
+            db.query(WikiArticle).update({"fetched_at": datetime.now(timezone.utc) - timedelta(days=30)})
+        else:
+            db.query(WikiArticle).delete()
+        db.commit()
+
+
+async def serial(urls: list):
+    for url in urls:
+        await ingestion_service.fetch_wikipedia_data_async(url)
+
+
+async def batched(urls: list):
+    await ingestion_service.fetch_wikipedia_batch_async(urls)
+
+
+async def measure(label: str, fn, urls: list, latency: float, stale: bool):
+    requests = Counter()
+    ingestion_service._async_client = httpx.AsyncClient(transport=httpx.MockTransport(fake_mediawiki(latency, requests)))
+    reset(stale)
+    started = time.perf_counter()
+    await fn(urls)
+    elapsed = time.perf_counter() - started
+    await ingestion_service.aclose()
+    print(f"  {label:<22} {elapsed:7.2f}s  requests={dict(requests)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=150)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per MediaWiki request")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    urls = [
+        f"https://en.wikipedia.org/wiki/{'Redirect' if i % 10 == 0 else 'Topic'}_{i}"
+        for i in range(args.urls)
+    ]
+    print(f"{args.urls} URLs, {args.latency * 1000:.0f} ms per request, "
+          f"host throttle {ingestion_service.throttle.rate:g} req/s x {ingestion_service.throttle.concurrency}")
+
+    # The stale runs age the rows the cold runs stored
+    for stale in (False, True):
+        print("stale cache" if stale else "cold cache")
+        await measure("one URL at a time", serial, urls, args.latency, stale)
+        await measure("batch", batched, urls, args.latency, stale)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
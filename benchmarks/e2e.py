@@ -0,0 +1,323 @@
+"""
+End-to-end scenarios against the whole app, offline. MediaWiki, Groq and
+Gemini are the local fakes of benchmarks.fakes, reached over the network by the
+app's own clients, so ingestion, the LLM router and the provider SDKs all run
+as in production. Requests go to the app in-process.
+
+  classroom  a class opens /ai/quiz on a few articles at once, cold, warm, then
+             once the articles' question banks are built
+  pdf        bulk uploads to /upload/pdf/summarize and /upload/pdf/quiz
+  history    readers paging /ai/history and /ai/quiz/history over large tables
+
+Reports p50/p95/p99 latency, throughput and the mean of each Server-Timing
+stage. Save a run as a baseline and compare later runs against it; the exit
+status is 1 when p95, throughput or errors regress beyond --tolerance.
+
+    python -m benchmarks.e2e --save baseline.json
+    python -m benchmarks.e2e --compare baseline.json --tolerance 0.25
+    python -m benchmarks.e2e --scenario classroom --students 200 --llm-latency 1.5 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from io import BytesIO
+
+if not os.getenv("DATABASE_URL", "").startswith("postgres"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/e2e.db"
+os.environ.setdefault("EXPORT_DIR", tempfile.mkdtemp())
+os.environ.setdefault("JOB_WORKERS", "0")
+# Per-user quotas would throttle the simulated users; measure the app, not the limits
+os.environ.setdefault("QUOTA_ENABLED", "false")
+os.environ["LLM_FAKE"] = "false"
+
+from benchmarks.fakes import FakeBackends, add_config_arguments, config_from
+
+SCENARIOS = ("classroom", "pdf", "history")
+LINE = "Lecture notes on {topic}: section {page}.{line} covers the {word} of the subject in detail."
+TOPIC_WORDS = ["structure", "history", "mechanism", "evidence", "application", "limits", "origin", "effect"]
+
+
+@dataclass
+class Result:
+    name: str
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+    stages: dict = field(default_factory=dict)
+
+    def add(self, seconds: float, response):
+        self.latencies.append(seconds)
+        if response.status_code >= 400:
+            self.errors += 1
+        for stage, ms in server_timing(response.headers.get("server-timing", "")).items():
+            if stage != "total":
+                self.stages.setdefault(stage, []).append(ms)
+
+    def summary(self) -> dict:
+        from app.core.metrics import percentile_ms
+
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "p50_ms": percentile_ms(latencies, 0.50),
+            "p95_ms": percentile_ms(latencies, 0.95),
+            "p99_ms": percentile_ms(latencies, 0.99),
+            "throughput": round(len(latencies) / self.elapsed, 2) if self.elapsed else 0.0,
+            # Mean per request that ran the stage
+            "stages_ms": {stage: round(sum(values) / len(values), 1) for stage, values in sorted(self.stages.items())},
+        }
+
+
+def server_timing(header: str) -> dict:
+    timings = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, *params = entry.split(";")
+        for param in params:
+            if param.startswith("dur="):
+                timings[name] = float(param[4:])
+    return timings
+
+
+async def timed(result: Result, client, method: str, url: str, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    result.add(time.perf_counter() - started, response)
+    return response
+
+
+async def bounded(jobs: list, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            await job()
+    await asyncio.gather(*(run(job) for job in jobs))
+
+
+def make_users(prefix: str, count: int) -> list:
+    """Authorization headers for count new users."""
+    from app.core.security import create_access_token
+    from app.database import SessionLocal
+    from app.models.user import User
+
+    with SessionLocal() as db:
+        users = [User(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", hashed_password="x") for i in range(count)]
+        db.add_all(users)
+        db.commit()
+        return [{"Authorization": f"Bearer {create_access_token({'sub': u.email, 'uid': u.id})}"} for u in users]
+
+
+def make_pdf(pages: int, topic: str) -> bytes:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(pages):
+        text = c.beginText(72, 720)
+        text.setFont("Helvetica", 10)
+        for line in range(40):
+            text.textLine(LINE.format(topic=topic, page=page, line=line, word=TOPIC_WORDS[(page + line) % len(TOPIC_WORDS)]))
+        c.drawText(text)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+async def classroom(client, args) -> list:
+    students = make_users("student", args.students)
+    urls = [f"https://en.wikipedia.org/wiki/Lesson_topic_{i}" for i in range(args.articles)]
+    results = []
+    for phase in ("cold", "warm", "bank"):
+        if phase == "bank":
+            # Quizzes so far queued the banks' builds; until they run, quizzes are generated as before
+            await build_banks(len(urls))
+        result = Result(f"classroom_{phase}")
+        started = time.perf_counter()
+        # Everyone at once, as when the teacher says "go"
+        await asyncio.gather(*(
+            timed(result, client, "GET", "/ai/quiz", params={"url": urls[i % len(urls)]}, headers=headers)
+            for i, headers in enumerate(students)
+        ))
+        result.elapsed = time.perf_counter() - started
+        results.append(result)
+    return results
+
+
+async def build_banks(count: int, timeout: float = 120):
+    from app.database import SessionLocal
+    from app.models.question_bank import QuestionBank
+    from app.services.jobs import job_queue
+
+    started = time.perf_counter()
+    await job_queue.start(2)
+    try:
+        while time.perf_counter() - started < timeout:
+            with SessionLocal() as db:
+                if db.query(QuestionBank).filter(QuestionBank.built_at.isnot(None)).count() >= count:
+                    break
+            await asyncio.sleep(0.2)
+    finally:
+        await job_queue.stop()
+    print(f"question banks built in {time.perf_counter() - started:.1f}s")
+
+
+async def pdf_uploads(client, args) -> list:
+    uploaders = make_users("uploader", max(1, args.uploads // 4))
+    rng = random.Random(11)
+    # Rendered up front so that PDF generation is not timed
+    documents = [(f"notes-{i}.pdf", make_pdf(rng.randint(2, args.max_pages), f"course {i}")) for i in range(args.uploads)]
+    result = Result("pdf_uploads")
+
+    def job(i: int, name: str, content: bytes):
+        path = "/upload/pdf/quiz" if i % 4 == 3 else "/upload/pdf/summarize"
+        return lambda: timed(result, client, "POST", path, files={"file": (name, content, "application/pdf")},
+                             headers=uploaders[i % len(uploaders)])
+
+    started = time.perf_counter()
+    await bounded([job(i, name, content) for i, (name, content) in enumerate(documents)], args.concurrency)
+    result.elapsed = time.perf_counter() - started
+    return [result]
+
+
+def seed_history(args):
+    from benchmarks.history_queries import seed
+    from sqlalchemy import text
+    from app.database import engine
+
+    seed(args.history_articles, args.history_attempts, args.history_users, args.history_sources)
+    if engine.dialect.name == "postgresql":
+        # seed() inserts explicit ids; move the sequences past them for the users created later
+        with engine.begin() as conn:
+            for table in ("users", "sources", "articles", "quiz_attempts"):
+                conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"))
+
+
+async def history(client, args) -> list:
+    from app.core.pagination import NEXT_CURSOR_HEADER
+    from app.core.security import create_access_token
+    from benchmarks.history_queries import HOT_USER
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': f'u{HOT_USER}@example.com', 'uid': HOT_USER})}"}
+    results = []
+    for name, path in (("history_articles", "/ai/history"), ("history_quizzes", "/ai/quiz/history")):
+        result = Result(name)
+
+        async def reader():
+            cursor = None
+            for _ in range(args.pages):
+                params = {"limit": 100, **({"cursor": cursor} if cursor else {})}
+                response = await timed(result, client, "GET", path, params=params, headers=headers)
+                cursor = response.headers.get(NEXT_CURSOR_HEADER)
+                if not cursor:
+                    break
+
+        started = time.perf_counter()
+        await asyncio.gather(*(reader() for _ in range(args.readers)))
+        result.elapsed = time.perf_counter() - started
+        results.append(result)
+    return results
+
+
+async def run(args) -> list:
+    import httpx
+    from app.main import app
+    from app.models import Base
+    from app.database import engine
+    from app.services.ingestion import ingestion_service
+
+    if "history" in args.scenario:
+        started = time.perf_counter()
+        seed_history(args)
+        print(f"seeded {args.history_articles} articles, {args.history_attempts} attempts in {time.perf_counter() - started:.1f}s")
+    else:
+        Base.metadata.create_all(bind=engine)
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://e2e", timeout=None) as client:
+        if "classroom" in args.scenario:
+            results += await classroom(client, args)
+        if "pdf" in args.scenario:
+            results += await pdf_uploads(client, args)
+        if "history" in args.scenario:
+            results += await history(client, args)
+    await ingestion_service.aclose()
+    return results
+
+
+def report(summaries: dict):
+    print(f"  {'scenario':<20} {'requests':>8} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for name, s in summaries.items():
+        print(f"  {name:<20} {s['requests']:>8} {s['errors']:>6} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} "
+              f"{s['p99_ms']:>9.1f} {s['throughput']:>8.1f}")
+        if s["stages_ms"]:
+            print("  " + " " * 20 + "  ".join(f"{stage} {ms:.1f}" for stage, ms in s["stages_ms"].items()))
+
+
+def regressions(summaries: dict, baseline: dict, tolerance: float) -> list:
+    found = []
+    for name, s in summaries.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if s["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {s['p95_ms']:.1f} ms, baseline {base['p95_ms']:.1f} ms")
+        if s["throughput"] < base["throughput"] * (1 - tolerance):
+            found.append(f"{name}: {s['throughput']:.1f} req/s, baseline {base['throughput']:.1f} req/s")
+        if s["errors"] / max(1, s["requests"]) > base["errors"] / max(1, base["requests"]) + 0.01:
+            found.append(f"{name}: {s['errors']} errors in {s['requests']} requests, baseline {base['errors']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--articles", type=int, default=3, help="articles the class works on")
+    parser.add_argument("--uploads", type=int, default=40)
+    parser.add_argument("--max-pages", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="uploads in flight")
+    parser.add_argument("--history-articles", type=int, default=200000)
+    parser.add_argument("--history-attempts", type=int, default=200000)
+    parser.add_argument("--history-users", type=int, default=1000)
+    parser.add_argument("--history-sources", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10, help="history pages each reader walks")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --save")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    config = config_from(args)
+    with FakeBackends(config) as backends:
+        os.environ.update(backends.environment())
+        print(f"fakes: wiki {config.wiki_latency * 1000:.0f} ms, LLM {config.llm_latency * 1000:.0f} ms + "
+              f"{config.tokens_per_second:g} tokens/s, {config.error_rate:.0%} 503s, {config.rate_limit_rate:.0%} 429s")
+        results = asyncio.run(run(args))
+        print(f"fake backends served: {backends.stats()}")
+
+    summaries = {result.name: result.summary() for result in results}
+    report(summaries)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(summaries, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            found = regressions(summaries, json.load(f), args.tolerance)
+        for line in found:
+            print(f"  REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
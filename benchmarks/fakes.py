@@ -0,0 +1,462 @@
+"""
+Local stand-ins for the services the app calls, for offline end-to-end runs:
+
+- MediaWiki: the API queries IngestionService makes, answered from recorded
+  fixtures (benchmarks/fixtures/wiki/<lang>/<Title>.json) or, for titles
+  without one, from a generated article of realistic size;
+- Groq: the OpenAI-compatible chat completions endpoint, plain or streamed;
+- Gemini: GenerativeService over gRPC with TLS, since google-generativeai
+  speaks gRPC (its REST transport blocks the event loop in async calls). The
+  certificate is a throwaway self-signed one that the client is told to trust.
+
+LLM answers arrive after --llm-latency and then at --tokens-per-second;
+--error-rate and --rate-limit-rate inject 503/UNAVAILABLE and
+429/RESOURCE_EXHAUSTED failures. FakeBackends runs the servers in a child
+process and lists the environment pointing the app at them.
+
+    python -m benchmarks.fakes serve --port 8900 --llm-latency 0.4 --error-rate 0.05
+    python -m benchmarks.fakes record "Alan Turing" Photosynthesis --lang en
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import time
+import urllib.parse
+from collections import Counter
+from dataclasses import dataclass, asdict
+
+import httpx
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "wiki")
+GEMINI_SERVICE = "google.ai.generativelanguage.v1beta.GenerativeService"
+USER_AGENT = "WikiSmartEdu-benchmarks/1.0"
+CATEGORY_SIZE = 120
+WORDS = (
+    "the of and to in a is was for on as by with from that at his are it an were which this be or "
+    "first also has had its after their new who but one two city war time state world history "
+    "government school university century early national during population system river later "
+    "between known since under through public series water energy theory science research "
+    "development language music family king church empire army period region species field "
+    "modern major large power light process cell body model data network design trade law"
+).split()
+
+
+@dataclass
+class FakeConfig:
+    wiki_latency: float = 0.05
+    # Time to the first token, then output at tokens_per_second
+    llm_latency: float = 0.3
+    tokens_per_second: float = 200.0
+    output_tokens: int = 250
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    fixtures: str = FIXTURES_DIR
+    seed: int = 7
+
+
+def fixture_path(fixtures: str, lang: str, title: str) -> str:
+    return os.path.join(fixtures, lang, urllib.parse.quote(title.replace(" ", "_"), safe="") + ".json")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class Articles:
+    def __init__(self, fixtures: str):
+        self.fixtures = fixtures
+        self._cache = {}
+
+    @staticmethod
+    def generate(lang: str, title: str) -> dict:
+        # Deterministic per title, sized like a typical full article (20-40k characters)
+        rng = random.Random(f"{lang}:{title}")
+
+        def paragraph():
+            return " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 160))).capitalize() + "."
+
+        parts = ["\n\n".join(paragraph() for _ in range(3))]
+        for i in range(rng.randint(6, 14)):
+            heading = " ".join(rng.choice(WORDS) for _ in range(2)).title()
+            parts.append(f"== {heading} {i} ==\n" + "\n\n".join(paragraph() for _ in range(rng.randint(2, 6))))
+        parts.append("== See also ==\n" + "\n".join(f"{title} ({word})" for word in WORDS[:4]))
+        parts.append("== References ==\n" + "\n".join(f"Reference {i}." for i in range(20)))
+        return {"title": title, "revid": rng.randint(10**8, 10**9), "extract": "\n\n\n".join(parts)}
+
+    def get(self, lang: str, title: str) -> dict:
+        key = (lang, title)
+        if key not in self._cache:
+            try:
+                with open(fixture_path(self.fixtures, lang, title), encoding="utf-8") as f:
+                    self._cache[key] = json.load(f)
+            except FileNotFoundError:
+                self._cache[key] = self.generate(lang, title)
+        return self._cache[key]
+
+
+class FakeLLM:
+    def __init__(self, config: FakeConfig, stats: Counter):
+        self.config = config
+        self.stats = stats
+        self.rng = random.Random(config.seed)
+
+    def failure(self, provider: str):
+        """None, "rate_limited" or "unavailable", drawn from the configured rates."""
+        roll = self.rng.random()
+        if roll < self.config.rate_limit_rate:
+            self.stats[f"{provider}_rate_limited"] += 1
+            return "rate_limited"
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.stats[f"{provider}_unavailable"] += 1
+            return "unavailable"
+        self.stats[f"{provider}_calls"] += 1
+        return None
+
+    def answer(self, prompt: str, json_mode: bool) -> str:
+        words = prompt.split()[-400:] or WORDS
+        if json_mode:
+            return json.dumps({"quiz": [{
+                "question": f"What is said about {words[(i * 37) % len(words)]}?",
+                "options": [words[(i * 37 + j) % len(words)] for j in range(4)],
+                "answer": words[(i * 37) % len(words)],
+                "difficulty": ("easy", "medium", "hard")[i % 3],
+            } for i in range(5)]})
+        budget = self.config.output_tokens * 4
+        out, size = [], 0
+        while size < budget:
+            word = words[len(out) % len(words)]
+            out.append(word)
+            size += len(word) + 1
+        return " ".join(out)
+
+    def pieces(self, text: str) -> list:
+        # Streamed a few tokens at a time, as the providers do
+        words = text.split(" ")
+        return [" ".join(words[i:i + 6]) + " " for i in range(0, len(words), 6)]
+
+    def generation_seconds(self, text: str) -> float:
+        return estimate_tokens(text) / self.config.tokens_per_second
+
+    def count(self, prompt: str, text: str):
+        self.stats["input_tokens"] += estimate_tokens(prompt)
+        self.stats["output_tokens"] += estimate_tokens(text)
+
+
+def mediawiki_query(articles: Articles, lang: str, params) -> dict:
+    if params.get("list") == "categorymembers":
+        start = int(params.get("cmcontinue", 0))
+        stop = min(CATEGORY_SIZE, start + int(params.get("cmlimit", 10)))
+        topic = params.get("cmtitle", "Category:Topic").split(":", 1)[-1]
+        payload = {"query": {"categorymembers": [{"ns": 0, "title": f"{topic} {i}"} for i in range(start, stop)]}}
+        if stop < CATEGORY_SIZE:
+            payload["continue"] = {"cmcontinue": str(stop), "continue": "-||"}
+        return payload
+
+    props = params.get("prop", "").split("|")
+    pages, normalized = [], []
+    for title in filter(None, params.get("titles", "").split("|")):
+        canonical = title[:1].upper() + title[1:]
+        if canonical != title:
+            normalized.append({"from": title, "to": canonical})
+        if canonical.startswith("Missing"):
+            pages.append({"title": canonical, "missing": True})
+            continue
+        article = articles.get(lang, canonical)
+        page = {"ns": 0, "title": article["title"]}
+        if "revisions" in props:
+            page["revisions"] = [{"revid": article["revid"]}]
+        if "pageprops" in props and canonical.endswith("(disambiguation)"):
+            page["pageprops"] = {"disambiguation": ""}
+        if "extracts" in props:
+            page["extract"] = article["extract"]
+        if "links" in props:
+            base = canonical.replace(" (disambiguation)", "")
+            page["links"] = [{"ns": 0, "title": f"{base} ({word})"} for word in WORDS[40:45]]
+        pages.append(page)
+    return {"batchcomplete": True, "query": {"normalized": normalized, "pages": pages}}
+
+
+def http_app(config: FakeConfig, articles: Articles, llm: FakeLLM, stats: Counter):
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    async def health(request):
+        return JSONResponse({"ok": True})
+
+    async def counters(request):
+        return JSONResponse(dict(stats))
+
+    async def mediawiki(request):
+        stats["wiki_requests"] += 1
+        await asyncio.sleep(config.wiki_latency)
+        return JSONResponse(mediawiki_query(articles, request.path_params["lang"], request.query_params))
+
+    async def groq_chat(request):
+        body = await request.json()
+        failure = llm.failure("groq")
+        if failure == "rate_limited":
+            return JSONResponse({"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                                status_code=429, headers={"retry-after": "1"})
+        if failure == "unavailable":
+            return JSONResponse({"error": {"message": "Service Unavailable", "type": "internal_server_error"}}, status_code=503)
+
+        prompt = "\n\n".join(message["content"] for message in body["messages"])
+        text = llm.answer(prompt, (body.get("response_format") or {}).get("type") == "json_object")
+        llm.count(prompt, text)
+        usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(text),
+                 "total_tokens": estimate_tokens(prompt) + estimate_tokens(text)}
+        head = {"id": f"chatcmpl-{stats['groq_calls']}", "created": int(time.time()), "model": body["model"]}
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.llm_latency + llm.generation_seconds(text))
+            return JSONResponse({**head, "object": "chat.completion", "usage": usage, "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+            ]})
+
+        async def events():
+            await asyncio.sleep(config.llm_latency)
+            for piece in llm.pieces(text):
+                await asyncio.sleep(llm.generation_seconds(piece))
+                chunk = {**head, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            done = {**head, "object": "chat.completion.chunk", "x_groq": {"usage": usage},
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[
+        Route("/_health", health),
+        Route("/_stats", counters),
+        Route("/{lang}/w/api.php", mediawiki),
+        Route("/openai/v1/chat/completions", groq_chat, methods=["POST"]),
+    ])
+
+
+def gemini_handlers(config: FakeConfig, llm: FakeLLM):
+    import grpc
+    from google.ai import generativelanguage_v1beta as glm
+
+    def response(text: str, prompt: str = None):
+        usage = None
+        if prompt is not None:
+            usage = glm.GenerateContentResponse.UsageMetadata(
+                prompt_token_count=estimate_tokens(prompt), candidates_token_count=estimate_tokens(text)
+            )
+        candidate = glm.Candidate(content=glm.Content(parts=[glm.Part(text=text)], role="model"), finish_reason=1)
+        return glm.GenerateContentResponse(candidates=[candidate], usage_metadata=usage)
+
+    async def prepare(request, context):
+        failure = llm.failure("gemini")
+        if failure == "rate_limited":
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Resource has been exhausted (e.g. check quota).")
+        if failure == "unavailable":
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "The model is overloaded. Please try again later.")
+        prompt = "\n\n".join(part.text for content in request.contents for part in content.parts)
+        text = llm.answer(prompt, request.generation_config.response_mime_type == "application/json")
+        llm.count(prompt, text)
+        return prompt, text
+
+    async def generate(request, context):
+        prompt, text = await prepare(request, context)
+        await asyncio.sleep(config.llm_latency + llm.generation_seconds(text))
+        return response(text, prompt)
+
+    async def stream(request, context):
+        prompt, text = await prepare(request, context)
+        await asyncio.sleep(config.llm_latency)
+        for piece in llm.pieces(text):
+            await asyncio.sleep(llm.generation_seconds(piece))
+            yield response(piece)
+
+    messages = {"request_deserializer": glm.GenerateContentRequest.deserialize,
+                "response_serializer": glm.GenerateContentResponse.serialize}
+    return grpc.method_handlers_generic_handler(GEMINI_SERVICE, {
+        "GenerateContent": grpc.unary_unary_rpc_method_handler(generate, **messages),
+        "StreamGenerateContent": grpc.unary_stream_rpc_method_handler(stream, **messages),
+    })
+
+
+def make_certificate(directory: str) -> tuple:
+    """Self-signed certificate for localhost; returns (certificate, key) paths."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name).public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=7))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    paths = (os.path.join(directory, "fake-cert.pem"), os.path.join(directory, "fake-key.pem"))
+    with open(paths[0], "wb") as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(paths[1], "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return paths
+
+
+async def _serve(config: FakeConfig, http_port: int, grpc_port: int, certificate: str, key: str):
+    import grpc
+    import uvicorn
+
+    stats = Counter()
+    llm = FakeLLM(config, stats)
+    server = grpc.aio.server()
+    server.add_generic_rpc_handlers((gemini_handlers(config, llm),))
+    with open(key, "rb") as k, open(certificate, "rb") as c:
+        server.add_secure_port(f"localhost:{grpc_port}", grpc.ssl_server_credentials([(k.read(), c.read())]))
+    await server.start()
+    app = http_app(config, Articles(config.fixtures), llm, stats)
+    await uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=http_port, log_level="warning", lifespan="off")).serve()
+    await server.stop(None)
+
+
+def serve(config: FakeConfig, http_port: int, grpc_port: int, certificate: str, key: str):
+    asyncio.run(_serve(config, http_port, grpc_port, certificate, key))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeBackends:
+    """The fake servers in a child process, so they do not compete with the app for the GIL."""
+
+    def __init__(self, config: FakeConfig = None):
+        self.config = config or FakeConfig()
+        self.http_port, self.grpc_port = free_port(), free_port()
+        self.directory = tempfile.mkdtemp(prefix="fakes-")
+        self.certificate, self.key = make_certificate(self.directory)
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.http_port}"
+
+    def environment(self) -> dict:
+        """Settings pointing the app at the fakes; set them before importing it."""
+        return {
+            "WIKI_API_URL": f"{self.url}/{{lang}}/w/api.php",
+            "GROQ_BASE_URL": self.url,
+            "GEMINI_API_ENDPOINT": f"localhost:{self.grpc_port}",
+            "GRPC_DEFAULT_SSL_ROOTS_FILE_PATH": self.certificate,
+            "GROQ_API_KEY": "fake",
+            "GOOGLE_API_KEY": "fake",
+        }
+
+    def start(self, timeout: float = 20.0):
+        self.process = multiprocessing.get_context("spawn").Process(
+            target=serve, args=(self.config, self.http_port, self.grpc_port, self.certificate, self.key), daemon=True
+        )
+        self.process.start()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"{self.url}/_health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError("Fake backends did not start")
+
+    def stats(self) -> dict:
+        return httpx.get(f"{self.url}/_stats", timeout=5).json()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(5)
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def record(titles: list, lang: str, fixtures: str):
+    """Saves the current extracts of real articles as fixtures."""
+    with httpx.Client(headers={"User-Agent": USER_AGENT}, timeout=30) as client:
+        for title in titles:
+            # The query IngestionService.page_params builds
+            response = client.get(f"https://{lang}.wikipedia.org/w/api.php", params={
+                "action": "query", "prop": "extracts|revisions", "explaintext": 1, "rvprop": "ids",
+                "titles": title, "redirects": 1, "format": "json", "formatversion": 2,
+            })
+            response.raise_for_status()
+            page = response.json()["query"]["pages"][0]
+            if page.get("missing"):
+                print(f"  {title}: not found")
+                continue
+            path = fixture_path(fixtures, lang, page["title"])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"title": page["title"], "revid": page["revisions"][0]["revid"], "extract": page["extract"]},
+                          f, ensure_ascii=False)
+            print(f"  {page['title']}: {len(page['extract'])} characters -> {path}")
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    defaults = FakeConfig()
+    parser.add_argument("--wiki-latency", type=float, default=defaults.wiki_latency, help="seconds per MediaWiki request")
+    parser.add_argument("--llm-latency", type=float, default=defaults.llm_latency, help="seconds to the first LLM token")
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--output-tokens", type=int, default=defaults.output_tokens, help="length of plain-text answers")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="share of LLM calls failing with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="share of LLM calls failing with 429")
+    parser.add_argument("--fixtures", default=defaults.fixtures)
+
+
+def config_from(args) -> FakeConfig:
+    return FakeConfig(
+        wiki_latency=args.wiki_latency, llm_latency=args.llm_latency, tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        fixtures=args.fixtures,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run the fakes in the foreground")
+    serve_parser.add_argument("--port", type=int, default=8900, help="HTTP port; gRPC (Gemini) listens on port + 1")
+    add_config_arguments(serve_parser)
+    record_parser = commands.add_parser("record", help="save real articles as fixtures (needs network)")
+    record_parser.add_argument("titles", nargs="+")
+    record_parser.add_argument("--lang", default="en")
+    record_parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.titles, args.lang, args.fixtures)
+        return
+    directory = tempfile.mkdtemp(prefix="fakes-")
+    certificate, key = make_certificate(directory)
+    config = config_from(args)
+    print(json.dumps(asdict(config)))
+    print(f"WIKI_API_URL=http://127.0.0.1:{args.port}/{{lang}}/w/api.php GROQ_BASE_URL=http://127.0.0.1:{args.port} "
+          f"GEMINI_API_ENDPOINT=localhost:{args.port + 1} GRPC_DEFAULT_SSL_ROOTS_FILE_PATH={certificate}")
+    serve(config, args.port, args.port + 1, certificate, key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+History queries on a seeded database: plans and latencies with and without the
+(owner_id, created_at, id) / (user_id, submitted_at, id) indexes, for the old
+unbounded fetch, OFFSET paging and keyset paging.
+
+Uses DATABASE_URL when it points at PostgreSQL (the tables are created there),
+otherwise a throwaway SQLite file.
+
+    python -m benchmarks.history_queries --articles 2000000 --attempts 2000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+if not os.getenv("DATABASE_URL", "").startswith("postgres"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/history.db"
+
+from sqlalchemy import insert, text
+
+from app.database import engine
+from app.models import Base, User, Source, Article, QuizAttempt
+
+HOT_USER = 1
+PAGE = 100
+
+
+def seed(articles: int, attempts: int, users: int, sources: int, batch: int = 50000):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    actions = ["summary", "translation", "quiz", "pdf_summary", "pdf_translation", "pdf_quiz"]
+
+    def owner():
+        # One heavy user with ~5% of all rows, the rest spread evenly
+        return HOT_USER if rng.random() < 0.05 else rng.randint(2, users)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"u{i}", "email": f"u{i}@example.com", "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(Source), [
+            {"id": i, "kind": "wiki", "locator": f"https://en.wikipedia.org/wiki/Page_{i}", "title": f"Page {i}"}
+            for i in range(1, sources + 1)
+        ])
+        for offset in range(0, articles, batch):
+            conn.execute(insert(Article), [{
+                "id": i + 1,
+                "title": f"Page {i % sources}",
+                "action": rng.choice(actions),
+                "created_at": start + timedelta(seconds=i * 7 + rng.randint(0, 6)),
+                "owner_id": owner(),
+                "source_id": rng.randint(1, sources),
+            } for i in range(offset, min(offset + batch, articles))])
+        for offset in range(0, attempts, batch):
+            conn.execute(insert(QuizAttempt), [{
+                "id": i + 1,
+                "user_id": owner(),
+                "article_id": rng.randint(1, articles),
+                "score": rng.random() * 100,
+                "submitted_at": start + timedelta(seconds=i * 7 + rng.randint(0, 6)),
+            } for i in range(offset, min(offset + batch, attempts))])
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE"))
+
+
+def explain(conn, sql: str, params: dict) -> str:
+    if engine.dialect.name == "postgresql":
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params).fetchall()
+        return "\n".join(f"      {row[0]}" for row in rows)
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+    return "\n".join(f"      {row[-1]}" for row in rows)
+
+
+def timed(conn, sql: str, params: dict, repeat: int):
+    samples, count = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = len(conn.execute(text(sql), params).fetchall())
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), count
+
+
+def queries(table: str, user_column: str, time_column: str, cursor: tuple) -> list:
+    base = f"SELECT * FROM {table} WHERE {user_column} = :user"
+    order = f"ORDER BY {time_column} DESC, id DESC"
+    return [
+        ("unbounded (old)", f"{base} ORDER BY {time_column} DESC", {"user": HOT_USER}),
+        ("first page", f"{base} {order} LIMIT {PAGE}", {"user": HOT_USER}),
+        ("OFFSET page 50", f"{base} {order} LIMIT {PAGE} OFFSET {PAGE * 50}", {"user": HOT_USER}),
+        ("keyset page 50", f"{base} AND ({time_column}, id) < (:ts, :id) {order} LIMIT {PAGE}",
+         {"user": HOT_USER, "ts": cursor[0], "id": cursor[1]}),
+    ]
+
+
+def run(label: str, repeat: int, show_plans: bool):
+    print(f"\n== {label}")
+    with engine.connect() as conn:
+        for table, user_column, time_column in (
+            ("articles", "owner_id", "created_at"),
+            ("quiz_attempts", "user_id", "submitted_at"),
+        ):
+            # Where page 50 starts, for the keyset query
+            cursor = conn.execute(text(
+                f"SELECT {time_column}, id FROM {table} WHERE {user_column} = :user "
+                f"ORDER BY {time_column} DESC, id DESC LIMIT 1 OFFSET {PAGE * 50 - 1}"
+            ), {"user": HOT_USER}).one()
+            for name, sql, params in queries(table, user_column, time_column, tuple(cursor)):
+                ms, count = timed(conn, sql, params, repeat)
+                print(f"  {table:<14} {name:<16} {ms:9.2f} ms  rows={count}")
+                if show_plans:
+                    print(explain(conn, sql, params))
+
+
+def set_indexes(present: bool):
+    statements = {
+        True: [
+            "CREATE INDEX IF NOT EXISTS ix_articles_owner_created ON articles (owner_id, created_at, id)",
+            "CREATE INDEX IF NOT EXISTS ix_quiz_attempts_user_submitted ON quiz_attempts (user_id, submitted_at, id)",
+        ],
+        False: [
+            "DROP INDEX IF EXISTS ix_articles_owner_created",
+            "DROP INDEX IF EXISTS ix_quiz_attempts_user_submitted",
+        ],
+    }[present]
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+        conn.execute(text("ANALYZE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=2_000_000)
+    parser.add_argument("--attempts", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--sources", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-plans", action="store_true")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.articles, args.attempts, args.users, args.sources)
+    print(f"seeded {args.articles} articles, {args.attempts} attempts on {engine.dialect.name} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    set_indexes(False)
+    run("without composite indexes", args.repeat, not args.no_plans)
+    set_indexes(True)
+    run("with composite indexes", args.repeat, not args.no_plans)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+LLM router under load, offline: two fake providers behind the summarize route,
+the primary rate limited to a fixed RPM and failing a share of its calls.
+Compares serving everything from the primary with failing over to the second.
+
+    python -m benchmarks.llm_router --requests 300 --primary-rpm 120 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import time
+
+
+def configure(args, failover: bool):
+    os.environ.update({
+        "LLM_ROUTE_SUMMARIZE": "fake_primary,fake_backup" if failover else "fake_primary",
+        "LLM_FAKE_PRIMARY_RPM": str(args.primary_rpm),
+        "LLM_FAKE_PRIMARY_ERROR_RATE": str(args.error_rate),
+        "LLM_FAKE_PRIMARY_LATENCY": str(args.latency),
+        "LLM_FAKE_BACKUP_LATENCY": str(args.latency * 2),
+        "LLM_RETRY_BASE": "0.05",
+    })
+
+
+async def run(args, failover: bool):
+    configure(args, failover)
+    # Limits are read when the router is built
+    from app.services.llm_router import LLMRouter, LLMError
+    router = LLMRouter()
+    latencies, failures = [], 0
+
+    async def one(i: int):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            await router.complete("summarize", [{"role": "user", "content": f"document {i} " * 200}], max_tokens=200)
+        except LLMError:
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    stats = router.stats()
+    print(f"  {'failover' if failover else 'primary only':<13} {elapsed:6.2f}s  "
+          f"p50={latencies[len(latencies) // 2] * 1000:7.1f} ms  p95={latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms  "
+          f"failed={failures}  failovers={stats['failovers']}")
+    for name, provider in stats["providers"].items():
+        print(f"      {name:<13} calls={provider['calls']} failures={provider['failures']} "
+              f"skipped={provider['skipped']} breaker={provider['breaker']} tokens={provider['input_tokens']}+{provider['output_tokens']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--primary-rpm", type=int, default=120)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.requests} concurrent summaries, primary {args.primary_rpm} RPM, {args.error_rate:.0%} errors")
+    for failover in (False, True):
+        asyncio.run(run(args, failover))
+
+
+if __name__ == "__main__":
+    main()
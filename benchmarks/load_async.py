@@ -0,0 +1,128 @@
+"""
+How many requests can a single worker hold in flight?
+
+Stubs Wikipedia and the LLM backends with fixed-latency fakes and fires a burst of
+concurrent /ai/summarize requests at the app in-process. Compares the async path
+against the two patterns it replaced: blocking calls inside async handlers, and
+sync handlers parked on the threadpool.
+
+    python -m benchmarks.load_async --requests 200 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+import httpx
+from fastapi import Depends
+
+from app.main import app
+from app.api.deps import get_current_user
+from app.core.security import create_access_token
+from app.database import SessionLocal
+from app.models.user import User
+from app.services.ai_service import ai_service
+from app.services.ingestion import ingestion_service
+
+WIKI_URL = "https://en.wikipedia.org/wiki/Benchmark"
+
+
+class InFlight:
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    def enter(self):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def leave(self):
+        self.current -= 1
+
+
+def install_stubs(mode: str, latency: float, gauge: InFlight):
+    async def fetch(url):
+        return {"title": "Benchmark", "language": "en", "url": url, "sections": {"Introduction": "x " * 500}}
+
+    async def summarize_async(text, lang_code, **kwargs):
+        gauge.enter()
+        try:
+            if mode == "blocking":
+                time.sleep(latency)
+            else:
+                await asyncio.sleep(latency)
+            return "summary"
+        finally:
+            gauge.leave()
+
+    ingestion_service.fetch_wikipedia_data_async = fetch
+    ai_service.summarize_text_async = summarize_async
+
+
+def add_threadpool_route(latency: float, gauge: InFlight):
+    @app.get("/bench/threadpool")
+    def threadpool_summary(current_user: User = Depends(get_current_user)):
+        gauge.enter()
+        try:
+            time.sleep(latency)
+            return {"summary": "summary"}
+        finally:
+            gauge.leave()
+
+
+def create_user() -> str:
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == "bench@example.com").first()
+        if user is None:
+            user = User(username="bench", email="bench@example.com", hashed_password="x")
+            db.add(user)
+            db.commit()
+        return create_access_token({"sub": user.email, "uid": user.id})
+
+
+async def run(mode: str, requests: int, latency: float):
+    gauge = InFlight()
+    install_stubs(mode, latency, gauge)
+    path = "/bench/threadpool" if mode == "threadpool" else "/ai/summarize"
+    if mode == "threadpool":
+        add_threadpool_route(latency, gauge)
+
+    headers = {"Authorization": f"Bearer {create_user()}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.get(path, params={"url": WIKI_URL}, headers=headers) for _ in range(requests)
+        ])
+        elapsed = time.perf_counter() - started
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    print(
+        f"{mode:>10}: {ok}/{requests} ok in {elapsed:6.2f}s  "
+        f"peak in flight={gauge.peak:4d}  throughput={requests / elapsed:7.1f} req/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated LLM latency in seconds")
+    parser.add_argument("--mode", choices=["async", "blocking", "threadpool", "all"], default="all")
+    args = parser.parse_args()
+
+    from app.database import engine
+    from app.models import Base
+    Base.metadata.create_all(bind=engine)
+
+    modes = ["async", "threadpool", "blocking"] if args.mode == "all" else [args.mode]
+    for mode in modes:
+        asyncio.run(run(mode, args.requests, args.latency))
+
+
+if __name__ == "__main__":
+    main()
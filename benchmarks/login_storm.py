@@ -0,0 +1,118 @@
+"""
+Does a burst of logins starve everything else?
+
+Fires a storm of concurrent /auth/login requests while probing a cheap endpoint
+on the event loop and one on the shared threadpool, and reports probe latency.
+Compares the bcrypt process pool against the old inline sync handler.
+
+    python -m benchmarks.login_storm --logins 200 --rounds 10
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+import httpx
+from fastapi import Depends, HTTPException
+
+from app.main import app
+from app.core import security
+from app.database import SessionLocal, get_db
+from app.models.user import User
+from app.schemas.user import UserLogin
+import app.services.password_service as password_module
+
+
+def add_routes():
+    @app.post("/bench/login-inline")
+    def login_inline(credentials: UserLogin, db=Depends(get_db)):
+        # The handler this replaced: bcrypt on a threadpool thread
+        user = db.query(User).filter(User.email == credentials.email).first()
+        if not user or not security.verify_password(credentials.password, user.hashed_password):
+            raise HTTPException(status_code=401)
+        return {"ok": True}
+
+    @app.get("/bench/ping-async")
+    async def ping_async():
+        return {}
+
+    @app.get("/bench/ping-sync")
+    def ping_sync():
+        return {}
+
+
+def create_user(rounds: int):
+    with SessionLocal() as db:
+        if db.query(User).filter(User.email == "storm@example.com").first() is None:
+            db.add(User(
+                username="storm",
+                email="storm@example.com",
+                hashed_password=security.hash_password("password1", rounds)
+            ))
+            db.commit()
+
+
+async def probe(client, path: str, stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+def pct(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+
+
+async def run(path: str, logins: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        stop = asyncio.Event()
+        loop_samples, pool_samples = [], []
+        probes = [
+            asyncio.create_task(probe(client, "/bench/ping-async", stop, loop_samples)),
+            asyncio.create_task(probe(client, "/bench/ping-sync", stop, pool_samples)),
+        ]
+        body = {"email": "storm@example.com", "password": "password1"}
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[client.post(path, json=body) for _ in range(logins)])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*probes)
+
+    codes = {}
+    for response in responses:
+        codes[response.status_code] = codes.get(response.status_code, 0) + 1
+    print(f"{path:<20} {elapsed:6.2f}s  statuses={codes}")
+    print(f"{'':<20} event-loop probe p50={pct(loop_samples, .5):7.1f}ms p99={pct(loop_samples, .99):7.1f}ms")
+    print(f"{'':<20} threadpool probe p50={pct(pool_samples, .5):7.1f}ms p99={pct(pool_samples, .99):7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor")
+    args = parser.parse_args()
+
+    from app.database import engine
+    from app.models import Base
+    Base.metadata.create_all(bind=engine)
+
+    password_module.BCRYPT_ROUNDS = args.rounds
+    create_user(args.rounds)
+    add_routes()
+
+    asyncio.run(run("/bench/login-inline", args.logins))
+    asyncio.run(run("/auth/login", args.logins))
+    print(password_module.password_service.stats())
+    password_module.password_service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
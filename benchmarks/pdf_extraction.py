@@ -0,0 +1,88 @@
+"""
+PDF text extraction: legacy temp-file + PyPDFLoader path against the in-memory
+pypdf extractor (sequential, process pool, and early stop).
+
+    python -m benchmarks.pdf_extraction --pages 100 300
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from app.services.pdf_service import PDFService
+
+LINE = "The quick brown fox studies distributed systems and jumps over the lazy dog."
+
+
+def make_pdf(pages: int) -> bytes:
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    for page in range(pages):
+        text = c.beginText(72, 720)
+        text.setFont("Helvetica", 10)
+        for line in range(48):
+            text.textLine(f"{page}.{line} {LINE}")
+        c.drawText(text)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def legacy_extract(content: bytes) -> str:
+    from langchain_community.document_loaders import PyPDFLoader
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        tmp_file.write(content)
+        path = tmp_file.name
+    try:
+        return "\n\n".join(page.page_content for page in PyPDFLoader(path).load())
+    finally:
+        os.unlink(path)
+
+
+def measure(label: str, fn, content: bytes):
+    tracemalloc.start()
+    started = time.perf_counter()
+    text = fn(content)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<22} {elapsed:7.2f}s  peak py-heap {peak / 2**20:7.1f} MiB  chars {len(text):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--budget", type=int, default=20000, help="max_chars for the early-stop run")
+    args = parser.parse_args()
+
+    import app.services.pdf_service as module
+    module.PDF_WORKERS = args.workers
+    service = PDFService()
+
+    for pages in args.pages:
+        content = make_pdf(pages)
+        print(f"{pages} pages, {len(content) / 2**20:.1f} MiB")
+        try:
+            measure("legacy PyPDFLoader", legacy_extract, content)
+        except ImportError:
+            print("  legacy PyPDFLoader     skipped (langchain_community not installed)")
+
+        module.PDF_PARALLEL_MIN_PAGES = 10**9
+        measure("pypdf sequential", service.extract_text_from_pdf, content)
+        module.PDF_PARALLEL_MIN_PAGES = 1
+        service.extract_text_from_pdf(make_pdf(args.workers))  # warm the pool
+        measure(f"pypdf {args.workers} processes", service.extract_text_from_pdf, content)
+        measure(f"early stop @{args.budget}", lambda c: service.extract_text_from_pdf(c, max_chars=args.budget), content)
+
+    service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
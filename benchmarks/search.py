@@ -0,0 +1,121 @@
+"""
+/search on a seeded index: latency of SearchService.search for a user with a
+large history, for rare and common terms and a phrase, against the scan that
+databases without a full-text index fall back to.
+
+Uses DATABASE_URL when it points at PostgreSQL (the tables are created there),
+otherwise a throwaway SQLite file with FTS5.
+
+    python -m benchmarks.search --sections 2000000 --sources 50000
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL", "").startswith("postgres"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/search.db"
+
+from sqlalchemy import insert, text
+
+from app.database import SessionLocal, engine
+from app.models import Base, User, Source, Article, SearchSection
+from app.services.search import search_service
+
+HOT_USER = 1
+VOCABULARY = 50000
+
+
+def word(i: int) -> str:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        out += letters[i % 26]
+        i //= 26
+        if not i:
+            return "w" + out
+
+
+def seed(sections: int, sources: int, users: int, articles: int, batch: int = 20000):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    # Zipf-like term frequencies, as in natural text
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY)))
+    vocabulary = [word(i) for i in range(VOCABULARY)]
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"u{i}", "email": f"u{i}@example.com", "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(Source), [
+            {"id": i, "kind": "wiki", "locator": f"https://en.wikipedia.org/wiki/Page_{i}", "title": f"Page {i}"}
+            for i in range(1, sources + 1)
+        ])
+        conn.execute(insert(Article), [{
+            # One heavy user with ~5% of all articles
+            "owner_id": HOT_USER if rng.random() < 0.05 else rng.randint(2, users),
+            "title": f"Page {i}", "action": "summary", "source_id": rng.randint(1, sources),
+        } for i in range(articles)])
+        per_source = {}
+        for offset in range(0, sections, batch):
+            rows = []
+            for _ in range(offset, min(offset + batch, sections)):
+                source_id = rng.randint(1, sources)
+                position = per_source[source_id] = per_source.get(source_id, -1) + 1
+                rows.append({
+                    "ref": f"source:{source_id}", "position": position, "source_id": source_id,
+                    "heading": " ".join(rng.choices(vocabulary, cum_weights=weights, k=2)),
+                    "body": " ".join(rng.choices(vocabulary, cum_weights=weights, k=180)),
+                })
+            conn.execute(insert(SearchSection), rows)
+        conn.execute(text("ANALYZE"))
+
+
+def timed(fn, repeat: int):
+    samples, count = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = len(fn())
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=2_000_000)
+    parser.add_argument("--sources", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--articles", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-scan", action="store_true", help="skip the unindexed scan, slow at large sizes")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.sections, args.sources, args.users, args.articles)
+    print(f"seeded {args.sections} sections over {args.sources} sources on {engine.dialect.name} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    queries = {
+        "common term": word(3),
+        "mid term": word(400),
+        "rare term": word(30000),
+        "two terms": f"{word(40)} {word(900)}",
+        "phrase": f'"{word(0)} {word(1)}"',
+    }
+    with SessionLocal() as db:
+        for name, query in queries.items():
+            ms, count = timed(lambda: search_service.search(db, HOT_USER, query, 20), args.repeat)
+            line = f"  {name:<12} {query!r:<22} indexed {ms:9.2f} ms  hits={count}"
+            if not args.no_scan and '"' not in query:
+                scan_ms, _ = timed(lambda: search_service._search_scan(db, HOT_USER, query, 20), 1)
+                line += f"   scan {scan_ms:9.2f} ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
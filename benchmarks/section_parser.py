@@ -0,0 +1,118 @@
+"""
+Section parsing of article extracts: the former regex split in
+IngestionService.segment_content against parse_sections, which builds the
+outline in one pass over the headings and slices bodies only when they are
+read, e.g. the sections that a prompt budget selects.
+
+Runs on the largest articles recorded under benchmarks/fixtures/wiki (record
+some with `python -m benchmarks.fakes record "List of ..." ...`) and on
+generated articles of the given sizes with three heading levels and repeated
+subsection titles, as in long biographies and lists.
+
+    python -m benchmarks.section_parser --sizes 100000 400000 1500000
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import statistics
+import time
+import tracemalloc
+
+from app.services.chunking import estimate_tokens
+from app.services.sections import SectionMap, parse_sections
+from benchmarks.fakes import FIXTURES_DIR, WORDS
+
+BUDGET_TOKENS = 6000
+REPEATED = ["Reception", "Background", "Legacy", "Personal life", "Track listing", "Results"]
+
+
+def legacy_segment(raw_text: str) -> dict:
+    # IngestionService.segment_content before the section tree
+    sections = re.split(r'\n==+\s*(.*?)\s*==+\n', raw_text)
+    segmented_data = {"Introduction": sections[0].strip()}
+    for i in range(1, len(sections), 2):
+        title, content = sections[i].strip(), sections[i+1].strip()
+        if title.lower() not in ["references", "external links", "see also", "further reading", "notes"]:
+            segmented_data[title] = content
+    return segmented_data
+
+
+def generate(size: int, seed: int = 3) -> str:
+    rng = random.Random(seed)
+
+    def paragraph():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 140))).capitalize() + "."
+
+    parts, length, section = [paragraph()], 0, 0
+    while length < size:
+        section += 1
+        block = [f"== {rng.choice(WORDS).title()} {section} ==", paragraph()]
+        for sub in range(rng.randint(0, 4)):
+            block += [f"=== {rng.choice(REPEATED)} ===", paragraph(), paragraph()]
+            if rng.random() < 0.3:
+                block += [f"==== {rng.choice(REPEATED)} ====", paragraph()]
+        text = "\n\n".join(block)
+        parts.append(text)
+        length += len(text)
+    parts += ["== See also ==\nx", "== References ==\n=== Sources ===\n" + "Source.\n" * 200]
+    return "\n\n\n".join(parts)
+
+
+def articles(sizes: list) -> list:
+    found = []
+    for path in glob.glob(os.path.join(FIXTURES_DIR, "*", "*.json")):
+        with open(path, encoding="utf-8") as f:
+            article = json.load(f)
+        found.append((article["title"], article["extract"]))
+    found.sort(key=lambda item: len(item[1]), reverse=True)
+    return found[:5] + [(f"generated {size // 1000}k", generate(size)) for size in sizes]
+
+
+def measure(fn, text: str, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        samples.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    result = fn(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(samples), peak, result
+
+
+def select_budget(text: str) -> dict:
+    # What a budget-driven caller pays: outline, selection by offsets, then only the chosen bodies
+    return SectionMap(parse_sections(text)).select(BUDGET_TOKENS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 400000, 1500000], help="generated article sizes in characters")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    variants = {
+        "legacy re.split": legacy_segment,
+        "parse_sections": parse_sections,
+        "flatten": lambda text: parse_sections(text).flatten(),
+        f"select {BUDGET_TOKENS} tokens": select_budget,
+    }
+    for title, text in articles(args.sizes):
+        root = parse_sections(text)
+        outline = list(root.walk())
+        print(f"{title}: {len(text)} chars, ~{estimate_tokens(text)} tokens, {len(outline)} sections "
+              f"over {max(node.level for node in outline)} levels")
+        for label, fn in variants.items():
+            ms, peak, result = measure(fn, text, args.repeat)
+            note = f"  {len(result)} entries" if isinstance(result, (dict, list)) else ""
+            print(f"  {label:<22} {ms:8.2f} ms  peak {peak / 2**10:9.1f} KiB{note}")
+        lost = len(root.flatten()) - len(legacy_segment(text))
+        print(f"  sections lost to the regex split (merged or overwritten): {lost}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Input size per task before and after text preparation: raw sections and the
+introduction as they used to be sent, against cleaned, budgeted input. Counts
+use the task's tokenizer (tiktoken when its encoding files can be loaded).
+
+    python -m benchmarks.text_prep --url https://en.wikipedia.org/wiki/Alan_Turing --url https://ar.wikipedia.org/wiki/آلان_تورنج
+    python -m benchmarks.text_prep --file article.txt --lang fr
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("GOOGLE_API_KEY", "bench")
+
+from app.database import engine
+from app.models import Base
+from app.services.ai_service import SUMMARY_CHUNK_TOKENS
+from app.services.chunking import chunk_sections
+from app.services.ingestion import ingestion_service
+from app.services.text_prep import text_prep
+
+
+async def load(args) -> list:
+    articles = []
+    for path in args.file:
+        with open(path, encoding="utf-8") as f:
+            articles.append((path, args.lang, ingestion_service.segment_content(f.read())))
+    for url in args.url:
+        data = await ingestion_service.fetch_wikipedia_data_async(url)
+        if "error" in data:
+            print(f"  {url}: {data['error']}")
+            continue
+        articles.append((data["title"], data.get("language", "en"), data["sections"]))
+    await ingestion_service.aclose()
+    return articles
+
+
+def compare(name: str, lang: str, sections: dict):
+    intro = sections.get("Introduction", "")
+    before = {
+        "summarize": "\n\n".join(chunk_sections(sections, SUMMARY_CHUNK_TOKENS)),
+        "translate": intro,
+        "quiz": intro,
+    }
+    for task in ("summarize", "translate", "quiz"):
+        # Loads the encodings outside the timing
+        text_prep.tokenizer(task)
+    started = time.perf_counter()
+    prepared = {
+        "summarize": text_prep.sections(sections, "summarize"),
+        "translate": text_prep.lead(intro, "translate"),
+        "quiz": text_prep.sections(sections, "quiz"),
+    }
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"{name} [{lang}], {len(sections)} sections, prepared in {elapsed:.1f} ms")
+    for task, after in prepared.items():
+        tokenizer = text_prep.tokenizer(task)
+        old = tokenizer.count(before[task])
+        print(f"  {task:<10} {tokenizer.name:<12} {old:7d} -> {after.tokens:7d} tokens  "
+              f"sections kept: {len(after.sections)}")
+    windows = len(chunk_sections(sections, SUMMARY_CHUNK_TOKENS))
+    print(f"  summary windows {windows} -> {len(text_prep.chunks(prepared['summarize']))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", action="append", default=[], help="Wikipedia article, repeatable")
+    parser.add_argument("--file", action="append", default=[], help="plain-text extract with == Headings ==, repeatable")
+    parser.add_argument("--lang", default="en", help="language of --file articles")
+    args = parser.parse_args()
+    if not args.url and not args.file:
+        args.url = [
+            "https://en.wikipedia.org/wiki/Alan_Turing",
+            "https://fr.wikipedia.org/wiki/Alan_Turing",
+            "https://ar.wikipedia.org/wiki/آلان_تورنج",
+        ]
+
+    # Fetched articles go through the article cache
+    Base.metadata.create_all(bind=engine)
+    for name, lang, sections in asyncio.run(load(args)):
+        compare(name, lang, sections)
+
+
+if __name__ == "__main__":
+    main()
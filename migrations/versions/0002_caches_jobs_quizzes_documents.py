@@ -0,0 +1,152 @@
+"""Caches, jobs, stored quizzes and uploaded documents
+
+Wiki article and LLM result caches, the job queue, stored quizzes and their
+questions, content-addressed uploads, and the columns linking articles and
+attempts to them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('llm_results',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('operation', sa.String(length=32), nullable=False),
+    sa.Column('model', sa.String(length=64), nullable=False),
+    sa.Column('prompt_version', sa.String(length=16), nullable=False),
+    sa.Column('language', sa.String(length=32), nullable=True),
+    sa.Column('output', sa.Text(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('llm_results', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_llm_results_last_used_at'), ['last_used_at'], unique=False)
+
+    op.create_table('uploaded_documents',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('filename', sa.String(), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('page_count', sa.Integer(), nullable=False),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_table('wiki_articles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lang', sa.String(length=16), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('canonical_title', sa.String(), nullable=False),
+    sa.Column('revision_id', sa.BigInteger(), nullable=False),
+    sa.Column('sections', sa.JSON(), nullable=False),
+    sa.Column('fetched_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('lang', 'title', 'revision_id', name='uq_wiki_articles_revision')
+    )
+    with op.batch_alter_table('wiki_articles', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_wiki_articles_id'), ['id'], unique=False)
+        batch_op.create_index('ix_wiki_articles_lang_title', ['lang', 'title'], unique=False)
+
+    op.create_table('jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('backend', sa.String(length=32), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_after', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_jobs_status_run_after', ['status', 'run_after'], unique=False)
+        batch_op.create_index(batch_op.f('ix_jobs_user_id'), ['user_id'], unique=False)
+
+    op.create_table('quizzes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('article_id', sa.Integer(), nullable=True),
+    sa.Column('language', sa.String(length=16), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['article_id'], ['articles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('quizzes', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quizzes_article_id'), ['article_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quizzes_id'), ['id'], unique=False)
+
+    op.create_table('quiz_questions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=True),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('options', sa.JSON(), nullable=True),
+    sa.Column('answer', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_questions_id'), ['id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quiz_questions_quiz_id'), ['quiz_id'], unique=False)
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('result_key', sa.String(length=64), nullable=True))
+        batch_op.create_foreign_key('fk_articles_result_key_llm_results', 'llm_results', ['result_key'], ['key'])
+
+    with op.batch_alter_table('quiz_attempts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quiz_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_quiz_attempts_quiz_id_quizzes', 'quizzes', ['quiz_id'], ['id'])
+
+
+
+def downgrade():
+    with op.batch_alter_table('quiz_attempts', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_quiz_attempts_quiz_id_quizzes', type_='foreignkey')
+        batch_op.drop_column('quiz_id')
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_articles_result_key_llm_results', type_='foreignkey')
+        batch_op.drop_column('result_key')
+
+    with op.batch_alter_table('quiz_questions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_questions_quiz_id'))
+        batch_op.drop_index(batch_op.f('ix_quiz_questions_id'))
+
+    op.drop_table('quiz_questions')
+    with op.batch_alter_table('quizzes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quizzes_id'))
+        batch_op.drop_index(batch_op.f('ix_quizzes_article_id'))
+
+    op.drop_table('quizzes')
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_jobs_user_id'))
+        batch_op.drop_index('ix_jobs_status_run_after')
+
+    op.drop_table('jobs')
+    with op.batch_alter_table('wiki_articles', schema=None) as batch_op:
+        batch_op.drop_index('ix_wiki_articles_lang_title')
+        batch_op.drop_index(batch_op.f('ix_wiki_articles_id'))
+
+    op.drop_table('wiki_articles')
+    op.drop_table('uploaded_documents')
+    with op.batch_alter_table('llm_results', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_llm_results_last_used_at'))
+
+    op.drop_table('llm_results')
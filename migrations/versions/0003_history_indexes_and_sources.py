@@ -0,0 +1,101 @@
+"""History indexes, article_action enum and the sources table
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Articles stop repeating their URL: each distinct URL or document locator becomes
+one row of sources, and articles point at it. Existing URLs are carried over as
+they are; only new ones are normalized.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+ARTICLE_ACTIONS = ('summary', 'translation', 'quiz', 'pdf_summary', 'pdf_translation', 'pdf_quiz')
+SOURCE_KINDS = ('wiki', 'document')
+
+
+def upgrade():
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+    article_action = sa.Enum(*ARTICLE_ACTIONS, name='article_action')
+    article_action.create(bind, checkfirst=True)
+
+    op.create_table(
+        'sources',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.Enum(*SOURCE_KINDS, name='source_kind'), nullable=False),
+        sa.Column('locator', sa.String(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('locator'),
+    )
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('source_id', sa.Integer(), nullable=True))
+
+    kind = "CASE WHEN url LIKE 'document:%' OR url LIKE 'uploaded:%' THEN 'document' ELSE 'wiki' END"
+    if postgres:
+        kind = f"CAST({kind} AS source_kind)"
+    op.execute(
+        f"INSERT INTO sources (kind, locator, title) "
+        f"SELECT {kind}, COALESCE(url, 'unknown:'), MIN(title) FROM articles GROUP BY COALESCE(url, 'unknown:'), {kind}"
+    )
+    op.execute(
+        "UPDATE articles SET source_id = "
+        "(SELECT sources.id FROM sources WHERE sources.locator = COALESCE(articles.url, 'unknown:'))"
+    )
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.alter_column('source_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_articles_source_id_sources', 'sources', ['source_id'], ['id'])
+        batch_op.alter_column(
+            'action',
+            existing_type=sa.String(),
+            type_=article_action,
+            postgresql_using='action::article_action',
+        )
+        batch_op.drop_column('url')
+        # The primary key already indexes id
+        batch_op.drop_index('ix_articles_id')
+        batch_op.create_index('ix_articles_owner_created', ['owner_id', 'created_at', 'id'], unique=False)
+
+    with op.batch_alter_table('quiz_attempts', schema=None) as batch_op:
+        batch_op.drop_index('ix_quiz_attempts_id')
+        batch_op.create_index('ix_quiz_attempts_user_submitted', ['user_id', 'submitted_at', 'id'], unique=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    with op.batch_alter_table('quiz_attempts', schema=None) as batch_op:
+        batch_op.drop_index('ix_quiz_attempts_user_submitted')
+        batch_op.create_index('ix_quiz_attempts_id', ['id'], unique=False)
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('url', sa.String(), nullable=True))
+
+    op.execute("UPDATE articles SET url = (SELECT sources.locator FROM sources WHERE sources.id = articles.source_id)")
+
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_index('ix_articles_owner_created')
+        batch_op.create_index('ix_articles_id', ['id'], unique=False)
+        batch_op.alter_column(
+            'action',
+            existing_type=sa.Enum(*ARTICLE_ACTIONS, name='article_action'),
+            type_=sa.String(),
+            postgresql_using='action::text',
+        )
+        batch_op.drop_constraint('fk_articles_source_id_sources', type_='foreignkey')
+        batch_op.drop_column('source_id')
+
+    op.drop_table('sources')
+    sa.Enum(name='source_kind').drop(bind, checkfirst=True)
+    sa.Enum(name='article_action').drop(bind, checkfirst=True)
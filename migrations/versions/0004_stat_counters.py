@@ -0,0 +1,86 @@
+"""Dashboard counters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+stat_counters holds the admin dashboard's totals and daily series. They are
+backfilled here from the existing rows, after which inserts keep them current.
+"""
+from collections import defaultdict
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the application's language normalization
+LANGUAGE_CODES = {'english': 'en', 'french': 'fr', 'arabic': 'ar', 'spanish': 'es'}
+
+
+def language_code(language):
+    if not language:
+        return 'unknown'
+    value = language.strip().lower()
+    return LANGUAGE_CODES.get(value, value)[:64]
+
+
+def upgrade():
+    stat_counters = op.create_table(
+        'stat_counters',
+        sa.Column('bucket', sa.String(length=10), nullable=False),
+        sa.Column('metric', sa.String(length=32), nullable=False),
+        sa.Column('dimension', sa.String(length=64), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket', 'metric', 'dimension'),
+    )
+
+    if op.get_context().as_sql:
+        # Offline SQL cannot read the tables; POST /ai/admin/stats/rebuild fills them later
+        return
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        day = lambda column: f"CAST(timezone('UTC', {column}) AS DATE)"
+    else:
+        day = lambda column: f"date({column})"
+
+    counts = defaultdict(lambda: [0, 0.0])
+
+    def add(created, metric, dimension, count, total=0.0):
+        for bucket in ('total', str(created)[:10] if created else None):
+            if bucket:
+                counts[(bucket, metric, dimension)][0] += count
+                counts[(bucket, metric, dimension)][1] += total or 0.0
+
+    # users has no timestamp, so it only gets a total
+    add(None, 'users', '', bind.execute(sa.text("SELECT COUNT(*) FROM users")).scalar())
+
+    for created, count, score_sum in bind.execute(sa.text(
+        f"SELECT {day('submitted_at')}, COUNT(*), SUM(score) FROM quiz_attempts GROUP BY {day('submitted_at')}"
+    )):
+        add(created, 'quiz_attempts', '', count, score_sum)
+
+    for created, action, kind, language, count in bind.execute(sa.text(
+        f"SELECT {day('a.created_at')}, a.action, s.kind, r.language, COUNT(*) FROM articles a "
+        f"JOIN sources s ON s.id = a.source_id LEFT JOIN llm_results r ON r.key = a.result_key "
+        f"GROUP BY {day('a.created_at')}, a.action, s.kind, r.language"
+    )):
+        add(created, 'articles', '', count)
+        add(created, 'articles.action', action or 'unknown', count)
+        add(created, 'articles.source', kind, count)
+        add(created, 'articles.language', language_code(language), count)
+
+    if counts:
+        op.bulk_insert(stat_counters, [
+            {'bucket': bucket, 'metric': metric, 'dimension': dimension, 'count': count, 'total': total}
+            for (bucket, metric, dimension), (count, total) in counts.items()
+        ])
+
+
+def downgrade():
+    op.drop_table('stat_counters')
@@ -0,0 +1,45 @@
+"""Quotas
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+quota_usage backs QUOTA_STORE=database; quota_overrides holds per-user limits
+set by admins.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'quota_usage',
+        sa.Column('key', sa.String(length=160), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_index(op.f('ix_quota_usage_expires_at'), 'quota_usage', ['expires_at'], unique=False)
+    op.create_table(
+        'quota_overrides',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('requests', sa.Integer(), nullable=True),
+        sa.Column('tokens', sa.BigInteger(), nullable=True),
+        sa.Column('exempt', sa.Boolean(), nullable=False),
+        sa.Column('note', sa.String(length=255), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('quota_overrides')
+    op.drop_index(op.f('ix_quota_usage_expires_at'), table_name='quota_usage')
+    op.drop_table('quota_usage')
@@ -0,0 +1,70 @@
+"""Search index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+search_sections holds the text that /search looks through, with a GIN
+full-text index on PostgreSQL and an FTS5 table kept in sync by triggers on
+SQLite. New articles are indexed as they are recorded; POST
+/ai/admin/search/reindex indexes the ones recorded before this revision.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+SQLITE_FTS = (
+    "CREATE VIRTUAL TABLE search_sections_fts USING fts5(heading, body, content='search_sections', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER search_sections_ai AFTER INSERT ON search_sections BEGIN "
+    "INSERT INTO search_sections_fts(rowid, heading, body) VALUES (new.id, new.heading, new.body); END",
+    "CREATE TRIGGER search_sections_ad AFTER DELETE ON search_sections BEGIN "
+    "INSERT INTO search_sections_fts(search_sections_fts, rowid, heading, body) "
+    "VALUES ('delete', old.id, old.heading, old.body); END",
+    "CREATE TRIGGER search_sections_au AFTER UPDATE ON search_sections BEGIN "
+    "INSERT INTO search_sections_fts(search_sections_fts, rowid, heading, body) "
+    "VALUES ('delete', old.id, old.heading, old.body); "
+    "INSERT INTO search_sections_fts(rowid, heading, body) VALUES (new.id, new.heading, new.body); END",
+)
+
+
+def upgrade():
+    op.create_table(
+        'search_sections',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ref', sa.String(length=80), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('result_key', sa.String(length=64), nullable=True),
+        sa.Column('heading', sa.String(), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['source_id'], ['sources.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['result_key'], ['llm_results.key'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ref', 'position', name='uq_search_sections_ref_position'),
+    )
+    op.create_index(op.f('ix_search_sections_source_id'), 'search_sections', ['source_id'], unique=False)
+    op.create_index(op.f('ix_search_sections_result_key'), 'search_sections', ['result_key'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_search_sections_document ON search_sections "
+            "USING gin (to_tsvector('simple', coalesce(heading, '') || ' ' || body))"
+        )
+    elif dialect == 'sqlite':
+        for statement in SQLITE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS search_sections_fts")
+    op.drop_index(op.f('ix_search_sections_result_key'), table_name='search_sections')
+    op.drop_index(op.f('ix_search_sections_source_id'), table_name='search_sections')
+    op.drop_table('search_sections')
@@ -0,0 +1,64 @@
+"""Question bank
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Questions generated once per section of a source and sampled into quizzes,
+with the questions each user has already been served.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'question_banks',
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('language', sa.String(length=16), nullable=False),
+        sa.Column('questions', sa.Integer(), nullable=False),
+        sa.Column('sections', sa.Integer(), nullable=False),
+        sa.Column('requested_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('built_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['source_id'], ['sources.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('source_id', 'language'),
+    )
+    op.create_table(
+        'bank_questions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('language', sa.String(length=16), nullable=False),
+        sa.Column('section', sa.String(), nullable=False),
+        sa.Column('difficulty', sa.String(length=16), nullable=False),
+        sa.Column('question', sa.Text(), nullable=False),
+        sa.Column('options', sa.JSON(), nullable=True),
+        sa.Column('answer', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['source_id'], ['sources.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_bank_questions_source_language', 'bank_questions', ['source_id', 'language'], unique=False)
+    op.create_table(
+        'bank_questions_seen',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('seen_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['question_id'], ['bank_questions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'question_id'),
+    )
+    op.create_index(op.f('ix_bank_questions_seen_question_id'), 'bank_questions_seen', ['question_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_bank_questions_seen_question_id'), table_name='bank_questions_seen')
+    op.drop_table('bank_questions_seen')
+    op.drop_index('ix_bank_questions_source_language', table_name='bank_questions')
+    op.drop_table('bank_questions')
+    op.drop_table('question_banks')
@@ -0,0 +1,35 @@
+"""Article language
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+Quizzes sampled from the question bank are saved without an LLM result, so
+the article keeps its own language for the stats breakdown. Existing articles
+without a result take the language of their quiz; run the stats rebuild
+afterwards to recount them.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('language', sa.String(length=16), nullable=True))
+
+    op.execute(
+        "UPDATE articles SET language = "
+        "(SELECT MIN(quizzes.language) FROM quizzes WHERE quizzes.article_id = articles.id) "
+        "WHERE result_key IS NULL"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('articles', schema=None) as batch_op:
+        batch_op.drop_column('language')